@@ -104,9 +104,14 @@ try:
     )
     from src import Tab_Startseite 
     from src import Tab_Simulation
+    from src import cache_manager
 
     apply_gutmann_style()
 
+    # Optionale Cache-Kompaktierung im Hintergrund (einmal pro Prozess)
+    if cache_manager.COMPACT_ON_STARTUP:
+        cache_manager.start_background_compaction()
+
 except ImportError as e:
     st.error(
         f"**FATALER FEHLER beim Import von `src`:** {e}. Stelle sicher, dass der 'src'-Ordner im selben Verzeichnis wie Startseite.py liegt."
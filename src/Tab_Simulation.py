@@ -29,7 +29,22 @@ RISK_PROFILES = {
 FIXED_RISK_PROFILE_KEY = "Ausgewogen"
 FIXED_VOLATILITY = RISK_PROFILES[FIXED_RISK_PROFILE_KEY]["volatilitaet_pa"]
 FIXED_N_SIMULATIONS = 100
+# Prognose in Monatsschritten (aggregierte Monatsrenditen, Monatsindex) statt in Tagesschritten
+FIXED_PROGNOSE_MONATLICH = False
+# Prognose je Position mit korrelierten Renditen (Kovarianz aus der gecachten Kurshistorie) statt als ein Gesamtportfolio
+FIXED_PROGNOSE_MULTI_ASSET = False
+# Seed der Prognose: gleiche Eingaben -> gleiche Quantile bei jedem Lauf (None = neue Zufallszahlen)
+FIXED_PROGNOSE_SEED = 42
 FIXED_SPARPLAN_ACTIVE = True
+# Historie nur an Handelstagen rechnen/anzeigen (statt an jedem Kalendertag, gleiche Werte)
+FIXED_TRADING_DAYS_ONLY = False
+# Rebalancing auf die Zielgewichte: None (Positionen laufen unabhängig), "monatlich", "vierteljährlich",
+# "jährlich" oder "schwelle" (sobald ein Gewicht um mehr als FIXED_REBALANCING_THRESHOLD_PCT Prozentpunkte abweicht)
+FIXED_REBALANCING = None
+FIXED_REBALANCING_THRESHOLD_PCT = 5.0
+
+# Prognose-Funktion laut FIXED_PROGNOSE_MULTI_ASSET (gleiche Parameter)
+_run_prognose = prognose_logic.run_multi_asset_forecast if FIXED_PROGNOSE_MULTI_ASSET else prognose_logic.run_forecast
 
 
 def render():
@@ -715,14 +730,28 @@ def render():
         if needs_recalc:
             with st.spinner("Berechne Portfolio..."):
                  # Historie nutzt automatisch inflation.py via portfolio_logic
-                 sim_data, hist_returns, final_values = portfolio_logic.run_portfolio_simulation(
-                    assets=assets_to_simulate,
-                    start_date=st.session_state.sim_start_date,
-                    end_date=st.session_state.sim_end_date,
-                    ausgabeaufschlag_pct=st.session_state.cost_ausgabe,
-                    managementgebuehr_pa_pct=st.session_state.cost_management,
-                    depotgebuehr_pa_eur=st.session_state.cost_depot,
-                )
+                 if FIXED_REBALANCING:
+                     sim_data, hist_returns, final_values, turnover = portfolio_logic.run_rebalanced_portfolio_simulation(
+                        assets=assets_to_simulate,
+                        start_date=st.session_state.sim_start_date,
+                        end_date=st.session_state.sim_end_date,
+                        ausgabeaufschlag_pct=st.session_state.cost_ausgabe,
+                        managementgebuehr_pa_pct=st.session_state.cost_management,
+                        depotgebuehr_pa_eur=st.session_state.cost_depot,
+                        rebalancing=FIXED_REBALANCING,
+                        threshold_pct=FIXED_REBALANCING_THRESHOLD_PCT,
+                    )
+                     st.session_state.rebalancing_umschichtung = turnover
+                 else:
+                     sim_data, hist_returns, final_values = portfolio_logic.run_portfolio_simulation(
+                        assets=assets_to_simulate,
+                        start_date=st.session_state.sim_start_date,
+                        end_date=st.session_state.sim_end_date,
+                        ausgabeaufschlag_pct=st.session_state.cost_ausgabe,
+                        managementgebuehr_pa_pct=st.session_state.cost_management,
+                        depotgebuehr_pa_eur=st.session_state.cost_depot,
+                        trading_days=FIXED_TRADING_DAYS_ONLY,
+                    )
                  if sim_data is not None:
                      st.session_state.simulations_daten = sim_data
                      st.session_state.historical_returns_pa = hist_returns
@@ -747,7 +776,7 @@ def render():
                          "einzahlung": start_capital_from_table
                      }
                      
-                     st.session_state.prognose_daten = prognose_logic.run_forecast(
+                     st.session_state.prognose_daten = _run_prognose(
                          start_values=start_vals,
                          assets=st.session_state.assets,
                          prognose_jahre=st.session_state.prognose_jahre,
@@ -758,7 +787,9 @@ def render():
                          expected_asset_returns_pa=st.session_state.prognosis_assumptions_pa,
                          asset_final_values=st.session_state.asset_final_values,
                          expected_volatility_pa=FIXED_VOLATILITY,
-                         n_simulations=FIXED_N_SIMULATIONS
+                         n_simulations=FIXED_N_SIMULATIONS,
+                         monatliche_schritte=FIXED_PROGNOSE_MONATLICH,
+                         seed=FIXED_PROGNOSE_SEED,
                      )
                      
                      st.session_state.last_calc_state = calc_relevant_state
@@ -948,6 +979,24 @@ def render():
                 st.markdown("<div style='margin-top: 10px;'></div>", unsafe_allow_html=True)
                 render_finish_button("hist")
 
+            # Umschichtungen je Rebalancing-Termin (nur bei aktivem Rebalancing)
+            turnover = st.session_state.get("rebalancing_umschichtung")
+            if FIXED_REBALANCING and turnover is not None and not turnover.empty:
+                with st.expander(f"🔄 Rebalancing-Umschichtungen ({len(turnover)} Termine)"):
+                    st.metric(
+                        "Umschichtung gesamt",
+                        f"€ {turnover['Umschichtung (€)'].sum():,.2f}",
+                        help="Summe der umgeschichteten Beträge über alle Rebalancing-Termine (Käufe = Verkäufe)."
+                    )
+                    st.dataframe(
+                        turnover.style.format({
+                            "Portfoliowert (€)": "€ {:,.2f}",
+                            "Umschichtung (€)": "€ {:,.2f}",
+                            "Umschichtung (%)": "{:,.2f} %",
+                        }).format_index(lambda day: day.strftime("%d.%m.%Y")),
+                        use_container_width=True,
+                    )
+
 
 
         # === SUB-TAB: ZUKUNFTSPROGNOSE ===
@@ -981,7 +1030,7 @@ def render():
                     "einzahlung": start_capital_from_table
                 }
                 
-                st.session_state.prognose_daten = prognose_logic.run_forecast(
+                st.session_state.prognose_daten = _run_prognose(
                     start_values=start_vals,
                     assets=st.session_state.assets,
                     prognose_jahre=st.session_state.prognose_jahre,
@@ -992,7 +1041,9 @@ def render():
                     expected_asset_returns_pa=current_assumptions,
                     asset_final_values=st.session_state.asset_final_values,
                     expected_volatility_pa=FIXED_VOLATILITY,
-                    n_simulations=FIXED_N_SIMULATIONS
+                    n_simulations=FIXED_N_SIMULATIONS,
+                    monatliche_schritte=FIXED_PROGNOSE_MONATLICH,
+                    seed=FIXED_PROGNOSE_SEED,
                 )
 
             # Nur noch Jahre und Rendite Inputs
@@ -72,23 +72,13 @@ def render():
                 
                 status_text.write("⏳ Starte Pre-loading... Dies kann einige Minuten dauern.")
                 
-                from .catalog import KATALOG
-                from . import backend_simulation
-                from datetime import date
-                import time
+                def show_progress(done, total, ticker, ok):
+                    status_text.write(f"Verarbeite {done}/{total}: **{ticker}**")
+                    progress_bar.progress(done / total)
+                    if not ok:
+                        st.error(f"Fehler bei {ticker}: keine Daten")
                 
-                tickers = [v for k, v in KATALOG.items() if v]
-                total = len(tickers)
-                
-                for i, ticker in enumerate(tickers, 1):
-                    status_text.write(f"Verarbeite {i}/{total}: **{ticker}**")
-                    try:
-                        backend_simulation.load_data(ticker, date(2000, 1, 1), date.today())
-                    except Exception as e:
-                        st.error(f"Fehler bei {ticker}: {e}")
-                    
-                    progress_bar.progress(i / total)
-                    time.sleep(0.05) 
+                preload_all_data(progress_callback=show_progress)
                     
                 status_text.write("✅ **Pre-loading abgeschlossen!** Alle Daten sind nun lokal gespeichert.")
                 st.balloons()
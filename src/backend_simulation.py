@@ -1,127 +1,297 @@
-import yfinance as yf
 import pandas as pd
 from datetime import date, timedelta
 import streamlit as st
 import numpy as np
-import os
 
-#  CACHE KONFIGURATION 
-CACHE_DIR = os.path.join(os.path.dirname(__file__), "data", "cache")
-os.makedirs(CACHE_DIR, exist_ok=True)
+from .price_store import get_store, merge_close_data
+from . import price_panel
+from . import metadata_index
+from . import sim_kernel
+from .data_provider import get_provider
+from .inflation import calculate_inflation_series
+
+# Überlappung (Kalendertage) beim Nachladen, um nachträgliche Split-/Dividenden-Anpassungen
+# der (adjustierten) yfinance-Kurse zu erkennen
+DELTA_OVERLAP_DAYS = 10
 
-@st.cache_data
 def load_data(isin: str, start_date: date, end_date: date) -> pd.DataFrame | None:
     """
     Holt die historischen Kursdaten für eine gegebene ISIN (oder Ticker).
-    Prüft zuerst im lokalen Cache (CSV), ob Daten für den Zeitraum vorhanden sind.
+    Deckt das vorab gebaute Kurs-Panel den Zeitraum ab, kommen die Kurse von dort.
+    Aus Panel und Cache kommen nur die echten Handelstage des Tickers (keine vorwärts gefüllten
+    Tage anderer Börsen); trading_days=True in den Simulationen baut auf diesem Index auf.
+    Sonst wird im lokalen Binär-Cache (eine Datei pro Ticker) gesucht;
+    fehlt nur ein Teil (z.B. die letzten Tage), wird nur dieser Teil nachgeladen.
     """
-    # 1. Suche nach allen Cache-Dateien für diesen Ticker
-    # Format: {isin}_{start}_{end}.csv
-    cache_files = []
-    if os.path.exists(CACHE_DIR):
-        for filename in os.listdir(CACHE_DIR):
-            if filename.startswith(isin + "_") and filename.endswith(".csv"):
-                cache_files.append(filename)
-    
-    # 2. Prüfe, ob eine der Cache-Dateien den gewünschten Zeitraum abdeckt
-    for cache_file in cache_files:
-        try:
-            # Parse Dateinamen: TICKER_START_END.csv
-            parts = cache_file.replace(".csv", "").split("_")
-            if len(parts) >= 3:
-                # Letzten 3 Teile sind: YYYY-MM-DD, YYYY-MM-DD (Start, End)
-                cached_end_str = parts[-1]
-                cached_start_str = parts[-2]
-                
-                try:
-                    cached_start = date.fromisoformat(cached_start_str)
-                    cached_end = date.fromisoformat(cached_end_str)
-                    
-                    # Prüfe, ob der gewünschte Zeitraum innerhalb des gecachten liegt
-                    if cached_start <= start_date and cached_end >= end_date:
-                        print(f"Lade {isin} aus lokalem Cache ({cache_file})...")
-                        cache_path = os.path.join(CACHE_DIR, cache_file)
-                        
-                        cached_data = pd.read_csv(cache_path, index_col=0, parse_dates=True)
-                        
-                        # Filtere auf den gewünschten Zeitraum
-                        mask = (cached_data.index >= pd.to_datetime(start_date)) & \
-                               (cached_data.index <= pd.to_datetime(end_date))
-                        filtered_data = cached_data.loc[mask]
-                        
-                        if "Close" in filtered_data.columns:
-                            return filtered_data[["Close"]]
-                        return filtered_data
-                except ValueError:
-                    continue
-        except Exception as e:
-            print(f"Fehler beim Lesen des Caches {cache_file}: {e}")
-            continue
+    panel_data = price_panel.slice_panel(isin, start_date, end_date)
+    if panel_data is not None:
+        return panel_data
+    return _load_data_cached(isin, start_date, end_date, get_provider().name)
 
-    # 3. Wenn nicht im Cache, von yfinance laden
-    # Ticker Lookup für yfinance (da yfinance meist Ticker braucht)
-    from .catalog import ISIN_TO_TICKER
-    ticker_to_load = ISIN_TO_TICKER.get(isin, isin) # Fallback auf ISIN selbst, falls kein Mapping
-    
-    print(f"Lade Daten für {isin} (Ticker: {ticker_to_load}) von yfinance ({start_date} bis {end_date})...")
 
-    try:
-        data = yf.download(ticker_to_load, start=start_date, end=end_date)
+def load_many(isins: list[str], start_date: date, end_date: date) -> dict[str, pd.DataFrame | None]:
+    """
+    Holt die historischen Kursdaten für mehrere ISINs (oder Ticker) auf einmal.
+    Panel- und Cache-Treffer werden lokal aufgelöst, alle fehlenden Daten mit EINEM
+    gebündelten Provider-Download pro Zeitfenster geladen.
+    Gibt ein Dict ISIN -> DataFrame (oder None, falls keine Daten) zurück.
+    """
+    results = {}
+    missing = []
+    for isin in dict.fromkeys(i for i in isins if i):
+        panel_data = price_panel.slice_panel(isin, start_date, end_date)
+        if panel_data is not None:
+            results[isin] = panel_data
+        else:
+            missing.append(isin)
+    if missing:
+        results.update(_load_many_cached(missing, start_date, end_date, get_provider().name))
+    return {isin: results.get(isin) for isin in isins if isin}
+
+
+# Streamlit-Cache nur für Daten außerhalb des Panels (st.cache_data liefert Kopien pro Aufruf).
+# provider_name ist Teil des Cache-Schlüssels, damit synthetische und echte Kurse nie vermischt werden.
+@st.cache_data
+def _load_data_cached(isin: str, start_date: date, end_date: date, provider_name: str) -> pd.DataFrame | None:
+    return _load_many([isin], start_date, end_date).get(isin)
+
+
+@st.cache_data
+def _load_many_cached(isins: list[str], start_date: date, end_date: date, provider_name: str) -> dict[str, pd.DataFrame | None]:
+    return _load_many(isins, start_date, end_date)
 
-        if data.empty:
-            print(f"Keine Daten gefunden für Ticker: {isin}")
-            return None
 
-        #  FIX FÜR MULTI-INDEX SPALTEN 
-        if isinstance(data.columns, pd.MultiIndex):
-            close_col_name = [col for col in data.columns if col[0] == "Close"][0]
-            close_data = data[[close_col_name]].copy()
-            close_data.columns = ["Close"]
+def _load_many(isins: list[str], start_date: date, end_date: date) -> dict[str, pd.DataFrame | None]:
+    store = get_store()
+    results = {}
+    cold = []
+    stale = {}
+
+    # 1. Cache prüfen (Manifest-Lookup, alte CSV-Dateien werden dabei automatisch migriert)
+    for isin in dict.fromkeys(i for i in isins if i):
+        cached = _read_cached(store, isin)
+        if cached is None:
+            cold.append(isin)
+            continue
+
+        cached_data, cached_start, cached_end = cached
+        if cached_start <= start_date and cached_end >= end_date:
+            print(f"Lade {isin} aus lokalem Cache ({cached_start} bis {cached_end})...")
+            results[isin] = _slice_range(cached_data, start_date, end_date)
         else:
-            close_data = data[["Close"]].copy()
+            stale[isin] = cached
+
+    # 2. Fehlende Zeitfenster sammeln und pro Fenster gebündelt vom Provider laden
+    #    (kalter Cache: ganzer Zeitraum; veralteter Cache: nur fehlender Anfang/fehlendes Ende)
+    windows = {}
+    for isin in cold:
+        windows.setdefault((start_date, end_date), []).append(isin)
+    for isin, (_, cached_start, cached_end) in stale.items():
+        for window in _missing_windows(cached_start, cached_end, start_date, end_date):
+            if window is not None:
+                windows.setdefault(window, []).append(isin)
+
+    downloaded = {}
+    for (window_start, window_end), window_isins in windows.items():
+        batch = _download_close_many(window_isins, window_start, window_end)
+        for isin, close_data in batch.items():
+            downloaded[(isin, window_start, window_end)] = close_data
+
+    # 3. Kalter Cache: Download übernehmen und speichern
+    for isin in cold:
+        close_data = downloaded.get((isin, start_date, end_date))
+        if close_data is not None:
+            _store_close_data(isin, close_data, start_date, end_date)
+        results[isin] = close_data
+
+    # 4. Veralteter Cache: Teilstücke anfügen und als eine Datei speichern
+    for isin, (cached_data, cached_start, cached_end) in stale.items():
+        extended = _extend_cached_data(
+            isin, cached_data, cached_start, cached_end, start_date, end_date, downloaded
+        )
+        if extended is not None:
+            close_data, new_start, new_end = extended
+            if (new_start, new_end) != (cached_start, cached_end):
+                _store_close_data(isin, close_data, new_start, new_end)
+            results[isin] = _slice_range(close_data, start_date, end_date)
+            continue
 
-        close_data.index = pd.to_datetime(close_data.index)
-        close_data["Close"] = close_data["Close"].ffill()
+        # Anpassung nicht konsistent -> gesamten (vereinigten) Zeitraum neu laden
+        full_start, full_end = min(start_date, cached_start), max(end_date, cached_end)
+        close_data = _download_close_many([isin], full_start, full_end).get(isin)
+        if close_data is not None:
+            _store_close_data(isin, close_data, full_start, full_end)
+            close_data = _slice_range(close_data, start_date, end_date)
+        results[isin] = close_data
 
-        # 4. Erfolgreich geladene Daten im Cache speichern
-        try:
-            cache_filename = f"{isin}_{start_date}_{end_date}.csv".replace(" ", "_")
-            cache_path = os.path.join(CACHE_DIR, cache_filename)
-            close_data.to_csv(cache_path)
-            print(f"Daten für {isin} im Cache gespeichert ({cache_filename}).")
-        except Exception as e:
-            print(f"Fehler beim Speichern des Caches für {isin}: {e}")
+    return {isin: results.get(isin) for isin in isins if isin}
 
-        return close_data
 
+def _read_cached(store, isin: str) -> tuple[pd.DataFrame, date, date] | None:
+    """Liest eine Reihe aus dem Cache, falls das Manifest sie kennt (Fehler werden nur geloggt)."""
+    if store.coverage(isin) is None:
+        return None
+    try:
+        return store.read(isin)
     except Exception as e:
-        print(f"Ein Fehler bei yfinance ist aufgetreten: {e}")
+        print(f"Fehler beim Lesen des Caches für {isin}: {e}")
         return None
 
 
-@st.cache_data
+def _store_close_data(isin: str, close_data: pd.DataFrame, start_date: date, end_date: date) -> None:
+    """Speichert eine Kursreihe im Cache (Fehler werden nur geloggt)."""
+    try:
+        get_store().write(isin, close_data, start_date, end_date)
+        print(f"Daten für {isin} im Cache gespeichert ({start_date} bis {end_date}).")
+    except Exception as e:
+        print(f"Fehler beim Speichern des Caches für {isin}: {e}")
+
+
+def _missing_windows(
+    cached_start: date, cached_end: date, start_date: date, end_date: date
+) -> tuple[tuple[date, date] | None, tuple[date, date] | None]:
+    """
+    Download-Fenster (Ende, Anfang) für den fehlenden Teil einer gecachten Reihe.
+    Beide Fenster überlappen den Cache um DELTA_OVERLAP_DAYS Tage.
+    """
+    overlap = timedelta(days=DELTA_OVERLAP_DAYS)
+    tail_window = None
+    head_window = None
+    if end_date > cached_end:
+        tail_window = (max(cached_end - overlap, cached_start), end_date)
+    if start_date < cached_start:
+        head_window = (start_date, min(cached_start + overlap, cached_end))
+    return tail_window, head_window
+
+
+def _adjustment_ratio(reference: pd.DataFrame, update: pd.DataFrame) -> float | None:
+    """
+    Verhältnis update/reference der Schlusskurse auf den gemeinsamen Tagen.
+    Gibt None zurück, wenn das Verhältnis nicht konstant ist (Anpassung innerhalb der Überlappung).
+    """
+    common = reference.index.intersection(update.index)
+    if common.empty:
+        return 1.0
+    ratios = (update.loc[common, "Close"] / reference.loc[common, "Close"]).dropna()
+    if ratios.empty:
+        return 1.0
+    ratio = float(ratios.median())
+    if not np.isfinite(ratio) or ratio <= 0 or (ratios / ratio - 1.0).abs().max() > 1e-4:
+        return None
+    return ratio
+
+
+def _extend_cached_data(
+    isin: str,
+    cached_data: pd.DataFrame,
+    cached_start: date,
+    cached_end: date,
+    start_date: date,
+    end_date: date,
+    downloaded: dict,
+) -> tuple[pd.DataFrame, date, date] | None:
+    """
+    Ergänzt eine gecachte Reihe um fehlenden Anfang und/oder fehlendes Ende (Delta-Download).
+    downloaded enthält die bereits geladenen Teilstücke je (ISIN, Start, Ende) aus _missing_windows
+    (None = Zeitraum bestätigt leer, fehlender Schlüssel = Download fehlgeschlagen).
+    Jeder Teil überlappt den Cache: Hat yfinance die Historie seit dem letzten Download
+    angepasst (Split/Dividende), wird der ältere Teil entsprechend skaliert.
+    Gibt (Reihe, Start, Ende) zurück oder None, falls die Anpassung nicht konsistent ist.
+    """
+    close_data = cached_data
+    new_start, new_end = cached_start, cached_end
+    tail_window, head_window = _missing_windows(cached_start, cached_end, start_date, end_date)
+
+    # A) Fehlendes Ende: neue Kurse sind maßgeblich -> Cache auf deren Basis skalieren
+    if tail_window is not None:
+        tail = downloaded.get((isin, *tail_window))
+        # Leeres Ergebnis: (noch) keine neuen Kurse -> Zeitraum NICHT erweitern, später erneut versuchen
+        if tail is not None:
+            ratio = _adjustment_ratio(close_data, tail)
+            if ratio is None:
+                return None
+            if ratio != 1.0:
+                print(f"Historie von {isin} angepasst (Faktor {ratio:.6f}).")
+                close_data = close_data * ratio
+            close_data = merge_close_data(close_data, tail)
+            new_end = end_date
+
+    # B) Fehlender Anfang: neue Kurse auf die Basis des Caches skalieren
+    if head_window is not None:
+        head_key = (isin, *head_window)
+        head = downloaded.get(head_key)
+        if head is not None:
+            ratio = _adjustment_ratio(close_data, head)
+            if ratio is None:
+                return None
+            head = head / ratio
+            close_data = merge_close_data(head, close_data)
+            new_start = start_date
+        elif head_key in downloaded:
+            # Bestätigt leer: vor dem Cache-Beginn gibt es keine Kurse (z.B. späterer Börsengang)
+            new_start = start_date
+        # Download fehlgeschlagen -> Zeitraum NICHT erweitern, später erneut versuchen
+
+    return close_data, new_start, new_end
+
+
+def _slice_range(close_data: pd.DataFrame, start_date: date, end_date: date) -> pd.DataFrame:
+    """Schneidet eine (sortierte) Kursreihe auf den gewünschten Zeitraum zu."""
+    mask = (close_data.index >= pd.to_datetime(start_date)) & \
+           (close_data.index <= pd.to_datetime(end_date))
+    return close_data.loc[mask, ["Close"]]
+
+
+def _download_close_many(isins: list[str], start_date: date, end_date: date) -> dict[str, pd.DataFrame | None]:
+    """
+    Lädt die Schlusskurse mehrerer Ticker mit einem gebündelten Download des aktiven Providers
+    und teilt das Ergebnis pro ISIN auf. ISINs ohne Kurse im Zeitraum sind mit None enthalten
+    (vom Provider bestätigt leer), ISINs mit fehlgeschlagenem Download fehlen im Ergebnis.
+    """
+    # Ticker Lookup für yfinance (da yfinance meist Ticker braucht)
+    from .catalog import ISIN_TO_TICKER
+    isins_by_ticker = {}
+    for isin in isins:
+        ticker = ISIN_TO_TICKER.get(isin, isin) # Fallback auf ISIN selbst, falls kein Mapping
+        isins_by_ticker.setdefault(ticker, []).append(isin)
+    tickers_to_load = list(isins_by_ticker)
+
+    provider = get_provider()
+    print(f"Lade Daten für {len(tickers_to_load)} Ticker ({', '.join(tickers_to_load)}) von {provider.name} ({start_date} bis {end_date})...")
+
+    downloaded = provider.download_close(tickers_to_load, start_date, end_date)
+
+    results = {}
+    for ticker, ticker_isins in isins_by_ticker.items():
+        close_data = downloaded.get(ticker)
+        if close_data is None:
+            print(f"Download fehlgeschlagen für Ticker: {ticker}")
+            continue
+        if close_data.empty:
+            print(f"Keine Daten gefunden für Ticker: {ticker}")
+            close_data = None
+        for isin in ticker_isins:
+            results[isin] = close_data
+    return results
+
+
 def validate_and_get_info(ticker: str) -> (bool, str | None):
     """
     Prüft, ob ein Ticker gültig ist und holt den Namen.
     Gibt (True, "Ticker Name") oder (False, "Fehlermeldung") zurück.
+    Katalog-Titel und bereits geprüfte Eingaben kommen aus dem persistenten Metadaten-Index
+    (ungültige Eingaben für metadata_index.NEGATIVE_TTL_SECONDS), nur Neues geht an den Provider.
     """
     if not ticker:
         return (False, "Kein Ticker/ISIN angegeben.")
     try:
-        ticker_obj = yf.Ticker(ticker)
-        
-        # (DEBUG) Versuche, .info abzurufen.
-        info = ticker_obj.info
-
-        # (DEBUG) Prüfe, ob .history() leer ist.
-        history_data = ticker_obj.history(period="1d")
-        
-        if history_data.empty:
+        info = metadata_index.lookup(ticker)
+
+        if info is None:
             print(f"Validierung fehlgeschlagen: Keine Daten für {ticker}")
-            return (False, f"yfinance fand keine 'history'-Daten für '{ticker}'.")
+            return (False, f"{get_provider().name} fand keine 'history'-Daten für '{ticker}'.")
 
-        # Versuche, den Namen zu bekommen
-        name = info.get("longName", info.get("shortName"))
+        name = info.get("name")
 
         # Wenn kein Name da ist, aber der Ticker gültig, nimm den Ticker selbst
         if not name:
@@ -132,7 +302,7 @@ def validate_and_get_info(ticker: str) -> (bool, str | None):
 
     except Exception as e:
         print(f"Validierungs-Exception für {ticker}: {e}")
-        return (False, f"yfinance Exception: {e}")
+        return (False, f"{get_provider().name} Exception: {e}")
 
 
 @st.cache_data
@@ -145,154 +315,130 @@ def run_simulation(
     inflation_input: float | pd.Series,
     ausgabeaufschlag_pct: float,
     managementgebuehr_pa_pct: float,
+    trading_days: bool = False,
 ) -> pd.DataFrame:
     """
     Führt eine Sparplan-Simulation durch.
     inflation_input: Entweder ein Float (p.a. %) für Prognosen
                      ODER eine pd.Series (Index=Date, Value=Factor) für exakte Historie.
+    trading_days: nur Handelstage statt jedes Kalendertags ausgeben (gleiche Werte an diesen Tagen).
+                  Handelstage sind die Zeilen von data, d.h. die Tage mit echtem Kurs (siehe load_data).
+    Die Rechnung erfolgt im NumPy-Kern (sim_kernel.simulate_plan); hier nur die DataFrame-Umwandlung.
     """
 
-    #  1. KOSTENFAKTOREN 
-    cost_factor = 1.0 - (ausgabeaufschlag_pct / 100.0)
-
-    # TÄGLICHER Managementgebühr-Faktor
-    daily_mgmt_fee_factor = (1.0 - (managementgebuehr_pa_pct / 100.0)) ** (1 / 365.0)
+    if data is None or data.empty:
+        return pd.DataFrame()
 
-    #  2. INTERVALL-LOGIK 
-    if interval == "monatlich":
-        resample_code = "MS"
-    elif interval == "vierteljährlich":
-        resample_code = "QS"
-    elif interval == "jährlich":
-        resample_code = "YS"
+    if isinstance(inflation_input, pd.Series):
+        # Historische Zeitreihe -> (Tagesnummern, Faktoren) für den Kern
+        inflation = (sim_kernel.to_days(inflation_input.index), inflation_input.to_numpy(dtype="float64"))
     else:
-        resample_code = "MS"
-
-    #  DATEN VORBEREITUNG 
-    full_date_range = pd.date_range(
-        start=data.index.min(), end=data.index.max(), freq="D"
+        inflation = inflation_input
+
+    calendar_days, invested, nominal, real = sim_kernel.simulate_plan(
+        days=sim_kernel.to_days(data.index),
+        prices=data["Close"].to_numpy(dtype="float64"),
+        periodic_investment=periodic_investment,
+        lump_sum=lump_sum,
+        interval=interval,
+        inflation=inflation,
+        ausgabeaufschlag_pct=ausgabeaufschlag_pct,
+        managementgebuehr_pa_pct=managementgebuehr_pa_pct,
+        trading_days=trading_days,
     )
-    data = data.reindex(full_date_range)
-    data["Close"] = data["Close"].ffill()
-    data = data.dropna(subset=["Close"])
-
-    if data.empty:
+    if len(calendar_days) == 0:
         return pd.DataFrame()
 
-    # 3. Erstelle die periodischen Daten (Zeitpunkte der Sparrate)
-    periodic_data = data.resample(resample_code).first()
-    periodic_data = periodic_data.rename(columns={"Close": "Price"})
-    periodic_data = periodic_data.dropna(subset=["Price"])
-
-    # Die Investitionssumme pro Periode (mit Ausgabeaufschlag)
-    periodic_data["Investment"] = periodic_investment
-    periodic_data["NetInvestment"] = periodic_data["Investment"] * cost_factor
-
-    # 4. Berechne die laufenden Käufe
-    periodic_data["Shares_Bought"] = 0.0
-    periodic_data["TotalInvestment_Periodic"] = 0.0
-    periodic_data["TotalShares_Periodic"] = 0.0
-    
-    for i in range(len(periodic_data)):
-        current_price = periodic_data.iloc[i]["Price"]
-
-        if i == 0:
-            net_inv = 0.0
-            gross_inv = 0.0
-        else:
-            net_inv = periodic_data.iloc[i]["NetInvestment"]
-            gross_inv = periodic_data.iloc[i]["Investment"]
+    # FIX: Entferne Zeilen mit 0-Werten am Anfang/Ende, um Grafik-Drops zu vermeiden
+    keep = nominal > 1.0
+    kept_days = calendar_days[keep]
+    # Zusammenhängender Bereich -> Tagesfrequenz behalten (wie beim Slicen eines täglichen Index)
+    freq = "D" if not trading_days and np.all(np.diff(kept_days) == 1) else None
+    final_daily_df = pd.DataFrame(
+        {
+            "Einzahlungen (brutto)": invested[keep],
+            "Portfolio (nominal)": nominal[keep],
+            "Portfolio (real)": real[keep],
+        },
+        index=pd.DatetimeIndex(sim_kernel.from_days(kept_days), freq=freq),
+    )
 
-        if current_price > 0:
-            shares_bought = net_inv / current_price
-        else:
-            shares_bought = 0
+    return final_daily_df
 
-        periodic_data.iloc[i, periodic_data.columns.get_loc("Shares_Bought")] = shares_bought
 
-        if i == 0:
-            periodic_data.iloc[i, periodic_data.columns.get_loc("TotalInvestment_Periodic")] = gross_inv
-            periodic_data.iloc[i, periodic_data.columns.get_loc("TotalShares_Periodic")] = shares_bought
-        else:
-            periodic_data.iloc[i, periodic_data.columns.get_loc("TotalInvestment_Periodic")] = periodic_data.iloc[i-1]["TotalInvestment_Periodic"] + gross_inv
-            periodic_data.iloc[i, periodic_data.columns.get_loc("TotalShares_Periodic")] = periodic_data.iloc[i-1]["TotalShares_Periodic"] + shares_bought
-
-    #  5. ÜBERTRAGUNG AUF TÄGLICHE BASIS 
-    daily_data_with_portfolio = data.copy()
-
-    daily_data_with_portfolio = pd.merge_asof(
-        daily_data_with_portfolio,
-        periodic_data[["TotalShares_Periodic", "TotalInvestment_Periodic"]],
-        left_index=True,
-        right_index=True,
-        direction="backward",
-    )
+#  SIMULATION MIT KOMPAKTEM CACHE-SCHLÜSSEL
+# run_simulation wird mit DataFrame und Inflations-Series aufgerufen; st.cache_data hasht beide
+# bei jedem Aufruf. simulate_asset identifiziert die Eingaben stattdessen über
+# (ISIN, Zeitraum, Datenversion, Parameter) – Daten und Inflation werden erst bei einem Miss geladen.
 
-    daily_data_with_portfolio["TotalShares_Periodic"] = daily_data_with_portfolio["TotalShares_Periodic"].fillna(0)
-    daily_data_with_portfolio["TotalInvestment_Periodic"] = daily_data_with_portfolio["TotalInvestment_Periodic"].fillna(0)
-    
-    # Fülle die 0-Werte am Anfang mit dem Wert der ersten Periode, 
-    # Nutzen ffill() für Shares/Investment, falls irgendwo NaN auftaucht
-    daily_data_with_portfolio["TotalShares_Periodic"] = daily_data_with_portfolio["TotalShares_Periodic"].replace(to_replace=0, method='ffill') 
-    
-    #  6. ADDITION DES EINMALERLAGS (LUMP SUM) 
-    lump_sum_shares = 0.0
-    if lump_sum > 0 and not data.empty:
-        # Wir nehmen den Close vom ERSTEN VERFÜGBAREN TAG im DataFrame
-        first_valid_idx = data["Close"].first_valid_index()
-        if first_valid_idx:
-            first_day_price = data.loc[first_valid_idx, "Close"]
-            net_lump_sum = lump_sum * cost_factor
-            if first_day_price > 0:
-                lump_sum_shares = net_lump_sum / first_day_price
-
-    # Berechnung der Gesamt-Anteile
-    daily_data_with_portfolio["TotalShares"] = daily_data_with_portfolio["TotalShares_Periodic"] + lump_sum_shares
-    daily_data_with_portfolio["TotalInvestment"] = daily_data_with_portfolio["TotalInvestment_Periodic"] + lump_sum
-    
-    # FIX: Forward Fill für die Anteile und Investments bis zum Ende, falls Perioden-Logik aufhört aber Daten weiterlaufen.
-    daily_data_with_portfolio["TotalShares"] = daily_data_with_portfolio["TotalShares"].ffill()
-    daily_data_with_portfolio["TotalInvestment"] = daily_data_with_portfolio["TotalInvestment"].ffill()
-    
-    #  7. BERECHNE FINALEN WERT & GEBÜHREN 
-
-    # 7a. Nominalwert
-    daily_data_with_portfolio["Portfolio (nominal)"] = daily_data_with_portfolio["TotalShares"] * daily_data_with_portfolio["Close"]
-
-    # 7b. Managementgebühr
-    mgmt_fee_series = pd.Series(
-        daily_mgmt_fee_factor, index=daily_data_with_portfolio.index
-    ).cumprod()
-    daily_data_with_portfolio["Portfolio (nominal)"] = (
-        daily_data_with_portfolio["Portfolio (nominal)"] * mgmt_fee_series
-    )
+def data_version(isin: str, start_date: date, end_date: date) -> str | None:
+    """
+    Version der Kursdaten, die load_data für den Zeitraum liefern würde:
+    Panel-Version, falls das Panel den Zeitraum abdeckt, sonst die Schreibversion im Kurs-Cache.
+    Ändert sich bei jedem Nachladen, womit abgeleitete Ergebnisse automatisch neu berechnet werden.
+    Gibt None zurück, falls der Zeitraum noch nicht (vollständig) im Cache liegt.
+    """
+    version = price_panel.panel_version(isin, start_date, end_date)
+    if version is not None:
+        return f"panel:{version}"
+    store = get_store()
+    coverage = store.coverage(isin)
+    if coverage is None or coverage[0] > start_date or coverage[1] < end_date:
+        return None
+    return f"{get_provider().name}:{store.version(isin)}"
 
-    # 7c. Inflation / Realwert (NEU ANGEPASST)
-    if isinstance(inflation_input, pd.Series):
-        # Fall A: Historische Zeitreihe übergeben -> Reindex auf Daten-Index
-        # ffill füllt Lücken (z.B. Wochenenden), fillna(1.0) für Startwerte
-        inflation_series = inflation_input.reindex(daily_data_with_portfolio.index, method='ffill').fillna(1.0)
-    else:
-        # Fall B: Fixer Float Wert (Prognose) -> Alte Berechnung
-        daily_inflation_factor = (1.0 + (inflation_input / 100.0)) ** (1 / 365.0)
-        inflation_series = pd.Series(
-            daily_inflation_factor, index=daily_data_with_portfolio.index
-        ).cumprod()
-
-    daily_data_with_portfolio["Portfolio (real)"] = (
-        daily_data_with_portfolio["Portfolio (nominal)"] / inflation_series
+
+def simulate_asset(
+    isin: str,
+    start_date: date,
+    end_date: date,
+    periodic_investment: float,
+    lump_sum: float,
+    interval: str,
+    ausgabeaufschlag_pct: float,
+    managementgebuehr_pa_pct: float,
+    inflation_pa: float | None = None,
+    trading_days: bool = False,
+) -> pd.DataFrame:
+    """
+    Sparplan-Simulation einer ISIN über [start_date, end_date] wie run_simulation.
+    inflation_pa: feste Inflation p.a. (%) ODER None für die historische Reihe des Zeitraums.
+    Gecacht wird nur auf dem kompakten Schlüssel; Daten werden erst bei einem Miss geladen.
+    Gibt ein leeres DataFrame zurück, falls keine Kursdaten verfügbar sind.
+    """
+    version = data_version(isin, start_date, end_date)
+    if version is None:
+        # Noch nicht im Cache: einmal laden (schreibt den Cache), danach ist die Version bekannt
+        load_data(isin, start_date, end_date)
+        version = data_version(isin, start_date, end_date)
+    return _simulate_asset_cached(
+        isin, start_date, end_date, version,
+        periodic_investment, lump_sum, interval, ausgabeaufschlag_pct, managementgebuehr_pa_pct,
+        inflation_pa, trading_days,
     )
 
-    # 8. Rückgabe & Cleanup
-    final_daily_df = daily_data_with_portfolio[
-        ["TotalInvestment", "Portfolio (nominal)", "Portfolio (real)"]
-    ].copy()
-    
-    # FIX: Entferne Zeilen mit 0-Werten am Anfang/Ende, um Grafik-Drops zu vermeiden
-    final_daily_df = final_daily_df[final_daily_df["Portfolio (nominal)"] > 1.0]
 
-    final_daily_df = final_daily_df.rename(
-        columns={"TotalInvestment": "Einzahlungen (brutto)"}
+@st.cache_data
+def _simulate_asset_cached(
+    isin: str,
+    start_date: date,
+    end_date: date,
+    version: str | None,
+    periodic_investment: float,
+    lump_sum: float,
+    interval: str,
+    ausgabeaufschlag_pct: float,
+    managementgebuehr_pa_pct: float,
+    inflation_pa: float | None,
+    trading_days: bool,
+) -> pd.DataFrame:
+    data = load_data(isin, start_date, end_date)
+    if inflation_pa is None:
+        inflation_input = calculate_inflation_series(pd.date_range(start=start_date, end=end_date, freq="D"))
+    else:
+        inflation_input = inflation_pa
+    # Ohne den Cache von run_simulation (sonst würden die Eingaben doch wieder gehasht)
+    return run_simulation.__wrapped__(
+        data, periodic_investment, lump_sum, interval, inflation_input,
+        ausgabeaufschlag_pct, managementgebuehr_pa_pct, trading_days,
     )
-
-    return final_daily_df
\ No newline at end of file
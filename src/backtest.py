@@ -0,0 +1,211 @@
+import numpy as np
+import pandas as pd
+
+from . import sim_kernel
+from . import backend_simulation
+from . import inflation
+from .price_store import get_store
+
+#  ROLLIERENDER BACKTEST (alle Startmonate)
+# Wertet den Sparplan aus run_simulation für jeden möglichen Startmonat der Kurshistorie aus.
+# Start ist jeweils der erste Handelstag eines Monats, Ende der erste Handelstag H Monate später;
+# gekauft wird wie in run_simulation zu jedem Periodenbeginn nach dem Start (also H Käufe bei
+# monatlichem Intervall). Statt einer Simulation je Startmonat werden die Anteile pro 1 € Sparrate
+# einmal als Präfixsumme über alle Monate gebildet: Anteile(s, H) = U[s + H] - U[s].
+
+RESULT_COLUMNS = [
+    "Enddatum",
+    "Einzahlungen (brutto)",
+    "Endwert (nominal)",
+    "Endwert (real)",
+    "Rendite p.a. (%)",
+]
+
+# Kennzahlen der Verteilung je Anlagedauer
+SUMMARY_QUANTILES = {
+    "Minimum": 0.0,
+    "5%": 0.05,
+    "25%": 0.25,
+    "Median": 0.5,
+    "75%": 0.75,
+    "95%": 0.95,
+    "Maximum": 1.0,
+}
+
+
+def annualized_returns(end_values: np.ndarray, invested: np.ndarray, first_values: np.ndarray, num_years: np.ndarray) -> np.ndarray:
+    """Vektorisierte Fassung von portfolio_logic._annualized_return (gleiche Sonderfälle)."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        inverse_years = np.where(num_years > 0, 1.0 / np.where(num_years > 0, num_years, 1.0), 0.0)
+        on_invested = (end_values / invested) ** inverse_years - 1
+        on_first_day = (end_values / first_values) ** inverse_years - 1
+    result = np.where((end_values <= 0) | (invested <= 0), -1.0, on_invested)
+    # Nur Einmalerlag ohne Einzahlungen: Rendite auf den Wert am Starttag
+    only_first_day = invested == 0
+    result = np.where(only_first_day, np.where((end_values > 0) & (first_values > 0), on_first_day, 0.0), result)
+    return np.where(num_years > 0, result, 0.0)
+
+
+def _month_grid(days: np.ndarray, prices: np.ndarray, interval: str) -> dict:
+    """
+    Monatsraster der Historie: erster Handelstag je Monat (Startpunkte), Kurs am ersten Kalendertag
+    (Kaufkurs, vorwärts gefüllt) und ob dort eine Sparperiode beginnt.
+    """
+    valid = ~np.isnan(prices)
+    days, prices = days[valid], prices[valid]
+    calendar_days, close = sim_kernel.daily_calendar(days, prices)
+    if len(calendar_days) == 0:
+        return None
+
+    day_months = calendar_days.astype("datetime64[D]").astype("datetime64[M]")
+    first_month = day_months[0]
+    n_months = int((day_months[-1] - first_month).astype("int64")) + 1
+    months = first_month + np.arange(n_months)
+
+    # Erster Kalendertag jedes Monats (der erste Monat beginnt mit dem ersten Kurs)
+    month_first_rows = np.maximum(sim_kernel.to_days(months.astype("datetime64[D]")) - calendar_days[0], 0)
+
+    # Erster Handelstag je Monat; Monate ohne Kurse sind keine möglichen Start-/Endpunkte (-1)
+    trade_months = (days.astype("datetime64[D]").astype("datetime64[M]") - first_month).astype("int64")
+    month_has_trade, first_trade = np.unique(trade_months[days >= calendar_days[0]], return_index=True)
+    trade_rows = np.full(n_months, -1)
+    trade_rows[month_has_trade] = days[days >= calendar_days[0]][first_trade] - calendar_days[0]
+
+    ids = sim_kernel.period_ids(calendar_days[month_first_rows], interval)
+    period_start = np.concatenate(([False], ids[1:] != ids[:-1]))
+    return {
+        "calendar_days": calendar_days,
+        "close": close,
+        "months": months,
+        "trade_rows": trade_rows,
+        "purchase_price": close[month_first_rows],
+        "period_start": period_start,
+    }
+
+
+def rolling_backtest(
+    data: pd.DataFrame,
+    horizons_years: list[int],
+    periodic_investment: float,
+    lump_sum: float,
+    interval: str,
+    ausgabeaufschlag_pct: float,
+    managementgebuehr_pa_pct: float,
+    inflation_pa: float | None = None,
+) -> dict[int, pd.DataFrame]:
+    """
+    Rollierender Backtest über die gesamte Kurshistorie `data` (DataFrame mit 'Close').
+    Für jede Anlagedauer (Jahre) ein DataFrame mit einer Zeile je Startdatum und den Spalten RESULT_COLUMNS.
+    inflation_pa: feste Inflation p.a. (%); None = historische Raten ab dem jeweiligen Startdatum.
+    Die Werte entsprechen run_simulation auf dem Zeitraum [Startdatum, Enddatum] (bis auf Rundung).
+    """
+    grid = _month_grid(sim_kernel.to_days(data.index), data["Close"].to_numpy(dtype="float64"), interval)
+    if grid is None:
+        return {years: pd.DataFrame(columns=RESULT_COLUMNS) for years in horizons_years}
+
+    calendar_days = grid["calendar_days"]
+    close = grid["close"]
+    trade_rows = grid["trade_rows"]
+    cost_factor = 1.0 - (ausgabeaufschlag_pct / 100.0)
+
+    #  1. PRÄFIXSUMMEN: Anteile und Einzahlungen je 1 € Sparrate bis einschließlich Monat m
+    price = grid["purchase_price"]
+    purchase = grid["period_start"]
+    unit_shares = np.zeros(len(price))
+    np.divide(cost_factor, price, out=unit_shares, where=purchase & (price > 0))
+    shares_prefix = np.cumsum(unit_shares)
+    purchases_prefix = np.cumsum(purchase)
+
+    #  2. KOSTEN & INFLATION je Zeile des Gesamtkalenders (relativ zum Startdatum)
+    fee = sim_kernel.fee_curve(len(calendar_days), managementgebuehr_pa_pct)
+    if inflation_pa is None:
+        inflation_series = inflation.calculate_inflation_series(pd.DatetimeIndex(sim_kernel.from_days(calendar_days)))
+        inflation_factors = inflation_series.to_numpy(dtype="float64")
+    else:
+        inflation_factors = sim_kernel.inflation_curve(calendar_days, inflation_pa)
+
+    results = {}
+    for years in horizons_years:
+        horizon = 12 * years
+        starts = np.arange(max(len(trade_rows) - horizon, 0))
+        ends = starts + horizon
+        valid = (trade_rows[starts] >= 0) & (trade_rows[ends] >= 0)
+        starts, ends = starts[valid], ends[valid]
+        start_rows, end_rows = trade_rows[starts], trade_rows[ends]
+        n_days = end_rows - start_rows + 1
+
+        #  3. ENDWERTE aller Startmonate auf einmal
+        lump_shares = 0.0
+        if lump_sum > 0:
+            lump_shares = np.where(close[start_rows] > 0, (lump_sum * cost_factor) / close[start_rows], 0.0)
+        shares = lump_shares + periodic_investment * (shares_prefix[ends] - shares_prefix[starts])
+        invested = lump_sum + periodic_investment * (purchases_prefix[ends] - purchases_prefix[starts])
+        nominal = (shares * close[end_rows]) * fee[n_days - 1]
+        first_nominal = (lump_shares * close[start_rows]) * fee[0]
+
+        if inflation_pa is not None:
+            real = nominal / inflation_factors[n_days - 1]
+        else:
+            # calculate_inflation_series ist auf den ersten Tag normiert -> Verhältnis Ende/Start
+            real = nominal / (inflation_factors[end_rows] / inflation_factors[start_rows])
+
+        start_dates = sim_kernel.from_days(calendar_days[start_rows])
+        end_dates = sim_kernel.from_days(calendar_days[end_rows])
+        num_years = (end_rows - start_rows) / 365.25
+        results[years] = pd.DataFrame(
+            {
+                "Enddatum": end_dates,
+                "Einzahlungen (brutto)": invested,
+                "Endwert (nominal)": nominal,
+                "Endwert (real)": real,
+                "Rendite p.a. (%)": annualized_returns(nominal, invested, first_nominal, num_years) * 100,
+            },
+            index=pd.DatetimeIndex(start_dates, name="Startdatum"),
+        )
+    return results
+
+
+def summarize_backtest(results: dict[int, pd.DataFrame], column: str = "Endwert (nominal)") -> pd.DataFrame:
+    """
+    Verteilung einer Ergebnis-Spalte je Anlagedauer (Zeilen: Jahre, Spalten: SUMMARY_QUANTILES
+    sowie Anzahl der Startmonate und Anteil der Zeiträume mit Verlust).
+    """
+    rows = {}
+    for years, frame in results.items():
+        values = frame[column].to_numpy(dtype="float64")
+        row = {"Startmonate": len(values)}
+        if len(values):
+            quantiles = np.quantile(values, list(SUMMARY_QUANTILES.values()))
+            row.update(dict(zip(SUMMARY_QUANTILES, quantiles)))
+            row["Verlust (%)"] = float(np.mean(frame["Endwert (nominal)"] < frame["Einzahlungen (brutto)"]) * 100)
+        rows[years] = row
+    summary = pd.DataFrame.from_dict(rows, orient="index")
+    summary.index.name = "Jahre"
+    return summary
+
+
+def backtest_isin(
+    isin: str,
+    horizons_years: list[int],
+    periodic_investment: float,
+    lump_sum: float = 0.0,
+    interval: str = "monatlich",
+    ausgabeaufschlag_pct: float = 0.0,
+    managementgebuehr_pa_pct: float = 0.0,
+    inflation_pa: float | None = None,
+) -> dict[int, pd.DataFrame] | None:
+    """
+    Rollierender Backtest über die gesamte gecachte Historie einer ISIN (ohne Download).
+    Gibt None zurück, falls für die ISIN noch keine Kursdaten im Cache liegen.
+    """
+    coverage = get_store().coverage(isin)
+    if coverage is None:
+        print(f"Backtest: Keine gecachten Kursdaten für {isin}.")
+        return None
+    data = backend_simulation.load_data(isin, coverage[0], coverage[1])
+    if data is None or data.empty:
+        return None
+    return rolling_backtest(
+        data, horizons_years, periodic_investment, lump_sum, interval,
+        ausgabeaufschlag_pct, managementgebuehr_pa_pct, inflation_pa,
+    )
@@ -0,0 +1,738 @@
+import time
+import argparse
+import tracemalloc
+import numpy as np
+import pandas as pd
+from datetime import date
+
+from . import backend_simulation
+from . import sim_kernel
+from . import inflation
+from . import portfolio_engine
+from . import portfolio_logic
+from . import sweep
+from . import backtest
+from . import executor
+from . import rebalancing
+from . import prognose_logic
+from . import covariance
+from .portfolio_templates import load_portfolio_template
+from .data_provider import SyntheticProvider, get_provider, set_provider
+
+#  BENCHMARK KONFIGURATION
+# Alle Benchmarks laufen offline auf synthetischen Kursen (reproduzierbar über den Seed)
+BENCHMARK_SEED = 42
+BENCHMARK_END_DATE = date(2025, 1, 1)
+BENCHMARK_YEARS = 25
+BENCHMARK_REPEATS = 5
+
+INTERVALS = ["monatlich", "vierteljährlich", "jährlich"]
+
+
+def synthetic_prices(ticker: str = "BENCH", years: int = BENCHMARK_YEARS, end_date: date = BENCHMARK_END_DATE) -> pd.DataFrame:
+    """Synthetische Kursreihe (DataFrame mit 'Close') über die letzten `years` Jahre."""
+    start_date = date(end_date.year - years, end_date.month, end_date.day)
+    return SyntheticProvider(seed=BENCHMARK_SEED).download_close([ticker], start_date, end_date)[ticker]
+
+
+def best_of(func, repeats: int = BENCHMARK_REPEATS) -> float:
+    """Beste Laufzeit (Sekunden) aus mehreren Wiederholungen."""
+    timings = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - t0)
+    return min(timings)
+
+
+def _print_row(label: str, old: float, new: float, identical: bool) -> None:
+    print(f"  {label:<22} alt {old * 1000:9.2f} ms   neu {new * 1000:9.2f} ms   "
+          f"Faktor {old / new:7.1f}x   identisch: {identical}")
+
+
+#  1. SPARPLAN-KÄUFE (run_simulation, Schritt 4)
+
+def _legacy_periodic_loop(periodic_data: pd.DataFrame) -> pd.DataFrame:
+    """Frühere Schleifen-Variante (Referenz für Laufzeit und Ergebnis)."""
+    periodic_data = periodic_data.copy()
+    periodic_data["Shares_Bought"] = 0.0
+    periodic_data["TotalInvestment_Periodic"] = 0.0
+    periodic_data["TotalShares_Periodic"] = 0.0
+
+    for i in range(len(periodic_data)):
+        current_price = periodic_data.iloc[i]["Price"]
+        if i == 0:
+            net_inv = 0.0
+            gross_inv = 0.0
+        else:
+            net_inv = periodic_data.iloc[i]["NetInvestment"]
+            gross_inv = periodic_data.iloc[i]["Investment"]
+        shares_bought = net_inv / current_price if current_price > 0 else 0
+
+        periodic_data.iloc[i, periodic_data.columns.get_loc("Shares_Bought")] = shares_bought
+        if i == 0:
+            periodic_data.iloc[i, periodic_data.columns.get_loc("TotalInvestment_Periodic")] = gross_inv
+            periodic_data.iloc[i, periodic_data.columns.get_loc("TotalShares_Periodic")] = shares_bought
+        else:
+            periodic_data.iloc[i, periodic_data.columns.get_loc("TotalInvestment_Periodic")] = periodic_data.iloc[i-1]["TotalInvestment_Periodic"] + gross_inv
+            periodic_data.iloc[i, periodic_data.columns.get_loc("TotalShares_Periodic")] = periodic_data.iloc[i-1]["TotalShares_Periodic"] + shares_bought
+    return periodic_data
+
+
+def _vectorized_periodic(periodic_data: pd.DataFrame) -> pd.DataFrame:
+    periodic_data = periodic_data.copy()
+    periodic_data["Shares_Bought"], periodic_data["TotalInvestment_Periodic"], periodic_data["TotalShares_Periodic"] = \
+        sim_kernel.periodic_purchases(
+            periodic_data["Price"].to_numpy(dtype="float64"),
+            periodic_data["NetInvestment"].to_numpy(dtype="float64"),
+            periodic_data["Investment"].to_numpy(dtype="float64"),
+        )
+    return periodic_data
+
+
+def bench_purchases(periodic_investment: float = 200.0, cost_factor: float = 0.98) -> None:
+    """Vergleicht Schleife und vektorisierte Käufe für 25-jährige Sparpläne je Intervall."""
+    print(f"Sparplan-Käufe ({BENCHMARK_YEARS} Jahre):")
+    prices = synthetic_prices()
+    daily = prices.reindex(pd.date_range(prices.index.min(), prices.index.max(), freq="D")).ffill()
+    for interval in INTERVALS:
+        resample_code = {"monatlich": "MS", "vierteljährlich": "QS", "jährlich": "YS"}[interval]
+        periodic_data = daily.resample(resample_code).first().rename(columns={"Close": "Price"}).dropna()
+        periodic_data["Investment"] = periodic_investment
+        periodic_data["NetInvestment"] = periodic_data["Investment"] * cost_factor
+
+        identical = _legacy_periodic_loop(periodic_data).equals(_vectorized_periodic(periodic_data))
+        old = best_of(lambda: _legacy_periodic_loop(periodic_data))
+        new = best_of(lambda: _vectorized_periodic(periodic_data))
+        _print_row(f"{interval} ({len(periodic_data)})", old, new, identical)
+
+    print(f"run_simulation gesamt ({BENCHMARK_YEARS} Jahre, ohne Streamlit-Cache):")
+    for interval in INTERVALS:
+        elapsed = best_of(lambda: backend_simulation.run_simulation.__wrapped__(
+            prices, periodic_investment, 10000.0, interval, 2.0, 2.0, 0.5
+        ))
+        print(f"  {interval:<22} {elapsed * 1000:9.2f} ms")
+
+
+#  2. SIMULATIONS-KERN (sim_kernel) vs. DataFrame-Adapter (run_simulation)
+
+def bench_kernel(periodic_investment: float = 200.0) -> None:
+    """Laufzeit des NumPy-Kerns gegenüber dem DataFrame-Adapter (ohne Streamlit-Cache)."""
+    print(f"Simulations-Kern ({BENCHMARK_YEARS} Jahre):")
+    prices = synthetic_prices()
+    days = sim_kernel.to_days(prices.index)
+    closes = prices["Close"].to_numpy()
+    for interval in INTERVALS:
+        adapter = best_of(lambda: backend_simulation.run_simulation.__wrapped__(
+            prices, periodic_investment, 10000.0, interval, 2.0, 2.0, 0.5
+        ))
+        kernel = best_of(lambda: sim_kernel.simulate_plan(
+            days, closes, periodic_investment, 10000.0, interval, 2.0, 2.0, 0.5
+        ))
+        print(f"  {interval:<22} Adapter {adapter * 1000:8.2f} ms   Kern {kernel * 1000:8.2f} ms")
+
+
+#  3. PORTFOLIO: Einzelsimulation + concat/groupby vs. Matrix-Engine
+
+def _legacy_portfolio_totals(prices: list[pd.DataFrame], start_date: date, end_date: date, inflation_series: pd.Series) -> pd.DataFrame:
+    """Frühere Variante: jede Position einzeln simulieren, ausrichten, concat + groupby().sum()."""
+    full_index = pd.date_range(start=start_date, end=end_date, freq="D")
+    aligned = []
+    for j, data in enumerate(prices):
+        sim_df = backend_simulation.run_simulation.__wrapped__(
+            data, 100.0, 1000.0, INTERVALS[j % 3], inflation_series, 2.0, 0.5
+        )
+        aligned.append(sim_df.reindex(full_index).ffill().bfill(limit=10).fillna(0.0))
+    portfolio_df = pd.concat(aligned)
+    return portfolio_df.groupby(portfolio_df.index).sum()
+
+
+def _matrix_portfolio_totals(
+    prices: list[pd.DataFrame], start_date: date, end_date: date, inflation_series: pd.Series, trading_days: bool = False
+) -> pd.DataFrame:
+    n = len(prices)
+    return portfolio_engine.simulate_positions(
+        price_data=prices,
+        names=[f"P{j}" for j in range(n)],
+        lump_sums=[1000.0] * n,
+        periodic_investments=[100.0] * n,
+        intervals=[INTERVALS[j % 3] for j in range(n)],
+        start_date=start_date,
+        end_date=end_date,
+        inflation_series=inflation_series,
+        ausgabeaufschlag_pct=2.0,
+        managementgebuehr_pa_pct=0.5,
+        trading_days=trading_days,
+    ).totals()
+
+
+def bench_portfolio(position_counts: tuple[int, ...] = (1, 10, 25, 50, 100)) -> None:
+    """Laufzeit nach Anzahl der Positionen (25 Jahre, gemischte Intervalle)."""
+    print(f"Portfolio-Simulation ({BENCHMARK_YEARS} Jahre):")
+    end_date = BENCHMARK_END_DATE
+    start_date = date(end_date.year - BENCHMARK_YEARS, end_date.month, end_date.day)
+    inflation_series = inflation.calculate_inflation_series(pd.date_range(start_date, end_date, freq="D"))
+    universe = [synthetic_prices(f"BENCH{j:03d}") for j in range(max(position_counts))]
+    for n in position_counts:
+        prices = universe[:n]
+        legacy = _legacy_portfolio_totals(prices, start_date, end_date, inflation_series)
+        matrix = _matrix_portfolio_totals(prices, start_date, end_date, inflation_series)
+        identical = np.array_equal(legacy.to_numpy(), matrix.to_numpy())
+        old = best_of(lambda: _legacy_portfolio_totals(prices, start_date, end_date, inflation_series), repeats=2)
+        new = best_of(lambda: _matrix_portfolio_totals(prices, start_date, end_date, inflation_series), repeats=2)
+        _print_row(f"{n} Positionen", old, new, identical)
+
+
+#  4. AGGREGATION: concat + groupby vs. vorab angelegte Arrays (inkl. Depotgebühr & Realwert)
+
+def _legacy_aggregation(aligned: list[pd.DataFrame], inflation_series: pd.Series, depotgebuehr_pa_eur: float) -> pd.DataFrame:
+    """Frühere Variante aus run_portfolio_simulation."""
+    portfolio_df = pd.concat(aligned)
+    final_portfolio = portfolio_df.groupby(portfolio_df.index).sum()
+
+    final_portfolio["Depotgebuehr_Pkt"] = 0.0
+    fee_dates_in_index = final_portfolio.resample("YS").first().index.intersection(final_portfolio.index)
+    if len(fee_dates_in_index) > 1:
+        final_portfolio.loc[fee_dates_in_index[1:], "Depotgebuehr_Pkt"] = depotgebuehr_pa_eur
+    final_portfolio["Kumulierte_Depotgebuehr"] = final_portfolio["Depotgebuehr_Pkt"].cumsum()
+    final_portfolio["Portfolio (nominal)"] = (
+        final_portfolio["Portfolio (nominal)"] - final_portfolio["Kumulierte_Depotgebuehr"]
+    ).clip(lower=0)
+    final_portfolio = final_portfolio.drop(columns=["Depotgebuehr_Pkt", "Kumulierte_Depotgebuehr"])
+
+    final_inflation_series = inflation_series.reindex(final_portfolio.index, method="ffill").fillna(1.0)
+    final_portfolio["Portfolio (real)"] = final_portfolio["Portfolio (nominal)"] / final_inflation_series
+    return final_portfolio
+
+
+def _array_aggregation(matrix: portfolio_engine.PortfolioMatrix, inflation_series: pd.Series, depotgebuehr_pa_eur: float) -> pd.DataFrame:
+    """Aktuelle Variante aus run_portfolio_simulation."""
+    totals = matrix.accumulate(["Einzahlungen (brutto)", "Portfolio (nominal)"])
+    nominal = totals[:, 1]
+    days = sim_kernel.to_days(matrix.index)
+    portfolio_engine.apply_depot_fee(days, nominal, depotgebuehr_pa_eur)
+    final_inflation = sim_kernel.inflation_curve(
+        days, (sim_kernel.to_days(inflation_series.index), inflation_series.to_numpy(dtype="float64"))
+    )
+    return pd.DataFrame(
+        {"Einzahlungen (brutto)": totals[:, 0], "Portfolio (nominal)": nominal, "Portfolio (real)": nominal / final_inflation},
+        index=matrix.index,
+    )
+
+
+def peak_memory(func) -> int:
+    """Spitzen-Speicherbedarf (Bytes) eines Aufrufs laut tracemalloc."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_aggregation(position_counts: tuple[int, ...] = (10, 50, 100), depotgebuehr_pa_eur: float = 50.0) -> None:
+    """Zeit und Speicher der Aggregationsstufe nach Anzahl der Positionen (25 Jahre)."""
+    print(f"Aggregation ({BENCHMARK_YEARS} Jahre, inkl. Depotgebühr & Realwert):")
+    end_date = BENCHMARK_END_DATE
+    start_date = date(end_date.year - BENCHMARK_YEARS, end_date.month, end_date.day)
+    inflation_series = inflation.calculate_inflation_series(pd.date_range(start_date, end_date, freq="D"))
+    universe = [synthetic_prices(f"BENCH{j:03d}") for j in range(max(position_counts))]
+    for n in position_counts:
+        matrix = portfolio_engine.simulate_positions(
+            price_data=universe[:n], names=[f"P{j}" for j in range(n)],
+            lump_sums=[1000.0] * n, periodic_investments=[100.0] * n,
+            intervals=[INTERVALS[j % 3] for j in range(n)],
+            start_date=start_date, end_date=end_date, inflation_series=inflation_series,
+            ausgabeaufschlag_pct=2.0, managementgebuehr_pa_pct=0.5,
+        )
+        aligned = [
+            pd.DataFrame({column: matrix.values[column][:, j] for column in portfolio_engine.COLUMNS}, index=matrix.index)
+            for j in range(n)
+        ]
+        legacy = _legacy_aggregation(aligned, inflation_series, depotgebuehr_pa_eur)
+        current = _array_aggregation(matrix, inflation_series, depotgebuehr_pa_eur)
+        identical = np.array_equal(legacy.to_numpy(), current.to_numpy())
+
+        old = best_of(lambda: _legacy_aggregation(aligned, inflation_series, depotgebuehr_pa_eur))
+        new = best_of(lambda: _array_aggregation(matrix, inflation_series, depotgebuehr_pa_eur))
+        _print_row(f"{n} Positionen", old, new, identical)
+        old_mb = peak_memory(lambda: _legacy_aggregation(aligned, inflation_series, depotgebuehr_pa_eur)) / 2 ** 20
+        new_mb = peak_memory(lambda: _array_aggregation(matrix, inflation_series, depotgebuehr_pa_eur)) / 2 ** 20
+        print(f"  {'':<22} Speicher-Spitze alt {old_mb:8.1f} MB   neu {new_mb:8.1f} MB")
+
+
+def _print_time(label: str, seconds: float) -> None:
+    print(f"  {label:<40} {seconds * 1000:9.2f} ms")
+
+
+#  5. PARAMETER-SWEEP (Linearbasis) vs. einzelne Simulationen
+
+def bench_sweep(n_levels: int = 500, n_splits: int = 200) -> None:
+    """Viele Beitragshöhen bzw. Budget-Aufteilungen aus einmal berechneten Basispfaden."""
+    print(f"Parameter-Sweep ({BENCHMARK_YEARS} Jahre, monatlich):")
+    prices = synthetic_prices()
+    lump_sums = np.linspace(0.0, 100000.0, n_levels)
+    periodic_investments = np.linspace(50.0, 2000.0, n_levels)
+
+    single = best_of(lambda: backend_simulation.run_simulation.__wrapped__(
+        prices, 200.0, 10000.0, "monatlich", 2.0, 2.0, 0.5
+    ))
+    basis = sweep.asset_basis(prices, "monatlich", 2.0, 2.0, 0.5)
+    basis_time = best_of(lambda: sweep.asset_basis(prices, "monatlich", 2.0, 2.0, 0.5))
+    finals = best_of(lambda: sweep.sweep_final_values(basis, lump_sums, periodic_investments))
+    paths = best_of(lambda: sweep.sweep_asset(basis, lump_sums, periodic_investments), repeats=2)
+    _print_time("1 Simulation (run_simulation)", single)
+    _print_time("Basispfade (einmal pro Asset)", basis_time)
+    _print_time(f"{n_levels} Endwerte aus der Basis", finals)
+    _print_time(f"{n_levels} volle Pfade aus der Basis", paths)
+
+    end_date = BENCHMARK_END_DATE
+    start_date = date(end_date.year - BENCHMARK_YEARS, end_date.month, end_date.day)
+    inflation_series = inflation.calculate_inflation_series(pd.date_range(start_date, end_date, freq="D"))
+    assets = load_portfolio_template("szenario4", 100000.0, 1000.0)
+    universe = [synthetic_prices(asset["ISIN / Ticker"]) for asset in assets]
+    build = lambda: sweep.positions_basis(
+        universe, [asset["Name"] for asset in assets], [asset["ISIN / Ticker"] for asset in assets],
+        ["monatlich"] * len(assets), start_date, end_date, inflation_series, 2.0, 0.5,
+    )
+    portfolio = best_of(lambda: _matrix_portfolio_totals(universe, start_date, end_date, inflation_series))
+    portfolio_basis = build()
+    budgets = np.linspace(10000.0, 500000.0, n_splits)
+    savings_rates = np.linspace(100.0, 5000.0, n_splits)
+    splits = sweep.template_splits(portfolio_basis, "szenario4", budgets, savings_rates)
+    evaluate = best_of(lambda: sweep.sweep_portfolio(portfolio_basis, *splits, depotgebuehr_pa_eur=50.0), repeats=2)
+    _print_time(f"1 Portfolio (szenario4, {len(assets)} Positionen)", portfolio)
+    _print_time("Portfolio-Basispfade", best_of(build, repeats=2))
+    _print_time(f"{n_splits} Budget-Aufteilungen (volle Pfade)", evaluate)
+
+
+#  6. ROLLIERENDER BACKTEST vs. eine Simulation je Startmonat
+
+def _legacy_backtest(prices: pd.DataFrame, years: int) -> np.ndarray:
+    """Bisheriger Weg: run_simulation für jeden Startmonat einzeln (Endwert nominal)."""
+    first_trading_days = prices.groupby(prices.index.to_period("M")).head(1).index
+    final_values = []
+    for start, end in zip(first_trading_days, first_trading_days[12 * years:]):
+        sim = backend_simulation.run_simulation.__wrapped__(prices.loc[start:end], 200.0, 0.0, "monatlich", 2.0, 2.0, 0.5)
+        final_values.append(sim["Portfolio (nominal)"].iloc[-1])
+    return np.array(final_values)
+
+
+def bench_backtest(history_years: int = 35, years: int = 10) -> None:
+    """Alle Startmonate einer langen Historie für eine Anlagedauer."""
+    print(f"Rollierender Backtest ({history_years} Jahre Historie, Anlagedauer {years} Jahre, monatlich):")
+    prices = synthetic_prices(years=history_years)
+    old_values = _legacy_backtest(prices, years)
+    new_values = backtest.rolling_backtest(prices, [years], 200.0, 0.0, "monatlich", 2.0, 0.5, 2.0)[years]["Endwert (nominal)"].to_numpy()
+    identical = len(old_values) == len(new_values) and np.allclose(old_values, new_values, rtol=1e-12, atol=0)
+    old = best_of(lambda: _legacy_backtest(prices, years), repeats=1)
+    new = best_of(lambda: backtest.rolling_backtest(prices, [years], 200.0, 0.0, "monatlich", 2.0, 0.5, 2.0))
+    _print_row(f"{len(new_values)} Startmonate", old, new, identical)
+
+
+#  7. HANDELSTAGE vs. Kalendertage (Portfolio-Matrix)
+
+def bench_trading_days(position_counts: tuple[int, ...] = (10, 50, 100)) -> None:
+    """Zeilen, Laufzeit und Speicher der Portfolio-Simulation je Kalender-Modus (25 Jahre)."""
+    print(f"Handelstage vs. Kalendertage ({BENCHMARK_YEARS} Jahre):")
+    end_date = BENCHMARK_END_DATE
+    start_date = date(end_date.year - BENCHMARK_YEARS, end_date.month, end_date.day)
+    inflation_series = inflation.calculate_inflation_series(pd.date_range(start_date, end_date, freq="D"))
+    universe = [synthetic_prices(f"BENCH{j:03d}") for j in range(max(position_counts))]
+    for n in position_counts:
+        prices = universe[:n]
+        daily = _matrix_portfolio_totals(prices, start_date, end_date, inflation_series)
+        trading = _matrix_portfolio_totals(prices, start_date, end_date, inflation_series, trading_days=True)
+        identical = np.array_equal(daily.loc[trading.index].to_numpy(), trading.to_numpy())
+        old = best_of(lambda: _matrix_portfolio_totals(prices, start_date, end_date, inflation_series), repeats=2)
+        new = best_of(lambda: _matrix_portfolio_totals(prices, start_date, end_date, inflation_series, True), repeats=2)
+        _print_row(f"{n} Positionen", old, new, identical)
+        old_peak = peak_memory(lambda: _matrix_portfolio_totals(prices, start_date, end_date, inflation_series))
+        new_peak = peak_memory(lambda: _matrix_portfolio_totals(prices, start_date, end_date, inflation_series, True))
+        print(f"  {'':<22} Zeilen alt {len(daily):9d}      neu {len(trading):9d}")
+        print(f"  {'':<22} Speicher-Spitze alt {old_peak / 1e6:8.1f} MB   neu {new_peak / 1e6:8.1f} MB")
+
+
+#  8. CACHE-SCHLÜSSEL: run_simulation (DataFrame/Series hashen) vs. simulate_asset (kompakter Schlüssel)
+
+def bench_cache_keys(repeats: int = 20) -> None:
+    """Dauer eines Cache-Treffers je Einstieg (25 Jahre, synthetische Kurse im Cache des Providers)."""
+    print(f"Cache-Treffer ({BENCHMARK_YEARS} Jahre, monatlich):")
+    end_date = BENCHMARK_END_DATE
+    start_date = date(end_date.year - BENCHMARK_YEARS, end_date.month, end_date.day)
+    previous_provider = get_provider()
+    set_provider(SyntheticProvider(seed=BENCHMARK_SEED))
+    try:
+        simulate = lambda: backend_simulation.simulate_asset("BENCH", start_date, end_date, 200.0, 1000.0, "monatlich", 2.0, 0.5)
+        keyed = simulate()
+        data = backend_simulation.load_data("BENCH", start_date, end_date)
+        inflation_series = inflation.calculate_inflation_series(pd.date_range(start_date, end_date, freq="D"))
+        hashed = lambda: backend_simulation.run_simulation(data, 200.0, 1000.0, "monatlich", inflation_series, 2.0, 0.5)
+        identical = keyed.equals(hashed())
+
+        uncached = best_of(lambda: backend_simulation.run_simulation.__wrapped__(
+            data, 200.0, 1000.0, "monatlich", inflation_series, 2.0, 0.5
+        ))
+        old = best_of(hashed, repeats=repeats)
+        new = best_of(simulate, repeats=repeats)
+    finally:
+        set_provider(previous_provider)
+    _print_time("Simulation ohne Cache", uncached)
+    _print_row("Cache-Treffer", old, new, identical)
+
+
+#  9. POSITIONS-CACHE: ganzes Portfolio neu vs. nur geänderte Positionen
+
+def bench_position_cache(n_positions: int = 50) -> None:
+    """Portfolio-Simulation nach einer Änderung an einer Position (25 Jahre, ohne Streamlit-Cache)."""
+    print(f"Positions-Cache ({BENCHMARK_YEARS} Jahre, {n_positions} Positionen):")
+    end_date = BENCHMARK_END_DATE
+    start_date = date(end_date.year - BENCHMARK_YEARS, end_date.month, end_date.day)
+    assets = [
+        {"Name": f"P{j}", "ISIN / Ticker": f"BENCH{j:03d}", "Einmalerlag (€)": 1000.0,
+         "Sparbetrag (€)": 100.0, "Spar-Intervall": INTERVALS[j % 3]}
+        for j in range(n_positions)
+    ]
+
+    def edited(rate: float) -> list[dict]:
+        portfolio = [dict(asset) for asset in assets]
+        portfolio[n_positions // 2]["Sparbetrag (€)"] = rate
+        return portfolio
+
+    run = lambda portfolio: portfolio_logic.run_portfolio_simulation.__wrapped__(portfolio, start_date, end_date, 2.0, 0.5, 50.0)
+
+    previous_provider = get_provider()
+    set_provider(SyntheticProvider(seed=BENCHMARK_SEED))
+    try:
+        run(assets)
+        cold = lambda: (portfolio_logic.clear_position_cache(), run(edited(250.0)))
+        full = cold()[1][0]
+        old = best_of(cold, repeats=2)
+
+        # Jede Wiederholung ändert die Sparrate auf einen neuen Wert -> genau ein Cache-Miss
+        timings = []
+        for k in range(BENCHMARK_REPEATS):
+            portfolio = edited(251.0 + k)
+            t0 = time.perf_counter()
+            run(portfolio)
+            timings.append(time.perf_counter() - t0)
+        new = min(timings)
+        identical = run(edited(250.0))[0].equals(full)
+        hit = best_of(lambda: run(edited(250.0)))
+    finally:
+        set_provider(previous_provider)
+    _print_row("1 Position geändert", old, new, identical)
+    _print_time("unverändertes Portfolio", hit)
+
+
+#  10. PROZESS-POOL: große Portfolios und Monte-Carlo-Pfade im Pool vs. im eigenen Prozess
+
+def _forecast(
+    n_simulations: int,
+    years: int,
+    memory_budget_mb: float | None = prognose_logic.MC_MEMORY_BUDGET_MB,
+    monatliche_schritte: bool = False,
+    seed: int | None = BENCHMARK_SEED,
+) -> pd.DataFrame:
+    return prognose_logic.run_forecast(
+        start_values={"letzter_tag": BENCHMARK_END_DATE, "nominal": 100_000.0, "real": 80_000.0, "einzahlung": 60_000.0},
+        assets=[{"Spar-Intervall": "monatlich", "Sparbetrag (€)": 500.0}],
+        prognose_jahre=years,
+        sparplan_fortfuehren=True,
+        kosten_management_pa_pct=0.5,
+        kosten_depot_pa_eur=50.0,
+        ausgabeaufschlag_pct=2.0,
+        expected_asset_returns_pa={"A": 6.0},
+        asset_final_values={"A": 100_000.0},
+        expected_volatility_pa=15.0,
+        n_simulations=n_simulations,
+        memory_budget_mb=memory_budget_mb,
+        monatliche_schritte=monatliche_schritte,
+        seed=seed,
+    )
+
+
+def bench_pool(n_positions: int = 200, n_simulations: int = 2000, forecast_years: int = 30) -> None:
+    """
+    Gleiche Aufgaben im eigenen Prozess und im Prozess-Pool (mindestens 2 Worker, Schwelle aus).
+    Auf Rechnern mit nur einem Kern zeigt der Vergleich den reinen Mehraufwand des Pools.
+    """
+    workers = max(executor.POOL_WORKERS, 2)
+    print(f"Prozess-Pool ({workers} Worker, {executor.available_cores()} Kern(e) verfügbar):")
+    end_date = BENCHMARK_END_DATE
+    start_date = date(end_date.year - BENCHMARK_YEARS, end_date.month, end_date.day)
+    inflation_series = inflation.calculate_inflation_series(pd.date_range(start_date, end_date, freq="D"))
+    prices = [synthetic_prices(f"BENCH{j:03d}") for j in range(n_positions)]
+    positions = lambda: portfolio_engine.simulate_positions_parallel(
+        price_data=prices,
+        names=[f"P{j}" for j in range(n_positions)],
+        lump_sums=[1000.0] * n_positions,
+        periodic_investments=[100.0] * n_positions,
+        intervals=[INTERVALS[j % 3] for j in range(n_positions)],
+        start_date=start_date,
+        end_date=end_date,
+        inflation_series=inflation_series,
+        ausgabeaufschlag_pct=2.0,
+        managementgebuehr_pa_pct=0.5,
+    ).totals()
+    forecast = lambda: _forecast(n_simulations, forecast_years)
+
+    previous = executor.POOL_WORKERS, executor.MIN_PARALLEL_CELLS
+    try:
+        for label, func in ((f"{n_positions} Positionen", positions), (f"{n_simulations} MC-Pfade", forecast)):
+            executor.MIN_PARALLEL_CELLS = np.inf
+            reference = func()
+            old = best_of(func, repeats=2)
+            executor.POOL_WORKERS, executor.MIN_PARALLEL_CELLS = workers, 0
+            identical = func().equals(reference)
+            new = best_of(func, repeats=2)
+            _print_row(label, old, new, identical)
+    finally:
+        executor.POOL_WORKERS, executor.MIN_PARALLEL_CELLS = previous
+        executor.shutdown_pool()
+
+
+#  11. REBALANCING: Schleife über alle Tage vs. gelöste Rekursion über die Termine
+
+def _loop_rebalanced(days, close, weights, lump_sums, periodic_investments, intervals, mode, threshold_pct):
+    """Referenz: Bestände Tag für Tag fortschreiben und an jedem Termin auf die Zielgewichte setzen."""
+    n_rows, n_assets = close.shape
+    adjusted = close * sim_kernel.fee_curve(n_rows, 0.5)[:, None]
+    purchases = [set(rebalancing.period_rows(days, interval).tolist()) for interval in intervals]
+    dates = set(rebalancing.period_rows(days, mode).tolist()) if mode != "schwelle" else set()
+    holdings = lump_sums * 0.98 / close[0]
+    values = np.empty((n_rows, n_assets))
+    for t in range(n_rows):
+        for j in range(n_assets):
+            if t in purchases[j]:
+                holdings[j] += periodic_investments[j] * 0.98 / close[t, j]
+        current = adjusted[t] * holdings
+        total = current.sum()
+        if mode == "schwelle":
+            due = total > 0 and np.abs(current / total - weights).max() > threshold_pct / 100
+        else:
+            due = t in dates
+        if due:
+            holdings = weights * total / adjusted[t]
+        values[t] = adjusted[t] * holdings
+    return values
+
+
+def bench_rebalancing(n_positions: int = 20, threshold_pct: float = 5.0) -> None:
+    """Rebalancing-Modi für ein Sparplan-Portfolio (25 Jahre, Zielgewichte 1/n)."""
+    print(f"Rebalancing ({BENCHMARK_YEARS} Jahre, {n_positions} Positionen):")
+    end_date = BENCHMARK_END_DATE
+    start_date = date(end_date.year - BENCHMARK_YEARS, end_date.month, end_date.day)
+    prices = [synthetic_prices(f"BENCH{j:03d}") for j in range(n_positions)]
+    days, close = rebalancing.price_matrix(prices, start_date, end_date)
+    weights = np.full(n_positions, 1.0 / n_positions)
+    lump_sums = weights * 100_000.0
+    periodic_investments = weights * 1_000.0
+    intervals = [INTERVALS[j % 3] for j in range(n_positions)]
+    for mode in rebalancing.REBALANCING_MODES:
+        run = lambda: rebalancing.simulate_rebalanced(
+            days, close, weights, lump_sums, periodic_investments, intervals, mode, 2.0, 0.5, threshold_pct
+        )
+        result = run()
+        reference = _loop_rebalanced(days, close, weights, lump_sums, periodic_investments, intervals, mode, threshold_pct)
+        identical = np.allclose(result["values"], reference, rtol=1e-12, atol=0.0)
+        old = best_of(lambda: _loop_rebalanced(days, close, weights, lump_sums, periodic_investments, intervals, mode, threshold_pct), repeats=1)
+        new = best_of(run)
+        _print_row(f"{mode} ({len(result['rows'])} Termine)", old, new, identical)
+        turnover = rebalancing.turnover_frame(days, result)
+        print(f"    Umschichtung gesamt {turnover['Umschichtung (€)'].sum():,.0f} €, "
+              f"je Termin im Mittel {turnover['Umschichtung (%)'].mean():.2f} %")
+
+
+#  12. PROGNOSE-KERN: Tagesschleife vs. blockweise Rekursion (gleiche Zufallszahlen)
+
+def _legacy_forecast_loop(prev_values, random_returns, savings, depot_fee, daily_mgmt_fee_factor):
+    """Frühere Tagesschleife aus run_forecast."""
+    sim_matrix = np.empty((len(random_returns), len(prev_values)))
+    for i in range(len(random_returns)):
+        current_values = prev_values * (1 + random_returns[i])
+        current_values += savings[i]
+        current_values *= daily_mgmt_fee_factor
+        current_values -= depot_fee[i]
+        current_values = np.maximum(0, current_values)
+        sim_matrix[i] = current_values
+        prev_values = current_values
+    return sim_matrix
+
+
+def _forecast_kernel(returns: np.ndarray, savings: np.ndarray, depot_fee: np.ndarray, blocked: bool) -> np.ndarray:
+    paths = np.empty_like(returns)
+    if blocked:
+        start = np.full(returns.shape[1], 100_000.0)
+        fee = np.full(len(returns), 0.99998)
+        prognose_logic._advance_paths(returns, fee, savings * fee - depot_fee, start, paths, 1)
+    else:
+        paths[0] = 100_000.0
+        paths[1:] = _legacy_forecast_loop(paths[0], returns[1:], savings[1:], depot_fee[1:], 0.99998)
+    return paths
+
+
+def bench_forecast_kernel(horizons_years: tuple[int, ...] = (10, 20, 30, 40, 50), simulation_counts: tuple[int, ...] = (100, 1000)) -> None:
+    """Monte-Carlo-Rekursion aus run_forecast je Prognosedauer und Pfadanzahl."""
+    print("Prognose-Kern (Tage x Pfade):")
+    rng = np.random.default_rng(BENCHMARK_SEED)
+    for n_simulations in simulation_counts:
+        for years in horizons_years:
+            num_days = int(years * 365.25) + 1
+            returns = rng.normal(0.07 / 365.25, 0.17 / np.sqrt(365.25), size=(num_days, n_simulations))
+            savings = np.where(np.arange(num_days) % 30 == 0, 490.0, 0.0)
+            depot_fee = np.where(np.arange(num_days) % 365 == 0, 50.0, 0.0)
+            loop = _forecast_kernel(returns, savings, depot_fee, blocked=False)
+            blocked = _forecast_kernel(returns, savings, depot_fee, blocked=True)
+            identical = np.allclose(blocked, loop, rtol=1e-10, atol=1e-6)
+            old = best_of(lambda: _forecast_kernel(returns, savings, depot_fee, blocked=False), repeats=2)
+            new = best_of(lambda: _forecast_kernel(returns, savings, depot_fee, blocked=True), repeats=2)
+            _print_row(f"{years} J. x {n_simulations}", old, new, identical)
+
+
+#  13. PROGNOSE-SPEICHER: ein Durchgang über alle Tage vs. Zeitabschnitte im Speicherbudget
+#      (8 MB: ein Block über alle Pfade passt nicht mehr, Blöcke werden in Teilen gerechnet)
+
+def bench_forecast_memory(years: int = 30, n_simulations: int = 4000, budgets_mb: tuple[float, ...] = (256, 64, 8)) -> None:
+    """Spitzen-Speicher und Laufzeit von run_forecast je Speicherbudget (gleiche Zufallszahlen)."""
+    print(f"Prognose-Speicher ({years} Jahre, {n_simulations} Pfade):")
+    reference = _forecast(n_simulations, years, None)
+    for budget in (None,) + budgets_mb:
+        run = lambda: _forecast(n_simulations, years, budget)
+        identical = run().equals(reference)
+        seconds = best_of(run, repeats=1)
+        memory = peak_memory(run)
+        label = "ohne Budget" if budget is None else f"Budget {budget:g} MB"
+        print(f"  {label:<22} {seconds * 1000:9.2f} ms   Spitze {memory / 1024**2:8.1f} MB   identisch: {identical}")
+
+
+#  14. PROGNOSE IN MONATSSCHRITTEN vs. Tagesschritten (gleiche Verteilung, andere Zufallszahlen)
+
+def bench_forecast_monthly(horizons_years: tuple[int, ...] = (10, 30, 50), n_simulations: int = 2000) -> None:
+    """Schritte, Laufzeit, Spitzen-Speicher und Endwert-Quantile von run_forecast je Schrittweite."""
+    print(f"Prognose Monats- vs. Tagesschritte ({n_simulations} Pfade):")
+    columns = ["Portfolio (Median)", "Portfolio (BestCase)", "Portfolio (WorstCase)"]
+    for years in horizons_years:
+        daily = lambda: _forecast(n_simulations, years)
+        monthly = lambda: _forecast(n_simulations, years, monatliche_schritte=True)
+        old, new = best_of(daily, repeats=1), best_of(monthly, repeats=2)
+        ratio = monthly()[columns].iloc[-1] / daily()[columns].iloc[-1]
+        print(f"  {years} Jahre: Schritte {len(daily())} -> {len(monthly())}   "
+              f"alt {old * 1000:8.1f} ms   neu {new * 1000:7.1f} ms   Faktor {old / new:5.1f}x   "
+              f"Speicher {peak_memory(daily) / 1024**2:6.1f} -> {peak_memory(monthly) / 1024**2:5.1f} MB")
+        print(f"    Endwert Monat/Tag: Median {ratio.iloc[0]:.3f}, 95% {ratio.iloc[1]:.3f}, 5% {ratio.iloc[2]:.3f}")
+
+
+#  15. MULTI-ASSET-PROGNOSE: korrelierte Pfade je Position (Kovarianz aus dem Kurs-Cache)
+
+def bench_multi_asset_forecast(n_positions: int = 20, n_simulations: int = 10_000, years: int = 30) -> None:
+    """Kovarianz-Schätzung und run_multi_asset_forecast (Monatsschritte) vs. run_forecast für ein Gesamtportfolio."""
+    print(f"Multi-Asset-Prognose ({n_positions} Positionen, {n_simulations} Pfade, {years} Jahre, Monatsschritte):")
+    end_date = BENCHMARK_END_DATE
+    start_date = date(end_date.year - BENCHMARK_YEARS, end_date.month, end_date.day)
+    assets = [
+        {"Name": f"P{j}", "ISIN / Ticker": f"BENCH{j:03d}", "Einmalerlag (€)": 1000.0,
+         "Sparbetrag (€)": 100.0, "Spar-Intervall": INTERVALS[j % 3]}
+        for j in range(n_positions)
+    ]
+    isins = [asset["ISIN / Ticker"] for asset in assets]
+    names = [asset["Name"] for asset in assets]
+    parameters = dict(
+        start_values={"letzter_tag": end_date, "nominal": 100_000.0, "real": 80_000.0, "einzahlung": 60_000.0},
+        assets=assets,
+        prognose_jahre=years,
+        sparplan_fortfuehren=True,
+        kosten_management_pa_pct=0.5,
+        kosten_depot_pa_eur=50.0,
+        ausgabeaufschlag_pct=2.0,
+        expected_asset_returns_pa={name: 6.0 for name in names},
+        asset_final_values={name: 5_000.0 for name in names},
+        expected_volatility_pa=15.0,
+        n_simulations=n_simulations,
+    )
+
+    previous_provider = get_provider()
+    set_provider(SyntheticProvider(seed=BENCHMARK_SEED))
+    try:
+        for isin in isins:
+            backend_simulation.load_data(isin, start_date, end_date)
+        estimate = lambda: covariance.historical_covariance(isins, 15.0)
+        cov = estimate()
+        estimate_seconds = best_of(estimate, repeats=2)
+    finally:
+        set_provider(previous_provider)
+
+    multi = lambda: prognose_logic.run_multi_asset_forecast(**parameters, covariance_pa=cov, seed=BENCHMARK_SEED)
+    single = lambda: prognose_logic.run_forecast(**parameters, monatliche_schritte=True, seed=BENCHMARK_SEED)
+
+    volatility = np.sqrt(np.diag(cov)) * 100
+    _print_time("Kovarianz schätzen", estimate_seconds)
+    print(f"    Volatilität p.a. {volatility.min():.1f}-{volatility.max():.1f}%, "
+          f"Portfolio (1/n) {np.sqrt(cov.mean()) * 100:.1f}%")
+    _print_time("Gesamtportfolio", best_of(single, repeats=1))
+    _print_time("je Position korreliert", best_of(multi, repeats=1))
+    print(f"    Spitzen-Speicher {peak_memory(multi) / 1024**2:.1f} MB")
+    columns = ["Portfolio (Median)", "Portfolio (BestCase)", "Portfolio (WorstCase)"]
+    for label, result in (("Gesamtportfolio", single()), ("je Position", multi())):
+        final = result[columns].iloc[-1]
+        print(f"    Endwert {label:<16} Median {final.iloc[0]:12,.0f}   95% {final.iloc[1]:12,.0f}   5% {final.iloc[2]:12,.0f}")
+
+
+#  16. ZUFALLSSTRÖME: gleicher Seed bei verschiedenen Speicherbudgets und Worker-Anzahlen
+
+def bench_random_streams(n_simulations: int = 4000, years: int = 30, worker_counts: tuple[int, ...] = (1, 2, 4)) -> None:
+    """Bitgleichheit von run_forecast je Aufteilung (gleicher Seed) und Dauer der Ziehung: globaler Zustand vs. Generator."""
+    print(f"Zufallsströme ({years} Jahre, {n_simulations} Pfade, Seed {BENCHMARK_SEED}):")
+    reference = _forecast(n_simulations, years, None)
+    previous = executor.POOL_WORKERS, executor.MIN_PARALLEL_CELLS
+    try:
+        for workers in worker_counts:
+            executor.shutdown_pool()
+            executor.POOL_WORKERS, executor.MIN_PARALLEL_CELLS = workers, 0
+            for budget in (None, 16):
+                label = f"{workers} Worker, " + ("ohne Budget" if budget is None else f"{budget} MB")
+                print(f"  {label:<40} identisch: {_forecast(n_simulations, years, budget).equals(reference)}")
+    finally:
+        executor.POOL_WORKERS, executor.MIN_PARALLEL_CELLS = previous
+        executor.shutdown_pool()
+    other_seed = _forecast(n_simulations, years, None, seed=BENCHMARK_SEED + 1).equals(reference)
+    print(f"  {'anderer Seed':<40} identisch: {other_seed}")
+
+    num_days = int(years * 365.25) + 1
+    streams = prognose_logic._random_streams(BENCHMARK_SEED, n_simulations)
+    _print_time("Ziehung np.random.normal (global)", best_of(lambda: np.random.normal(size=(num_days, n_simulations)), repeats=2))
+    _print_time("Ziehung Generator je Strom-Block", best_of(
+        lambda: prognose_logic._draw_returns(streams, num_days, n_simulations, np.zeros(num_days), np.ones(num_days), False), repeats=2
+    ))
+
+
+BENCHMARKS = {
+    "purchases": bench_purchases,
+    "kernel": bench_kernel,
+    "portfolio": bench_portfolio,
+    "aggregation": bench_aggregation,
+    "sweep": bench_sweep,
+    "backtest": bench_backtest,
+    "handelstage": bench_trading_days,
+    "cache": bench_cache_keys,
+    "positionen": bench_position_cache,
+    "pool": bench_pool,
+    "rebalancing": bench_rebalancing,
+    "prognose": bench_forecast_kernel,
+    "prognose_speicher": bench_forecast_memory,
+    "prognose_monatlich": bench_forecast_monthly,
+    "multi_asset": bench_multi_asset_forecast,
+    "zufall": bench_random_streams,
+}
+
+if __name__ == "__main__":
+    # Start via Terminal: python -m src.benchmark [name ...]
+    parser = argparse.ArgumentParser(description="Offline-Benchmarks der Simulations-Pipeline (synthetische Kurse).")
+    parser.add_argument("names", nargs="*", default=None, help=f"Standard: alle ({', '.join(BENCHMARKS)})")
+    args = parser.parse_args()
+    unknown = [name for name in args.names or [] if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unbekannte Benchmarks: {', '.join(unknown)} (verfügbar: {', '.join(BENCHMARKS)})")
+
+    for name in args.names or BENCHMARKS:
+        BENCHMARKS[name]()
@@ -1,40 +1,231 @@
-import yfinance as yf
-import pandas as pd
 from datetime import date
-import os
 import time
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from .catalog import KATALOG
 from . import backend_simulation
+from . import price_panel
+from . import metadata_index
+from .price_store import get_store
 
-def preload_all_data(start_year=2000):
+#  PRELOADER KONFIGURATION
+# Anzahl Ticker pro gebündeltem yfinance-Download
+PRELOAD_BATCH_SIZE = 10
+# Anzahl paralleler Worker
+PRELOAD_MAX_WORKERS = 4
+# Maximal erlaubte Downloads pro Sekunde (Token-Bucket) und Burst-Größe
+PRELOAD_REQUESTS_PER_SECOND = 2.0
+PRELOAD_BURST = 2
+# Wiederholungen für fehlgeschlagene Ticker (exponentielles Backoff ab PRELOAD_BACKOFF_SECONDS)
+PRELOAD_MAX_RETRIES = 2
+PRELOAD_BACKOFF_SECONDS = 1.0
+
+#  KOMPAKTIERUNG KONFIGURATION
+# Speicherbudget des Kurs-Caches in MB (None = unbegrenzt); Katalog-Ticker werden nie verdrängt
+CACHE_MAX_MB = 500
+# Kompaktierung beim App-Start im Hintergrund ausführen (Startseite.py)
+COMPACT_ON_STARTUP = False
+
+
+class TokenBucket:
+    """
+    Thread-sicherer Token-Bucket: erlaubt im Mittel `rate` Anfragen pro Sekunde
+    und kurzfristig bis zu `capacity` Anfragen auf einmal.
+    """
+
+    def __init__(self, rate: float, capacity: int = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Blockiert, bis ein Token verfügbar ist."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def _load_batch_with_retry(loader, batch, start_date, end_date, bucket, max_retries, backoff_seconds):
+    """
+    Lädt einen Batch über `loader` und wiederholt fehlgeschlagene Ticker mit exponentiellem Backoff.
+    Gibt ein Dict Ticker -> bool (erfolgreich) zurück.
+    """
+    status = {ticker: False for ticker in batch}
+    pending = list(batch)
+
+    for attempt in range(max_retries + 1):
+        if attempt > 0:
+            # Exponentielles Backoff mit etwas Zufall (verhindert synchrone Wiederholungen aller Worker)
+            time.sleep(backoff_seconds * (2 ** (attempt - 1)) * (1 + random.random()))
+
+        bucket.acquire()
+        try:
+            results = loader(pending, start_date, end_date)
+        except Exception as e:
+            print(f"  -> FEHLER bei {', '.join(pending)}: {e}")
+            continue
+
+        for ticker in pending:
+            status[ticker] = results.get(ticker) is not None
+        pending = [ticker for ticker in pending if not status[ticker]]
+        if not pending:
+            break
+
+    return status
+
+
+def preload_all_data(
+    start_year=2000,
+    tickers: list[str] | None = None,
+    max_workers: int = PRELOAD_MAX_WORKERS,
+    requests_per_second: float = PRELOAD_REQUESTS_PER_SECOND,
+    batch_size: int = PRELOAD_BATCH_SIZE,
+    max_retries: int = PRELOAD_MAX_RETRIES,
+    backoff_seconds: float = PRELOAD_BACKOFF_SECONDS,
+    progress_callback=None,
+    loader=None,
+    build_panel: bool = True,
+    build_metadata: bool = True,
+) -> dict[str, bool]:
     """
     Lädt alle Daten für die Ticker/ISINs im Katalog ab dem Jahr 2000
-    und speichert sie im lokalen CSV-Cache.
+    und speichert sie im lokalen Binär-Cache (eine Datei pro Ticker).
+
+    Die Ticker werden in Batches auf einen Worker-Pool verteilt; ein Token-Bucket
+    begrenzt die Downloads pro Sekunde, fehlgeschlagene Ticker werden mit Backoff wiederholt.
+    progress_callback(done, total, ticker, ok) wird im aufrufenden Thread aufgerufen
+    (z.B. für einen Streamlit-Fortschrittsbalken).
+    loader(tickers, start, end) -> Dict erlaubt einen lokalen Fake-Datenprovider (Standard: load_many ohne Streamlit-Cache).
+    Anschließend wird das Memory-Mapped Kurs-Panel aus dem Cache neu gebaut (build_panel)
+    und der Metadaten-Index für alle erfolgreichen Ticker ergänzt (build_metadata, ebenfalls ratenbegrenzt).
+    Gibt ein Dict Ticker -> bool (erfolgreich) zurück.
     """
     start_date = date(start_year, 1, 1)
     end_date = date.today()
     
-    tickers = [v for k, v in KATALOG.items() if v]
+    if tickers is None:
+        tickers = [v for k, v in KATALOG.items() if v]
+    if loader is None:
+        loader = backend_simulation._load_many
     total = len(tickers)
     
-    print(f"Starte Pre-loading für {total} Ticker...")
-    
-    for i, ticker in enumerate(tickers, 1):
-        print(f"[{i}/{total}] Verarbeite {ticker}...")
-        
-        # Nutzen der bestehenden load_data Logik (die jetzt automatisch speichert)
-        try:
-            data = backend_simulation.load_data(ticker, start_date, end_date)
-            if data is not None:
-                print(f"  -> OK")
-            else:
-                print(f"  -> FEHLGESCHLAGEN (keine Daten)")
-        except Exception as e:
-            print(f"  -> FEHLER: {e}")
-            
-        # Kurze Pause um Rate-Limits zu vermeiden
-        time.sleep(0.5)
+    print(f"Starte Pre-loading für {total} Ticker ({max_workers} Worker, max. {requests_per_second}/s)...")
+
+    bucket = TokenBucket(requests_per_second, capacity=PRELOAD_BURST)
+    batches = [tickers[i:i + batch_size] for i in range(0, total, batch_size)]
+    status = {}
+    done = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = [
+            executor.submit(
+                _load_batch_with_retry, loader, batch, start_date, end_date,
+                bucket, max_retries, backoff_seconds,
+            )
+            for batch in batches
+        ]
+        for future in as_completed(futures):
+            for ticker, ok in future.result().items():
+                status[ticker] = ok
+                done += 1
+                print(f"[{done}/{total}] {ticker}: {'OK' if ok else 'FEHLGESCHLAGEN (keine Daten)'}")
+                if progress_callback is not None:
+                    progress_callback(done, total, ticker, ok)
+
+    failed = [ticker for ticker, ok in status.items() if not ok]
+    print(f"Pre-loading abgeschlossen: {total - len(failed)}/{total} erfolgreich.")
+
+    loaded = [ticker for ticker, ok in status.items() if ok]
+    if build_metadata:
+        build_metadata_index(loaded, bucket, max_workers, batch_size)
+    if build_panel:
+        price_panel.build_panel(loaded)
+    return status
+
+
+def build_metadata_index(tickers: list[str], bucket: TokenBucket, max_workers: int, batch_size: int) -> int:
+    """
+    Ergänzt den Metadaten-Index (Name, Währung, Börse, erster Handelstag) für die Ticker.
+    Die Abfragen laufen über denselben Worker-Pool und Token-Bucket wie die Kurs-Downloads;
+    der Index wird am Ende mit einem einzigen Schreibvorgang aktualisiert.
+    """
+    batches = [tickers[i:i + batch_size] for i in range(0, len(tickers), batch_size)]
+    entries = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = [executor.submit(metadata_index.build_entries, batch, bucket.acquire) for batch in batches]
+        for future in as_completed(futures):
+            entries.update(future.result())
+    metadata_index.get_index().update(entries)
+    print(f"Metadaten-Index: {len(entries)} Einträge ergänzt.")
+    return len(entries)
+
+def compact_cache(max_mb: float | None = CACHE_MAX_MB) -> dict:
+    """
+    Führt überlappende Cache-Dateien pro Ticker zu einer kanonischen Reihe zusammen
+    und erzwingt danach das Speicherbudget per LRU-Verdrängung selten genutzter Nutzer-Ticker.
+    """
+    store = get_store()
+    stats = store.compact()
+    stats["evicted"] = []
+    if max_mb is not None:
+        protected = {v for k, v in KATALOG.items() if v}
+        stats["evicted"] = store.evict_lru(int(max_mb * 1024 * 1024), protected)
+
+    print(
+        f"Cache kompaktiert: {stats['migrated']} Ticker zusammengeführt, "
+        f"{stats['registered']} erfasst, {stats['removed']} verwaiste Einträge entfernt, "
+        f"{len(stats['evicted'])} verdrängt."
+    )
+    return stats
+
+
+_compaction_thread = None
+
+
+def start_background_compaction(max_mb: float | None = CACHE_MAX_MB) -> threading.Thread:
+    """
+    Startet die Kompaktierung einmal pro Prozess in einem Hintergrund-Thread
+    (Streamlit führt Startseite.py bei jeder Interaktion erneut aus).
+    """
+    global _compaction_thread
+    if _compaction_thread is None:
+        def run():
+            try:
+                compact_cache(max_mb)
+            except Exception as e:
+                print(f"Fehler bei der Cache-Kompaktierung: {e}")
+
+        _compaction_thread = threading.Thread(target=run, name="cache-compaction", daemon=True)
+        _compaction_thread.start()
+    return _compaction_thread
 
 if __name__ == "__main__":
     # Dieser Teil ermöglicht das manuelle Starten via Terminal
-    preload_all_data()
+    parser = argparse.ArgumentParser(description="Lädt den gesamten Katalog in den lokalen Kurs-Cache.")
+    parser.add_argument("--start-year", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=PRELOAD_MAX_WORKERS)
+    parser.add_argument("--rate", type=float, default=PRELOAD_REQUESTS_PER_SECOND, help="Downloads pro Sekunde")
+    parser.add_argument("--panel-only", action="store_true", help="Nur das Kurs-Panel aus dem vorhandenen Cache bauen")
+    parser.add_argument("--compact", action="store_true", help="Cache kompaktieren und Speicherbudget erzwingen")
+    parser.add_argument("--max-mb", type=float, default=CACHE_MAX_MB, help="Speicherbudget des Caches in MB")
+    args = parser.parse_args()
+
+    if args.compact:
+        compact_cache(args.max_mb)
+    elif args.panel_only:
+        price_panel.build_panel([v for k, v in KATALOG.items() if v])
+    else:
+        preload_all_data(start_year=args.start_year, max_workers=args.workers, requests_per_second=args.rate)
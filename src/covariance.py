@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+from datetime import timedelta
+
+from . import backend_simulation
+from .price_store import get_store
+
+#  KOVARIANZ AUS DER KURSHISTORIE
+# Schätzt die (annualisierte) Kovarianz der log-Renditen mehrerer Assets aus den gecachten Kursreihen
+# (ohne Download) für die Multi-Asset-Prognose. Volatilitäten kommen aus der eigenen Historie jedes
+# Assets, Korrelationen aus den gemeinsamen Handelstagen aller Assets mit Historie. Assets ohne
+# (ausreichende) Historie erhalten eine feste Ersatz-Volatilität und keine Korrelation.
+
+# Betrachteter Zeitraum: die letzten HISTORY_YEARS Jahre der gecachten Historie
+HISTORY_YEARS = 10
+
+# Mindestanzahl Renditen für Volatilität bzw. Korrelation (sonst Ersatzwert bzw. 0)
+MIN_RETURNS = 250
+
+# Relative Aufschläge auf die Diagonale, falls die Matrix numerisch nicht positiv definit ist
+CHOLESKY_JITTER = (1e-12, 1e-10, 1e-8, 1e-6, 1e-4)
+
+
+def _log_returns(data: pd.DataFrame) -> pd.Series:
+    close = data["Close"].astype("float64")
+    close = close[close > 0]
+    return np.log(close).diff().dropna()
+
+
+def _returns_per_year(returns: pd.Series | pd.DataFrame) -> float:
+    """Renditen je Jahr laut Kalender (Handelstage, bzw. Handelstage mit Kursen aller Assets)."""
+    span_days = (returns.index[-1] - returns.index[0]).days
+    return len(returns) / (span_days / 365.25) if span_days > 0 else 252.0
+
+
+def log_return_covariance(price_data: list[pd.DataFrame | None], fallback_volatility_pa: float) -> np.ndarray:
+    """
+    Annualisierte Kovarianzmatrix der log-Renditen (Positionen in Reihenfolge von price_data).
+    fallback_volatility_pa: Volatilität p.a. (%) für Positionen ohne ausreichende Historie.
+    """
+    n_assets = len(price_data)
+    returns = [_log_returns(data) if data is not None and not data.empty else None for data in price_data]
+    with_history = [j for j, r in enumerate(returns) if r is not None and len(r) >= MIN_RETURNS]
+
+    volatility = np.full(n_assets, fallback_volatility_pa / 100.0)
+    for j in with_history:
+        volatility[j] = returns[j].std() * np.sqrt(_returns_per_year(returns[j]))
+
+    correlation = np.eye(n_assets)
+    if len(with_history) > 1:
+        # Gemeinsame Handelstage: Renditen über die Kurse dieser Tage (nicht über einzelne Tagesrenditen)
+        closes = pd.concat([price_data[j]["Close"] for j in with_history], axis=1, join="inner")
+        common = np.log(closes.where(closes > 0)).diff().dropna()
+        if len(common) >= MIN_RETURNS:
+            common_correlation = np.corrcoef(common.to_numpy(dtype="float64"), rowvar=False)
+            correlation[np.ix_(with_history, with_history)] = np.nan_to_num(common_correlation)
+            np.fill_diagonal(correlation, 1.0)
+    return correlation * np.outer(volatility, volatility)
+
+
+def historical_covariance(isins: list[str], fallback_volatility_pa: float, history_years: int = HISTORY_YEARS) -> np.ndarray:
+    """
+    Kovarianzmatrix p.a. für die ISINs aus den letzten history_years Jahren ihrer gecachten Historie.
+    ISINs ohne Cache-Eintrag erhalten fallback_volatility_pa (%) und keine Korrelation.
+    """
+    store = get_store()
+    price_data = []
+    for isin in isins:
+        coverage = store.coverage(isin)
+        if coverage is None:
+            print(f"Kovarianz: Keine gecachten Kursdaten für {isin}, nutze {fallback_volatility_pa:.1f}% Volatilität.")
+            price_data.append(None)
+            continue
+        start_date = max(coverage[0], coverage[1] - timedelta(days=int(history_years * 365.25)))
+        price_data.append(backend_simulation.load_data(isin, start_date, coverage[1]))
+    return log_return_covariance(price_data, fallback_volatility_pa)
+
+
+def cholesky_factor(covariance: np.ndarray) -> np.ndarray:
+    """
+    Untere Dreiecksmatrix L mit L @ L.T = covariance. Ist die Matrix (z.B. durch unterschiedliche
+    Zeiträume von Volatilität und Korrelation) nicht positiv definit, wird die Diagonale schrittweise
+    angehoben; zuletzt werden negative Eigenwerte abgeschnitten.
+    """
+    try:
+        return np.linalg.cholesky(covariance)
+    except np.linalg.LinAlgError:
+        pass
+    scale = max(float(np.mean(np.diag(covariance))), 1e-300)
+    for jitter in CHOLESKY_JITTER:
+        try:
+            return np.linalg.cholesky(covariance + np.eye(len(covariance)) * jitter * scale)
+        except np.linalg.LinAlgError:
+            continue
+    eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+    clipped = (eigenvectors * np.maximum(eigenvalues, 0.0)) @ eigenvectors.T
+    return np.linalg.cholesky(clipped + np.eye(len(covariance)) * CHOLESKY_JITTER[-1] * scale)
@@ -0,0 +1,243 @@
+import os
+import zlib
+import threading
+import warnings
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from yfinance.exceptions import YFPricesMissingError
+from datetime import date
+
+#  PROVIDER KONFIGURATION
+# "yfinance" (Live-Marktdaten) oder "synthetic" (deterministische Offline-Kurse für Benchmarks/Lasttests)
+DATA_PROVIDER = os.environ.get("GUTMANN_DATA_PROVIDER", "yfinance")
+
+
+def empty_close() -> pd.DataFrame:
+    """Leere Kursreihe (Ergebnis eines bestätigt leeren Zeitraums)."""
+    return pd.DataFrame({"Close": pd.Series(dtype="float64")}, index=pd.DatetimeIndex([], name="Date"))
+
+
+class MarketDataProvider:
+    """
+    Schnittstelle für Marktdaten-Quellen.
+    cache_subdir trennt den Kurs-Cache je Quelle (synthetische Kurse landen nie im echten Cache).
+    """
+    name = ""
+    cache_subdir = ""
+
+    def download_close(self, tickers: list[str], start_date: date, end_date: date) -> dict[str, pd.DataFrame]:
+        """
+        Schlusskurse je Ticker als DataFrame mit Spalte 'Close' (Ende exklusiv).
+        Ticker ohne Kurse im Zeitraum erhalten ein leeres DataFrame (bestätigt leer);
+        Ticker, deren Download fehlgeschlagen ist, fehlen im Ergebnis.
+        """
+        raise NotImplementedError
+
+    def get_info(self, ticker: str) -> dict | None:
+        """
+        Stammdaten eines Tickers ({"name", "currency", "exchange", "first_date"})
+        oder None, falls der Ticker ungültig ist.
+        """
+        raise NotImplementedError
+
+
+class YFinanceProvider(MarketDataProvider):
+    """
+    Live-Marktdaten über yfinance.
+    """
+    name = "yfinance"
+
+    # yf.download hält globalen Zustand -> parallele Aufrufe (Sessions, Preloader-Threads) serialisieren.
+    # Innerhalb eines Aufrufs lädt yfinance die Ticker selbst parallel.
+    _download_lock = threading.Lock()
+
+    def download_close(self, tickers, start_date, end_date):
+        try:
+            with self._download_lock:
+                data = yf.download(tickers, start=start_date, end=end_date, group_by="column")
+        except Exception as e:
+            print(f"Ein Fehler bei yfinance ist aufgetreten: {e}")
+            return {}
+
+        results = {}
+        if data is not None and not data.empty:
+            #  FIX FÜR MULTI-INDEX SPALTEN (Preisart, Ticker)
+            if isinstance(data.columns, pd.MultiIndex):
+                close_table = data["Close"]
+            else:
+                close_table = data[["Close"]].rename(columns={"Close": tickers[0]})
+            close_table.index = pd.to_datetime(close_table.index)
+
+            for ticker in tickers:
+                if ticker not in close_table.columns:
+                    continue
+                # Gemeinsamer Index aller Ticker -> nur die eigenen Handelstage behalten
+                close_data = close_table[[ticker]].dropna()
+                if close_data.empty:
+                    continue
+                close_data.columns = ["Close"]
+                close_data.columns.name = None
+                results[ticker] = close_data
+
+        # yf.download meldet Fehler nur im Log: Ticker ohne Kurse einzeln nachfragen, ob der
+        # Zeitraum wirklich leer ist oder der Download fehlgeschlagen ist (Timeout, Rate-Limit, ...)
+        for ticker in tickers:
+            if ticker not in results:
+                close_data = self._download_single(ticker, start_date, end_date)
+                if close_data is not None:
+                    results[ticker] = close_data
+        return results
+
+    def _download_single(self, ticker: str, start_date: date, end_date: date) -> pd.DataFrame | None:
+        """
+        Einzelabfrage, die Fehler nicht verschluckt: leeres DataFrame, falls yfinance bestätigt,
+        dass es im Zeitraum keine Kurse gibt; None, falls der Download fehlgeschlagen ist.
+        """
+        try:
+            with self._download_lock, warnings.catch_warnings():
+                warnings.simplefilter("ignore", DeprecationWarning)
+                history = yf.Ticker(ticker).history(start=start_date, end=end_date, raise_errors=True)
+        except YFPricesMissingError:
+            return empty_close()
+        except Exception as e:
+            print(f"Download von {ticker} fehlgeschlagen: {e}")
+            return None
+
+        if "Close" not in history.columns:
+            return empty_close()
+        close_data = history[["Close"]].dropna()
+        if close_data.index.tz is not None:
+            # Wie yf.download (ignore_tz): lokales Handelsdatum ohne Zeitzone
+            close_data.index = close_data.index.tz_localize(None)
+        close_data.index.name = "Date"
+        return close_data
+
+    def get_info(self, ticker):
+        # Eine schlanke Chart-Abfrage liefert Handelsdaten UND Stammdaten (statt des vollen .info-Payloads)
+        ticker_obj = yf.Ticker(ticker)
+        history_data = ticker_obj.history(period="5d")
+        if history_data.empty:
+            return None
+
+        meta = ticker_obj.history_metadata or {}
+        first_trade = meta.get("firstTradeDate")
+        return {
+            "name": meta.get("longName") or meta.get("shortName"),
+            "currency": meta.get("currency"),
+            "exchange": meta.get("fullExchangeName") or meta.get("exchangeName"),
+            "first_date": date.fromtimestamp(first_trade).isoformat() if first_trade else None,
+        }
+
+
+class SyntheticProvider(MarketDataProvider):
+    """
+    Deterministische Offline-Kurse: geometrische Brownsche Bewegung je Ticker (an allen Werktagen ab `origin`).
+    Jeder Ticker erhält aus (seed, Tickername) eine eigene Drift/Volatilität und die log-Rendite jedes
+    Kalenderjahres (Anker, ein Wert pro Jahr). Die Tageskurse eines Jahres kommen aus einem eigenen
+    Strom (seed, Tickername, Jahr) als Brownsche Brücke zwischen den Ankern. So liefern beliebige
+    Zeiträume (auch Teilstücke für Delta-Downloads) dieselben Kurse, erzeugt werden aber nur die
+    Jahre des angefragten Zeitraums.
+    """
+    name = "synthetic"
+    cache_subdir = "synthetic"
+
+    def __init__(
+        self,
+        seed: int = 42,
+        origin: date = date(1990, 1, 1),
+        mu_range_pa: tuple[float, float] = (0.02, 0.10),
+        sigma_range_pa: tuple[float, float] = (0.10, 0.35),
+        start_price: float = 100.0,
+    ):
+        self.seed = seed
+        self.origin = origin
+        self.mu_range_pa = mu_range_pa
+        self.sigma_range_pa = sigma_range_pa
+        self.start_price = start_price
+
+    def _rng(self, ticker: str, *stream: int) -> np.random.Generator:
+        return np.random.default_rng([self.seed, zlib.crc32(ticker.encode("utf-8")), *stream])
+
+    def _year_days(self, year: int) -> np.ndarray:
+        """Werktage eines Kalenderjahres ab origin."""
+        start = max(np.datetime64(date(year, 1, 1), "D"), np.datetime64(self.origin, "D"))
+        days = np.arange(start, np.datetime64(date(year + 1, 1, 1), "D"))
+        # 1970-01-01 war ein Donnerstag -> (Tag + 3) % 7 ergibt den Wochentag (Montag = 0)
+        return days[(days.view("int64") + 3) % 7 < 5]
+
+    def _increment_count(self, year: int) -> int:
+        """Anzahl Tagesrenditen eines Jahres (der erste Tag ab origin trägt den Startkurs)."""
+        return len(self._year_days(year)) - (year == self.origin.year)
+
+    def price_window(self, ticker: str, start_date: date, end_date: date) -> pd.Series:
+        """Kurse an allen Werktagen in [start_date, end_date) (frühestens ab origin)."""
+        first_year = max(start_date, self.origin).year
+        last_year = (pd.Timestamp(end_date) - pd.Timedelta(days=1)).year
+        if last_year < first_year:
+            return pd.Series(dtype="float64", index=pd.DatetimeIndex([], name="Date"))
+
+        rng = self._rng(ticker)
+        mu = rng.uniform(*self.mu_range_pa)
+        sigma = rng.uniform(*self.sigma_range_pa)
+        dt = 1.0 / 252
+        drift = (mu - 0.5 * sigma ** 2) * dt
+
+        # Anker: log-Rendite je Kalenderjahr ab origin (ein Wert pro Jahr, Präfix-stabil)
+        years = np.arange(self.origin.year, last_year + 1)
+        counts = np.array([self._increment_count(year) for year in years])
+        annual = drift * counts + sigma * np.sqrt(counts * dt) * rng.standard_normal(len(years))
+        anchors = np.log(self.start_price) + np.concatenate(([0.0], np.cumsum(annual)))
+
+        all_days, all_levels = [], []
+        for k in range(first_year - self.origin.year, len(years)):
+            year_days = self._year_days(int(years[k]))
+            # Brownsche Brücke: Tagesrenditen des Jahres, verschoben auf die Jahresrendite des Ankers
+            increments = drift + sigma * np.sqrt(dt) * self._rng(ticker, int(years[k])).standard_normal(counts[k])
+            if counts[k]:
+                increments += (annual[k] - increments.sum()) / counts[k]
+            levels = anchors[k] + np.cumsum(increments)
+            if years[k] == self.origin.year:
+                levels = np.concatenate(([anchors[k]], levels))
+            all_days.append(year_days)
+            all_levels.append(levels)
+
+        days = np.concatenate(all_days)
+        in_window = (days >= np.datetime64(start_date, "D")) & (days < np.datetime64(end_date, "D"))
+        return pd.Series(
+            np.exp(np.concatenate(all_levels)[in_window]),
+            index=pd.DatetimeIndex(days[in_window].astype("datetime64[ns]"), name="Date"),
+        )
+
+    def download_close(self, tickers, start_date, end_date):
+        return {ticker: self.price_window(ticker, start_date, end_date).to_frame("Close") for ticker in tickers}
+
+    def get_info(self, ticker):
+        return {
+            "name": f"Synthetic {ticker}",
+            "currency": "EUR",
+            "exchange": "SYN",
+            "first_date": self.origin.isoformat(),
+        }
+
+
+PROVIDERS = {
+    "yfinance": YFinanceProvider,
+    "synthetic": SyntheticProvider,
+}
+
+_provider = None
+
+
+def get_provider() -> MarketDataProvider:
+    """Gibt den aktiven Marktdaten-Provider zurück (Standard: DATA_PROVIDER)."""
+    global _provider
+    if _provider is None:
+        _provider = PROVIDERS[DATA_PROVIDER]()
+    return _provider
+
+
+def set_provider(provider: MarketDataProvider) -> None:
+    """Setzt den aktiven Marktdaten-Provider (z.B. SyntheticProvider für Benchmarks)."""
+    global _provider
+    _provider = provider
@@ -0,0 +1,130 @@
+import os
+import atexit
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+import numpy as np
+
+#  AUSFÜHRUNG IM PROZESS-POOL
+# Verteilt unabhängige Teilaufgaben (Positions-Blöcke, Monte-Carlo-Pfade) auf einen dauerhaften
+# Prozess-Pool. Große Arrays (Kurse, Zufallszahlen, Ergebnis-Matrizen) werden über Shared Memory
+# geteilt statt gepickelt; Worker schreiben ihre Ergebnisse direkt in die geteilten Arrays.
+# Kleine Aufgaben laufen im eigenen Prozess, weil der Versand sonst teurer wäre als die Rechnung.
+
+def available_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+# Anzahl Worker-Prozesse (Standard: verfügbare Kerne), per Umgebungsvariable überschreibbar
+POOL_WORKERS = int(os.environ.get("GUTMANN_POOL_WORKERS", available_cores()))
+
+# "spawn" startet Worker ohne Kopie des (mehrfädigen) Streamlit-Prozesses
+POOL_START_METHOD = "spawn"
+
+# Unterhalb dieser Arbeitsmenge (Array-Zellen) wird im eigenen Prozess gerechnet
+MIN_PARALLEL_CELLS = 5_000_000
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Gibt den prozessweit geteilten Pool zurück (wird beim ersten Aufruf gestartet)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=POOL_WORKERS,
+                mp_context=multiprocessing.get_context(POOL_START_METHOD),
+            )
+            print(f"Prozess-Pool gestartet ({POOL_WORKERS} Worker).")
+        return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+atexit.register(shutdown_pool)
+
+
+def use_pool(cells: int, n_tasks: int) -> bool:
+    """Lohnt sich der Pool für eine Aufgabe dieser Größe?"""
+    return POOL_WORKERS > 1 and n_tasks > 1 and cells >= MIN_PARALLEL_CELLS
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    # Worker teilen sich den resource_tracker des Hauptprozesses: das Anhängen meldet den Block
+    # dort nur erneut an (ohne Wirkung), freigegeben wird er ausschließlich von map_shared
+    return shared_memory.SharedMemory(name=name)
+
+
+def _run_shared(func, specs: dict, task):
+    """Worker-Seite: Shared-Memory-Blöcke als Arrays einblenden und func(arrays, task) ausführen."""
+    blocks = {key: _attach(name) for key, (name, shape, dtype) in specs.items()}
+    try:
+        arrays = {
+            key: np.ndarray(shape, dtype=dtype, buffer=blocks[key].buf)
+            for key, (name, shape, dtype) in specs.items()
+        }
+        return func(arrays, task)
+    finally:
+        arrays = None
+        for block in blocks.values():
+            block.close()
+
+
+def map_shared(func, arrays: dict[str, np.ndarray], tasks: list, parallel: bool, outputs: tuple[str, ...] = ()) -> list:
+    """
+    Führt func(arrays, task) für alle tasks aus und gibt die Rückgabewerte in Reihenfolge zurück.
+    func muss eine Funktion auf Modulebene sein (wird an die Worker gepickelt).
+    outputs: Schlüssel der Arrays, in die func schreibt; sie werden nach der Ausführung im Pool
+    in die Arrays des Aufrufers zurückkopiert (im eigenen Prozess schreibt func direkt hinein).
+    parallel=False oder ein ausgefallener Pool: Ausführung im eigenen Prozess.
+    """
+    if not parallel:
+        return [func(arrays, task) for task in tasks]
+
+    blocks = {}
+    try:
+        specs = {}
+        for key, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            blocks[key] = block
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            specs[key] = (block.name, array.shape, array.dtype.str)
+
+        try:
+            futures = [get_pool().submit(_run_shared, func, specs, task) for task in tasks]
+            results = [future.result() for future in futures]
+        except BrokenProcessPool as e:
+            print(f"Prozess-Pool ausgefallen, rechne im eigenen Prozess: {e}")
+            shutdown_pool()
+            return [func(arrays, task) for task in tasks]
+
+        # Ergebnisse der Worker in die Arrays des Aufrufers zurückschreiben
+        for key in outputs:
+            array = arrays[key]
+            array[...] = np.ndarray(array.shape, dtype=array.dtype, buffer=blocks[key].buf)
+        return results
+    finally:
+        for block in blocks.values():
+            block.close()
+            block.unlink()
+
+
+def split_range(n: int, n_parts: int) -> list[slice]:
+    """Teilt range(n) in höchstens n_parts zusammenhängende, etwa gleich große Blöcke."""
+    bounds = np.linspace(0, n, min(n_parts, n) + 1).astype(int) if n else np.zeros(1, int)
+    return [slice(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:])]
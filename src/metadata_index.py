@@ -0,0 +1,166 @@
+import os
+import json
+import time
+import threading
+
+from .catalog import KATALOG, ISIN_TO_TICKER
+from .data_provider import get_provider
+from .price_store import get_store
+
+#  METADATEN KONFIGURATION
+# Persistenter Index ISIN/Ticker -> Stammdaten (Name, Währung, Börse, erster Handelstag).
+# Liegt im Cache-Verzeichnis des aktiven Providers neben dem Kurs-Manifest.
+METADATA_FILENAME = "metadata.json"
+
+# Ungültige Eingaben werden so lange negativ gecacht (Sekunden), danach erneut geprüft
+NEGATIVE_TTL_SECONDS = 24 * 3600
+
+# Katalog-Namen (ISIN -> Anzeigename) sind ohne Netzwerk bekannt
+_CATALOG_NAMES = {isin: name for name, isin in KATALOG.items() if isin}
+
+
+class MetadataIndex:
+    """
+    Stammdaten-Index: ISIN/Ticker -> {"name", "currency", "exchange", "first_date"}.
+    Ungültige Eingaben werden als {"invalid": True, "checked": <Zeitstempel>} gespeichert.
+    Wird einmal pro Prozess geladen und bei jeder Änderung atomar geschrieben.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._entries = None
+        self._lock = threading.RLock()
+
+    def _load(self) -> dict:
+        with self._lock:
+            if self._entries is None:
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        self._entries = json.load(f)["entries"]
+                except FileNotFoundError:
+                    self._entries = {}
+                except (ValueError, KeyError) as e:
+                    print(f"Metadaten-Index defekt, wird neu aufgebaut: {e}")
+                    self._entries = {}
+            return self._entries
+
+    def get(self, key: str) -> dict | None:
+        """
+        Gibt den Eintrag zurück oder None, falls unbekannt bzw. der negative Eintrag abgelaufen ist.
+        """
+        entry = self._load().get(key)
+        if entry is not None and entry.get("invalid"):
+            if time.time() - entry["checked"] > NEGATIVE_TTL_SECONDS:
+                return None
+        return entry
+
+    def update(self, entries: dict[str, dict]) -> None:
+        """Übernimmt mehrere Einträge mit einem einzigen Schreibvorgang."""
+        if not entries:
+            return
+        with self._lock:
+            self._load().update(entries)
+            self._save()
+
+    def set(self, key: str, info: dict) -> None:
+        self.update({key: info})
+
+    def set_invalid(self, key: str) -> None:
+        self.update({key: {"invalid": True, "checked": time.time()}})
+
+    def _save(self) -> None:
+        # Atomar schreiben: temporäre Datei + Umbenennen
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"entries": self._entries}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index() -> MetadataIndex:
+    """
+    Gibt den Index für das Cache-Verzeichnis des aktiven Providers zurück (einmal pro Prozess).
+    """
+    path = os.path.join(get_store().cache_dir, METADATA_FILENAME)
+    with _indexes_lock:
+        if path not in _indexes:
+            _indexes[path] = MetadataIndex(path)
+        return _indexes[path]
+
+
+def fetch_info(isin: str) -> dict | None:
+    """
+    Fragt die Stammdaten beim Provider ab (ISIN wird wie beim Download auf den Ticker abgebildet).
+    Katalog-Titel behalten ihren Katalognamen. Gibt None zurück, falls der Ticker ungültig ist.
+    """
+    info = get_provider().get_info(ISIN_TO_TICKER.get(isin, isin))
+    if info is None:
+        return None
+    info = dict(info)
+    if isin in _CATALOG_NAMES:
+        info["name"] = _CATALOG_NAMES[isin]
+    return info
+
+
+def lookup(isin: str) -> dict | None:
+    """
+    Stammdaten für eine ISIN/einen Ticker. Reihenfolge: Index -> Katalog -> Provider.
+    Gibt None zurück, falls die Eingabe ungültig ist (Ergebnis wird für NEGATIVE_TTL_SECONDS gemerkt).
+    Netzwerkfehler (Exceptions) werden nicht gecacht, sondern weitergereicht.
+    """
+    index = get_index()
+    entry = index.get(isin)
+    if entry is not None:
+        return None if entry.get("invalid") else entry
+
+    if isin in _CATALOG_NAMES:
+        # Katalog-Titel sind immer gültig; Details ergänzt der Preloader
+        entry = {"name": _CATALOG_NAMES[isin]}
+        index.set(isin, entry)
+        return entry
+
+    entry = fetch_info(isin)
+    if entry is None:
+        index.set_invalid(isin)
+        return None
+    index.set(isin, entry)
+    return entry
+
+
+def build_entries(isins: list[str], before_fetch=None) -> dict[str, dict]:
+    """
+    Baut vollständige Einträge (Katalogname, Währung, Börse, erster Handelstag) für den Preloader.
+    Bereits vollständige Einträge werden übersprungen (unvollständige beim nächsten Lauf erneut versucht); before_fetch() wird vor jeder
+    Provider-Anfrage aufgerufen (z.B. Token-Bucket). Schlägt die Anfrage fehl,
+    wird der Eintrag aus Katalog und Kurs-Cache befüllt.
+    """
+    index = get_index()
+    entries = {}
+    for isin in isins:
+        entry = index.get(isin)
+        if entry is not None and entry.get("currency"):
+            continue
+        try:
+            if before_fetch is not None:
+                before_fetch()
+            info = fetch_info(isin)
+        except Exception as e:
+            print(f"  -> Metadaten für {isin} nicht abrufbar: {e}")
+            info = None
+        if info is None:
+            info = {"name": _CATALOG_NAMES.get(isin, isin), "currency": None, "exchange": None}
+        if not info.get("first_date"):
+            info["first_date"] = first_date_from_cache(isin)
+        entries[isin] = info
+    return entries
+
+
+def first_date_from_cache(isin: str) -> str | None:
+    """Ersatz für den ersten Handelstag: Beginn der im Kurs-Cache gespeicherten Reihe."""
+    cached = get_store().read(isin)
+    if cached is None or cached[0].empty:
+        return None
+    return cached[0].index[0].date().isoformat()
@@ -0,0 +1,401 @@
+import numpy as np
+import pandas as pd
+from datetime import date
+
+from . import sim_kernel
+from . import executor
+
+#  PORTFOLIO-ENGINE
+# Simuliert alle Positionen eines Portfolios in einem Durchgang auf einer gemeinsamen
+# Tages-Matrix (Tage x Positionen). Jede Position wird exakt wie in sim_kernel.simulate_plan
+# gerechnet und anschließend wie in run_portfolio_simulation auf den Portfolio-Zeitraum
+# ausgerichtet (ffill, bfill bis BFILL_LIMIT_DAYS Tage, Rest 0).
+
+COLUMNS = ["Einzahlungen (brutto)", "Portfolio (nominal)", "Portfolio (real)"]
+
+# Positionen, die erst nach dem Portfolio-Start beginnen, werden so viele Tage rückwärts aufgefüllt
+BFILL_LIMIT_DAYS = 10
+
+
+def forward_fill_columns(values: np.ndarray) -> np.ndarray:
+    """Füllt NaN spaltenweise mit dem letzten gültigen Wert (führende NaN bleiben NaN)."""
+    rows = np.arange(values.shape[0])[:, None]
+    last_valid = np.where(np.isnan(values), -1, rows)
+    np.maximum.accumulate(last_valid, axis=0, out=last_valid)
+    filled = np.take_along_axis(values, np.maximum(last_valid, 0), axis=0)
+    return np.where(last_valid >= 0, filled, np.nan)
+
+
+def accumulate_columns(columns: list[np.ndarray], out: np.ndarray) -> np.ndarray:
+    """
+    Summiert Spalten-Arrays in der gegebenen Reihenfolge in den vorab angelegten Puffer `out`
+    (Kahan-Kompensation wie pandas groupby().sum(), daher identische Ergebnisse).
+    Außer zwei Hilfspuffern entstehen keine Zwischen-Arrays, unabhängig von der Anzahl der Spalten.
+    """
+    out[:] = 0.0
+    compensation = np.zeros_like(out)
+    y = np.empty_like(out)
+    t = np.empty_like(out)
+    for values in columns:
+        np.subtract(values, compensation, out=y)
+        np.add(out, y, out=t)
+        np.subtract(t, out, out=compensation)
+        compensation -= y
+        # +/- unendlich ergibt NaN als Kompensation -> zurücksetzen (wie pandas)
+        np.copyto(compensation, 0.0, where=np.isnan(compensation))
+        out[:] = t
+    return out
+
+
+def union_days(day_arrays: list[np.ndarray]) -> np.ndarray:
+    """Vereinigung von Tagesnummern (aufsteigend, ohne Duplikate) über eine Markierung je Kalendertag statt Sortieren."""
+    day_arrays = [days for days in day_arrays if len(days)]
+    if not day_arrays:
+        return np.empty(0, dtype="int64")
+    first_day = min(days.min() for days in day_arrays)
+    last_day = max(days.max() for days in day_arrays)
+    is_day = np.zeros(last_day - first_day + 1, dtype=bool)
+    for days in day_arrays:
+        is_day[days - first_day] = True
+    return first_day + np.flatnonzero(is_day)
+
+
+def depot_fee_curve(days: np.ndarray, depotgebuehr_pa_eur: float, start_day: int | None = None) -> np.ndarray:
+    """
+    Kumulierte Depotgebühr je Tag: fällig an jedem 1. Jänner ab start_day (Standard: erster Tag) außer
+    dem ersten (wie resample("YS") + Schnittmenge mit dem Index in der bisherigen Logik).
+    days muss nicht lückenlos sein (Handelstage): ein 1. Jänner ohne eigene Zeile zählt ab der nächsten Zeile.
+    """
+    if len(days) == 0:
+        return np.empty(0)
+    if start_day is None:
+        start_day = days[0]
+    years = np.arange(*np.array([start_day, days[-1] + 366]).astype("datetime64[D]").astype("datetime64[Y]"))
+    new_years = years.astype("datetime64[D]").view("int64")
+    fee_days = new_years[(new_years >= start_day) & (new_years <= days[-1])][1:]
+    fee_total = np.concatenate(([0.0], np.cumsum(np.full(len(fee_days), depotgebuehr_pa_eur))))
+    return fee_total[np.searchsorted(fee_days, days, side="right")]
+
+
+def apply_depot_fee(
+    days: np.ndarray, nominal: np.ndarray, depotgebuehr_pa_eur: float, start_day: int | None = None
+) -> np.ndarray:
+    """Zieht die kumulierte Depotgebühr vom Nominalwert ab (in place, nicht unter 0)."""
+    nominal -= depot_fee_curve(days, depotgebuehr_pa_eur, start_day)
+    np.maximum(nominal, 0.0, out=nominal)
+    return nominal
+
+
+class PortfolioMatrix:
+    """
+    Ergebnis der Matrix-Simulation.
+    index:     Tage des Portfolio-Zeitraums (DatetimeIndex)
+    names:     Namen der Positionen (Spaltenreihenfolge)
+    values:    Dict Spaltenname -> Matrix (Tage x Positionen), bereits auf den Zeitraum ausgerichtet
+    included:  bool je Position; False, wenn die Simulation leer ist (keine Zeile mit Wert > 1)
+    summary:   Dict mit Start-/Endwerten je Position (für Renditen und Endwerte)
+    """
+
+    def __init__(self, index: pd.DatetimeIndex, names: list[str], values: dict, included: np.ndarray, summary: dict):
+        self.index = index
+        self.names = names
+        self.values = values
+        self.included = included
+        self.summary = summary
+
+    def accumulate(self, columns: list[str] = COLUMNS) -> np.ndarray:
+        """
+        Summe aller enthaltenen Positionen je Spalte in einem vorab angelegten Array (Tage x Spalten).
+        """
+        totals = np.empty((len(columns), len(self.index)))
+        included = np.flatnonzero(self.included)
+        for k, column in enumerate(columns):
+            matrix = self.values[column]
+            accumulate_columns((matrix[:, j] for j in included), totals[k])
+        return totals.T
+
+    def totals(self) -> pd.DataFrame:
+        """Portfolio-Summen (wie concat + groupby().sum() über alle enthaltenen Positionen)."""
+        return pd.DataFrame(self.accumulate(), index=self.index, columns=COLUMNS)
+
+    def contributions(self, column: str = "Portfolio (nominal)") -> pd.DataFrame:
+        """Beitrag jeder enthaltenen Position zu einer Spalte (Tage x Positionen)."""
+        columns = np.flatnonzero(self.included)
+        return pd.DataFrame(
+            self.values[column][:, columns],
+            index=self.index,
+            columns=[self.names[j] for j in columns],
+        )
+
+
+def simulate_positions(
+    price_data: list[pd.DataFrame],
+    names: list[str],
+    lump_sums: list[float],
+    periodic_investments: list[float],
+    intervals: list[str],
+    start_date: date,
+    end_date: date,
+    inflation_series: pd.Series,
+    ausgabeaufschlag_pct: float,
+    managementgebuehr_pa_pct: float,
+    min_value: float = 1.0,
+    trading_days: bool = False,
+    trade_days: np.ndarray | None = None,
+) -> PortfolioMatrix:
+    """
+    Simuliert alle Positionen gemeinsam. price_data[j] ist die Kursreihe (DataFrame mit 'Close')
+    der Position j; Einmalerlag, Sparrate und Intervall gelten je Position.
+    Tage mit Wert <= min_value entfallen wie in run_simulation (-np.inf behält alle Tage, z.B. für Basispfade).
+    trading_days=True: Zeilen sind nur die Vereinigung der Handelstage aller Positionen statt jedes
+    Kalendertags; Kaufkurse, Gebühren und Inflation laufen weiter nach Kalendertagen (gleiche Werte).
+    trade_days (Tagesnummern): weitere Handelstage im Raster, z.B. die aller Positionen eines Portfolios,
+    wenn nur ein Teil davon simuliert wird (Blöcke im Pool, einzeln gecachte Positionen).
+    """
+    n_assets = len(price_data)
+    asset_days = [sim_kernel.to_days(data.index) for data in price_data]
+    start_day = sim_kernel.to_days([np.datetime64(start_date)])[0]
+    end_day = sim_kernel.to_days([np.datetime64(end_date)])[0]
+
+    #  1. GEMEINSAME MATRIX (Tage x Positionen): jeder Kalendertag von Portfolio-Zeitraum und
+    #     Kursreihen ODER nur die Vereinigung der Handelstage plus Monatsanfänge (Kauftage; dort kann
+    #     eine Position erstmals über min_value steigen, was Start und bfill bestimmt)
+    non_empty = [days for days in asset_days if len(days)]
+    if trading_days and trade_days is not None and len(trade_days):
+        non_empty = non_empty + [np.asarray(trade_days, dtype="int64")]
+    if trading_days and not non_empty:
+        # Keine Handelstage -> leeres Ergebnis, keine Position enthalten
+        empty = {column: np.zeros((0, n_assets)) for column in COLUMNS}
+        summary = {key: np.zeros(n_assets) for key in ("first_nominal", "last_nominal", "last_invested")}
+        return PortfolioMatrix(pd.DatetimeIndex([]), list(names), empty, np.zeros(n_assets, bool), summary)
+    if trading_days:
+        # Markierung je Kalendertag statt Sortieren/unique über alle Kursreihen
+        first_trade_day = min(days.min() for days in non_empty)
+        last_trade_day = max(days.max() for days in non_empty)
+        is_trade_day = np.zeros(last_trade_day - first_trade_day + 1, dtype=bool)
+        for days in non_empty:
+            is_trade_day[days - first_trade_day] = True
+        first_month, last_month = np.array([first_trade_day, last_trade_day]).astype("datetime64[D]").astype("datetime64[M]")
+        month_starts = np.arange(first_month + 1, last_month + 1).astype("datetime64[D]").view("int64")
+        in_grid = is_trade_day.copy()
+        in_grid[month_starts - first_trade_day] = True
+        grid_days = first_trade_day + np.flatnonzero(in_grid)
+    else:
+        grid_start = min([start_day] + [days.min() for days in non_empty])
+        grid_end = max([end_day] + [days.max() for days in non_empty])
+        grid_days = np.arange(grid_start, grid_end + 1, dtype="int64")
+    n_rows = len(grid_days)
+    rows = np.arange(n_rows)
+
+    prices = np.full((n_rows, n_assets), np.nan)
+    last_row = np.full(n_assets, -1)
+    for j, (data, days) in enumerate(zip(price_data, asset_days)):
+        if len(days):
+            asset_rows = np.searchsorted(grid_days, days)
+            prices[asset_rows, j] = data["Close"].to_numpy(dtype="float64")
+            last_row[j] = asset_rows.max()
+    prices = forward_fill_columns(prices)
+
+    # Erster gültiger Kurs je Position (Beginn ihres Kalenders), danach bis zum letzten Kurstag
+    has_price = ~np.isnan(prices)
+    first_row = np.where(has_price.any(axis=0), has_price.argmax(axis=0), n_rows)
+    in_range = (rows[:, None] >= first_row) & (rows[:, None] <= last_row)
+    first_day = grid_days[np.minimum(first_row, n_rows - 1)]
+    offsets = np.maximum(grid_days[:, None] - first_day, 0)
+
+    #  2. LAUFENDE KÄUFE: Periodenbeginne (Kalendertage) je Intervall, außer dem ersten Tag jeder Position;
+    #     Kaufkurs ist der letzte Kurs bis zum Periodenbeginn
+    first_month, last_month = grid_days[[0, -1]].astype("datetime64[D]").astype("datetime64[M]")
+    months = np.arange(first_month, last_month + 1)
+    month_days = months.astype("datetime64[D]").view("int64")
+    period_start = {}
+    for interval in set(intervals):
+        ids = months.view("int64") // sim_kernel.INTERVAL_MONTHS.get(interval, 1)
+        period_start[interval] = np.concatenate(([False], ids[1:] != ids[:-1]))
+    starts = np.column_stack([period_start[interval] for interval in intervals]) if n_assets else np.zeros((len(months), 0), bool)
+    last_day = grid_days[np.maximum(last_row, 0)]
+    purchase = starts & (month_days[:, None] > first_day) & (month_days[:, None] <= last_day)
+    purchase_prices = prices[np.searchsorted(grid_days, month_days, side="right") - 1]
+
+    cost_factor = 1.0 - (ausgabeaufschlag_pct / 100.0)
+    periodic = np.array(periodic_investments, dtype="float64")
+    lump = np.array(lump_sums, dtype="float64")
+    buy_price = np.where(purchase & (purchase_prices > 0), purchase_prices, np.inf)
+    shares_bought = np.where(purchase & (purchase_prices > 0), (periodic * cost_factor) / buy_price, 0.0)
+
+    # Kumuliert je Monat, dann auf die Zeilen übertragen (Zeile 0 der Präfixsummen: noch kein Kauf)
+    month_of_row = np.searchsorted(month_days, grid_days, side="right")
+    shares = np.vstack([np.zeros(n_assets), np.cumsum(shares_bought, axis=0)])[month_of_row]
+    invested = np.vstack([np.zeros(n_assets), np.cumsum(np.where(purchase, periodic, 0.0), axis=0)])[month_of_row]
+
+    #  3. EINMALERLAG zum ersten Kurs jeder Position
+    first_price = prices[np.minimum(first_row, n_rows - 1), np.arange(n_assets)]
+    lump_shares = np.zeros(n_assets)
+    buy_lump = (lump > 0) & (first_price > 0)
+    lump_shares[buy_lump] = (lump[buy_lump] * cost_factor) / first_price[buy_lump]
+    shares = shares + lump_shares
+    invested = invested + lump
+
+    #  4. WERT, GEBÜHREN & INFLATION (Gebühr ab dem ersten Tag jeder Position, nach Kalendertagen)
+    n_calendar = int(grid_days[-1] - grid_days[0] + 1)
+    nominal = (shares * prices) * sim_kernel.fee_curve(n_calendar, managementgebuehr_pa_pct)[offsets]
+    if isinstance(inflation_series, pd.Series):
+        inflation_curve = sim_kernel.inflation_curve(
+            grid_days,
+            (sim_kernel.to_days(inflation_series.index), inflation_series.to_numpy(dtype="float64")),
+        )[:, None]
+    else:
+        calendar = np.arange(n_calendar, dtype="int64")
+        inflation_curve = sim_kernel.inflation_curve(calendar, inflation_series)[offsets]
+    real = nominal / inflation_curve
+
+    # Zeilen mit Wert <= min_value entfallen (wie in run_simulation)
+    kept = in_range & (nominal > min_value)
+    included = kept.any(axis=0)
+    last_kept = n_rows - 1 - kept[::-1].argmax(axis=0)
+    first_kept = kept.argmax(axis=0)
+    columns = np.arange(n_assets)
+    summary = {
+        "first_nominal": nominal[first_kept, columns],
+        "last_nominal": nominal[last_kept, columns],
+        "last_invested": invested[last_kept, columns],
+    }
+
+    #  5. AUSRICHTUNG AUF DEN PORTFOLIO-ZEITRAUM
+    window = slice(int(np.searchsorted(grid_days, start_day)), int(np.searchsorted(grid_days, end_day, side="right")))
+    window_days = grid_days[window]
+    kept_window = kept[window]
+    window_rows = np.arange(kept_window.shape[0])[:, None]
+
+    # Quellzeile je Tag für alle drei Spalten gemeinsam: letzter behaltener Tag (ffill),
+    # davor bis zu BFILL_LIMIT_DAYS Kalendertage der erste behaltene Tag (bfill), sonst keine (-> 0)
+    source_rows = np.where(kept_window, window_rows, -1)
+    np.maximum.accumulate(source_rows, axis=0, out=source_rows)
+    first_in_window = np.where(kept_window.any(axis=0), kept_window.argmax(axis=0), -1)
+    first_kept_day = window_days[np.maximum(first_in_window, 0)] if len(window_days) else first_in_window
+    backfill = (source_rows < 0) & (window_days[:, None] >= first_kept_day - BFILL_LIMIT_DAYS) & (first_in_window >= 0)
+    source_rows = np.where(backfill, first_in_window, source_rows)
+    has_source = source_rows >= 0
+    np.maximum(source_rows, 0, out=source_rows)
+
+    # Ausgabe: jeder Kalendertag des Zeitraums ODER nur die Handelstage
+    if trading_days:
+        output_rows = np.flatnonzero(is_trade_day[window_days - first_trade_day])
+        source_rows, has_source = source_rows[output_rows], has_source[output_rows]
+        index = pd.DatetimeIndex(sim_kernel.from_days(window_days[output_rows]))
+    else:
+        index = pd.date_range(start=start_date, end=end_date, freq="D")
+
+    values = {}
+    for column, matrix in zip(COLUMNS, (invested, nominal, real)):
+        aligned = np.take_along_axis(matrix[window], source_rows, axis=0)
+        values[column] = np.where(has_source, aligned, 0.0)
+    return PortfolioMatrix(index, list(names), values, included, summary)
+
+
+#  PARALLELE AUSFÜHRUNG (große Portfolios)
+# Jede Position hängt im Tagesraster nur von den eigenen Kursen ab; Positions-Blöcke können daher
+# unabhängig (im Prozess-Pool) simuliert werden und liefern dieselben Werte wie ein Durchgang.
+# Im Handelstage-Modus erhält jeder Block die Handelstage aller Positionen (gleiche Zeilen).
+
+def _simulate_block(arrays: dict, task: tuple) -> tuple[np.ndarray, dict]:
+    """Worker: simuliert die Positionen columns und schreibt ihre Werte nach arrays["values"]."""
+    columns, per_position, common = task
+    days, closes, bounds = arrays["days"], arrays["closes"], arrays["bounds"]
+    price_data = [
+        pd.DataFrame(
+            {"Close": closes[bounds[j]:bounds[j + 1]]},
+            index=pd.DatetimeIndex(sim_kernel.from_days(days[bounds[j]:bounds[j + 1]])),
+        )
+        for j in range(columns.start, columns.stop)
+    ]
+    matrix = simulate_positions(price_data=price_data, **per_position, **common)
+    for k, column in enumerate(COLUMNS):
+        arrays["values"][k][:, columns] = matrix.values[column]
+    return matrix.included, matrix.summary
+
+
+def simulate_positions_parallel(
+    price_data: list[pd.DataFrame],
+    names: list[str],
+    lump_sums: list[float],
+    periodic_investments: list[float],
+    intervals: list[str],
+    start_date: date,
+    end_date: date,
+    inflation_series: pd.Series,
+    ausgabeaufschlag_pct: float,
+    managementgebuehr_pa_pct: float,
+    min_value: float = 1.0,
+    trading_days: bool = False,
+    trade_days: np.ndarray | None = None,
+) -> PortfolioMatrix:
+    """
+    Wie simulate_positions, bei großen Portfolios blockweise im Prozess-Pool.
+    Kurse werden als ein zusammenhängendes Array über Shared Memory an die Worker gegeben;
+    kleine Portfolios laufen unverändert im eigenen Prozess.
+    """
+    n_assets = len(price_data)
+    if trading_days:
+        # Zeilen aller Blöcke: Handelstage aller Positionen (und trade_days) im Portfolio-Zeitraum
+        trade_days = union_days(
+            [sim_kernel.to_days(data.index) for data in price_data]
+            + ([np.asarray(trade_days, dtype="int64")] if trade_days is not None else [])
+        )
+    common = {
+        "start_date": start_date,
+        "end_date": end_date,
+        "inflation_series": inflation_series,
+        "ausgabeaufschlag_pct": ausgabeaufschlag_pct,
+        "managementgebuehr_pa_pct": managementgebuehr_pa_pct,
+        "min_value": min_value,
+        "trading_days": trading_days,
+        "trade_days": trade_days,
+    }
+    if trading_days:
+        start_day, end_day = sim_kernel.to_days([np.datetime64(start_date), np.datetime64(end_date)])
+        row_days = trade_days[(trade_days >= start_day) & (trade_days <= end_day)]
+        n_rows = len(row_days)
+    else:
+        n_rows = (end_date - start_date).days + 1
+    blocks = executor.split_range(n_assets, executor.POOL_WORKERS)
+    if not executor.use_pool(n_rows * n_assets * len(COLUMNS), len(blocks)):
+        return simulate_positions(
+            price_data=price_data,
+            names=names,
+            lump_sums=lump_sums,
+            periodic_investments=periodic_investments,
+            intervals=intervals,
+            **common,
+        )
+
+    lengths = [len(data) for data in price_data]
+    arrays = {
+        "days": np.concatenate([sim_kernel.to_days(data.index) for data in price_data]),
+        "closes": np.concatenate([data["Close"].to_numpy(dtype="float64") for data in price_data]),
+        "bounds": np.concatenate(([0], np.cumsum(lengths))),
+        "values": np.empty((len(COLUMNS), n_rows, n_assets)),
+    }
+    tasks = [
+        (
+            columns,
+            {
+                "names": list(names[columns]),
+                "lump_sums": list(lump_sums[columns]),
+                "periodic_investments": list(periodic_investments[columns]),
+                "intervals": list(intervals[columns]),
+            },
+            common,
+        )
+        for columns in blocks
+    ]
+    results = executor.map_shared(_simulate_block, arrays, tasks, parallel=True, outputs=("values",))
+
+    included = np.concatenate([block_included for block_included, _ in results])
+    summary = {key: np.concatenate([block_summary[key] for _, block_summary in results]) for key in results[0][1]}
+    values = {column: arrays["values"][k] for k, column in enumerate(COLUMNS)}
+    if trading_days:
+        index = pd.DatetimeIndex(sim_kernel.from_days(row_days))
+    else:
+        index = pd.date_range(start=start_date, end=end_date, freq="D")
+    return PortfolioMatrix(index, list(names), values, included, summary)
@@ -2,22 +2,36 @@ import pandas as pd
 import streamlit as st
 from datetime import date
 import numpy as np
+import hashlib
+import threading
+from collections import OrderedDict
 
 from . import backend_simulation
 from . import inflation
+from . import portfolio_engine
+from . import sim_kernel
+from . import rebalancing as rebalancing_engine
 
 def _calculate_annualized_return(sim_df: pd.DataFrame, num_years: float) -> float:
     """Berechnet die annualisierte Rendite (vereinfacht als ROI p.a.)"""
-    if sim_df.empty or num_years == 0:
+    if sim_df.empty:
         return 0.0
-        
-    end_value = sim_df['Portfolio (nominal)'].iloc[-1]
-    total_investment = sim_df['Einzahlungen (brutto)'].iloc[-1]
-    
+    return _annualized_return(
+        sim_df['Portfolio (nominal)'].iloc[-1],
+        sim_df['Einzahlungen (brutto)'].iloc[-1],
+        sim_df['Portfolio (nominal)'].iloc[0],
+        num_years,
+    )
+
+
+def _annualized_return(end_value: float, total_investment: float, first_day_investment: float, num_years: float) -> float:
+    """Annualisierte Rendite aus End-, Einzahlungs- und Startwert einer Simulation."""
+    if num_years == 0:
+        return 0.0
+
     if total_investment == 0:
         #Nur Einmalerlag am Starttag, der nicht in 'Einzahlungen (brutto)' auftaucht
         if end_value > 0:
-            first_day_investment = sim_df['Portfolio (nominal)'].iloc[0]
             if first_day_investment > 0:
                 return ((end_value / first_day_investment) ** (1 / num_years)) - 1
         return 0.0
@@ -31,6 +45,121 @@ def _calculate_annualized_return(sim_df: pd.DataFrame, num_years: float) -> floa
         return 0.0 
 
 
+#  POSITIONS-CACHE
+# Ergebnis jeder Position (auf den Portfolio-Zeitraum ausgerichtete Tageswerte + Kennzahlen), gemerkt unter
+# (ISIN, Beträge, Intervall, Zeitraum, Kosten, Datenversion). Bei Änderungen am Portfolio werden nur
+# Positionen mit geänderten Eingaben neu simuliert (gemeinsam in einem Durchgang der Matrix-Engine).
+POSITION_CACHE_SIZE = 256
+
+_POSITION_CACHE = OrderedDict()
+_POSITION_CACHE_LOCK = threading.Lock()
+
+
+def _position_key(
+    asset: dict, start_date: date, end_date: date, ausgabeaufschlag_pct: float, managementgebuehr_pa_pct: float, grid: tuple = (),
+) -> tuple | None:
+    """
+    Cache-Schlüssel einer Position oder None, falls ihre Kursdaten noch nicht (vollständig) im Cache liegen.
+    grid kennzeichnet das Zeilenraster im Handelstage-Modus (leer: Kalendertage).
+    """
+    isin = asset["ISIN / Ticker"]
+    version = backend_simulation.data_version(isin, start_date, end_date)
+    if version is None:
+        return None
+    return (
+        isin,
+        float(asset.get("Einmalerlag (€)", 0)),
+        float(asset.get("Sparbetrag (€)", 0)),
+        asset.get("Spar-Intervall", "monatlich"),
+        start_date,
+        end_date,
+        float(ausgabeaufschlag_pct),
+        float(managementgebuehr_pa_pct),
+        version,
+    ) + grid
+
+
+def _cached_position(key: tuple | None) -> dict | None:
+    if key is None:
+        return None
+    with _POSITION_CACHE_LOCK:
+        entry = _POSITION_CACHE.get(key)
+        if entry is not None:
+            _POSITION_CACHE.move_to_end(key)
+        return entry
+
+
+def _store_position(key: tuple | None, entry: dict) -> None:
+    if key is None:
+        return
+    with _POSITION_CACHE_LOCK:
+        _POSITION_CACHE[key] = entry
+        _POSITION_CACHE.move_to_end(key)
+        while len(_POSITION_CACHE) > POSITION_CACHE_SIZE:
+            _POSITION_CACHE.popitem(last=False)
+
+
+def clear_position_cache() -> None:
+    """Leert den Positions-Cache (z.B. nach einem Provider-Wechsel oder für Benchmarks)."""
+    with _POSITION_CACHE_LOCK:
+        _POSITION_CACHE.clear()
+
+
+def _grid_key(trade_days: np.ndarray | None) -> tuple:
+    """Teil des Positions-Schlüssels für das Zeilenraster: leer für Kalendertage, sonst Prüfsumme der Handelstage."""
+    if trade_days is None:
+        return ()
+    return ("handelstage", hashlib.sha1(trade_days.tobytes()).hexdigest())
+
+
+def _simulate_missing_positions(
+    assets: list[dict],
+    start_date: date,
+    end_date: date,
+    inflation_series: pd.Series,
+    ausgabeaufschlag_pct: float,
+    managementgebuehr_pa_pct: float,
+    trade_days: np.ndarray | None = None,
+    price_data: dict[str, pd.DataFrame | None] | None = None,
+) -> list[dict | None]:
+    """
+    Simuliert die Positionen gemeinsam in der Matrix-Engine (große Portfolios im Prozess-Pool) und
+    zerlegt das Ergebnis in einen Eintrag je Position. None für Positionen ohne Kursdaten.
+    trade_days: Handelstage des ganzen Portfolios -> Zeilen nur an diesen Tagen statt an jedem Kalendertag.
+    price_data: bereits geladene Kursdaten (ISIN -> DataFrame), sonst werden sie hier geladen.
+    """
+    if price_data is None:
+        price_data = backend_simulation.load_many(
+            isins=[asset["ISIN / Ticker"] for asset in assets],
+            start_date=start_date,
+            end_date=end_date,
+        )
+    available = [asset for asset in assets if price_data.get(asset["ISIN / Ticker"]) is not None]
+    entries = {}
+    if available:
+        matrix = portfolio_engine.simulate_positions_parallel(
+            price_data=[price_data[asset["ISIN / Ticker"]] for asset in available],
+            names=[asset["ISIN / Ticker"] for asset in available],
+            lump_sums=[asset.get("Einmalerlag (€)", 0) for asset in available],
+            periodic_investments=[asset.get("Sparbetrag (€)", 0) for asset in available],
+            intervals=[asset.get("Spar-Intervall", "monatlich") for asset in available],
+            start_date=start_date,
+            end_date=end_date,
+            inflation_series=inflation_series,
+            ausgabeaufschlag_pct=ausgabeaufschlag_pct,
+            managementgebuehr_pa_pct=managementgebuehr_pa_pct,
+            trading_days=trade_days is not None,
+            trade_days=trade_days,
+        )
+        for j, asset in enumerate(available):
+            entries[id(asset)] = {
+                "values": {column: np.ascontiguousarray(matrix.values[column][:, j]) for column in portfolio_engine.COLUMNS},
+                "included": bool(matrix.included[j]),
+                "summary": {key: float(values[j]) for key, values in matrix.summary.items()},
+            }
+    return [entries.get(id(asset)) for asset in assets]
+
+
 @st.cache_data
 def run_portfolio_simulation(
     assets: list[dict],
@@ -39,9 +168,15 @@ def run_portfolio_simulation(
     ausgabeaufschlag_pct: float,
     managementgebuehr_pa_pct: float,
     depotgebuehr_pa_eur: float,
+    trading_days: bool = False,
 ) -> tuple[pd.DataFrame | None, dict, dict]:
-    
-    individual_simulations = []
+    """
+    Historische Simulation aller Positionen.
+    Positionen kommen aus dem Positions-Cache; nur geänderte/neue werden (gemeinsam) neu simuliert.
+    trading_days=True: Ergebnis nur an den Handelstagen der Positionen statt an jedem Kalendertag
+    (gleiche Werte an diesen Tagen, deutlich weniger Zeilen für Diagramme).
+    """
+
     historical_returns_pa = {}
     individual_final_values = {}
     
@@ -50,87 +185,198 @@ def run_portfolio_simulation(
     full_date_range = pd.date_range(start=start_date, end=end_date, freq="D")
     historical_inflation_series = inflation.calculate_inflation_series(full_date_range)
 
-    for asset in assets:
-        isin = asset.get("ISIN / Ticker")
-        name = asset.get("Name") or isin
-        lump_sum = asset.get("Einmalerlag (€)", 0)
-        periodic = asset.get("Sparbetrag (€)", 0)
-        interval = asset.get("Spar-Intervall", "monatlich")
+    positions = [
+        asset for asset in assets
+        if asset.get("ISIN / Ticker") and not (asset.get("Einmalerlag (€)", 0) == 0 and asset.get("Sparbetrag (€)", 0) == 0)
+    ]
 
-        if not isin or (lump_sum == 0 and periodic == 0):
-            continue
+    # Handelstage-Modus: alle Positionen rechnen auf den Handelstagen des ganzen Portfolios
+    # (ein anderes Raster, z.B. durch eine neue Börse im Portfolio, ergibt andere Schlüssel)
+    price_data = trade_days = None
+    if trading_days:
+        price_data = backend_simulation.load_many(
+            isins=[asset["ISIN / Ticker"] for asset in positions],
+            start_date=start_date,
+            end_date=end_date,
+        )
+        trade_days = portfolio_engine.union_days([sim_kernel.to_days(data.index) for data in price_data.values() if data is not None])
+    grid = _grid_key(trade_days)
 
-        historical_data = backend_simulation.load_data(
-            isin=isin, start_date=start_date, end_date=end_date
+    # Positionen aus dem Cache; fehlende gebündelt laden und in einem Durchgang simulieren
+    keys = [_position_key(asset, start_date, end_date, ausgabeaufschlag_pct, managementgebuehr_pa_pct, grid) for asset in positions]
+    entries = [_cached_position(key) for key in keys]
+    missing = [j for j, entry in enumerate(entries) if entry is None]
+    if missing:
+        simulated = _simulate_missing_positions(
+            [positions[j] for j in missing], start_date, end_date, historical_inflation_series,
+            ausgabeaufschlag_pct, managementgebuehr_pa_pct, trade_days, price_data,
         )
+        for j, entry in zip(missing, simulated):
+            if entry is None:
+                st.error(f"Daten für {positions[j]['ISIN / Ticker']} konnten nicht geladen werden.")
+                continue
+            entries[j] = entry
+            # Schlüssel erst jetzt bestimmen, falls die Kursdaten gerade geladen wurden
+            _store_position(
+                keys[j] or _position_key(positions[j], start_date, end_date, ausgabeaufschlag_pct, managementgebuehr_pa_pct, grid),
+                entry,
+            )
 
-        if historical_data is None:
-            st.error(f"Daten für {isin} konnten nicht geladen werden.")
+    included = []
+    for asset, entry in zip(positions, entries):
+        if entry is None or not entry["included"]:
             continue
+        name = asset.get("Name") or asset["ISIN / Ticker"]
 
-        sim_df = backend_simulation.run_simulation(
-            data=historical_data,
-            periodic_investment=periodic,
-            lump_sum=lump_sum,
-            interval=interval,
-            inflation_input=historical_inflation_series,
-            ausgabeaufschlag_pct=ausgabeaufschlag_pct,
-            managementgebuehr_pa_pct=managementgebuehr_pa_pct,
-        )
-        
-        if sim_df.empty:
-            continue
-            
-        individual_simulations.append(sim_df)
-        
         # Berechne p.a. Rendite
-        return_pa_pct = _calculate_annualized_return(sim_df, num_years) * 100
+        return_pa_pct = _annualized_return(
+            entry["summary"]["last_nominal"],
+            entry["summary"]["last_invested"],
+            entry["summary"]["first_nominal"],
+            num_years,
+        ) * 100
         historical_returns_pa[name] = return_pa_pct
-        individual_final_values[name] = sim_df['Portfolio (nominal)'].iloc[-1]
-
+        individual_final_values[name] = entry["summary"]["last_nominal"]
+        included.append(entry)
 
-    if not individual_simulations:
+    if not included:
         return None, {}, {}
 
-    # Verhindert, dass Assets am Ende "aussteigen" und die Summe droppt.
-    aligned_simulations = []
-    full_index = pd.date_range(start=start_date, end=end_date, freq="D")
-    
-    for df in individual_simulations:
-        df_aligned = df.reindex(full_index).ffill().bfill(limit=10).fillna(0.0)
-        aligned_simulations.append(df_aligned)
-
-    if not aligned_simulations:
-         return None, {}, {}
-
-    # Summiere die angeglichenen DataFrames
-    portfolio_df = pd.concat(aligned_simulations)
-    final_portfolio = portfolio_df.groupby(portfolio_df.index).sum()
+    # Summe der (auf den Zeitraum ausgerichteten) Positionen in vorab angelegten Arrays;
+    # Assets, die am Ende "aussteigen", behalten ihren letzten Wert, damit die Summe nicht droppt.
+    # Der Realwert wird erst nach der Depotgebühr auf Portfolio-Ebene berechnet.
+    days = sim_kernel.to_days(full_date_range)
+    index = full_date_range
+    if trading_days:
+        # Zeilen der Positionen: Handelstage des Portfolios im Zeitraum (Werte identisch zum Tagesraster)
+        days = trade_days[(trade_days >= days[0]) & (trade_days <= days[-1])]
+        index = pd.DatetimeIndex(sim_kernel.from_days(days))
+    invested = portfolio_engine.accumulate_columns((entry["values"]["Einzahlungen (brutto)"] for entry in included), np.empty(len(days)))
+    nominal = portfolio_engine.accumulate_columns((entry["values"]["Portfolio (nominal)"] for entry in included), np.empty(len(days)))
 
     # Depotgebühren Logik
     if depotgebuehr_pa_eur > 0:
-        final_portfolio["Depotgebuehr_Pkt"] = 0.0
-        yearly_fee_dates = final_portfolio.resample("YS").first().index
-        fee_dates_in_index = yearly_fee_dates.intersection(final_portfolio.index)
-
-        if len(fee_dates_in_index) > 1:
-            fee_dates_to_apply = fee_dates_in_index[1:]
-            final_portfolio.loc[fee_dates_to_apply, "Depotgebuehr_Pkt"] = depotgebuehr_pa_eur
-
-        final_portfolio["Kumulierte_Depotgebuehr"] = final_portfolio["Depotgebuehr_Pkt"].cumsum()
-        final_portfolio["Portfolio (nominal)"] = (
-            final_portfolio["Portfolio (nominal)"] - final_portfolio["Kumulierte_Depotgebuehr"]
-        ).clip(lower=0)
-        final_portfolio = final_portfolio.drop(columns=["Depotgebuehr_Pkt", "Kumulierte_Depotgebuehr"])
+        portfolio_engine.apply_depot_fee(days, nominal, depotgebuehr_pa_eur, sim_kernel.to_days(full_date_range[:1])[0])
 
     # Realwert Berechnung (Konsistent mit Inflation auf Gesamtportfolio)
-    final_inflation_series = historical_inflation_series.reindex(final_portfolio.index, method='ffill').fillna(1.0)
-    
-    final_portfolio["Portfolio (real)"] = final_portfolio["Portfolio (nominal)"] / final_inflation_series
+    final_inflation = sim_kernel.inflation_curve(
+        days,
+        (sim_kernel.to_days(historical_inflation_series.index), historical_inflation_series.to_numpy(dtype="float64")),
+    )
+
+    final_portfolio = pd.DataFrame(
+        {
+            "Einzahlungen (brutto)": invested,
+            "Portfolio (nominal)": nominal,
+            "Portfolio (real)": nominal / final_inflation,
+        },
+        index=index,
+    )
 
     return final_portfolio, historical_returns_pa, individual_final_values
 
 
+#  REBALANCING (Zielgewichte statt unabhängiger Positionen)
+
+def target_weights(assets: list[dict]) -> np.ndarray:
+    """
+    Zielgewichte (Summe 1) aus 'Gewichtung (%)'; ohne Gewichtungen ersatzweise aus den Beträgen
+    (Einmalerlag + Sparbetrag) der Positionen.
+    """
+    weights = np.array([float(asset.get("Gewichtung (%)", 0.0) or 0.0) for asset in assets])
+    if weights.sum() <= 0:
+        weights = np.array([float(asset.get("Einmalerlag (€)", 0)) + float(asset.get("Sparbetrag (€)", 0)) for asset in assets])
+    return weights / weights.sum() if weights.sum() > 0 else weights
+
+
+@st.cache_data
+def run_rebalanced_portfolio_simulation(
+    assets: list[dict],
+    start_date: date,
+    end_date: date,
+    ausgabeaufschlag_pct: float,
+    managementgebuehr_pa_pct: float,
+    depotgebuehr_pa_eur: float,
+    rebalancing: str = "jährlich",
+    threshold_pct: float = rebalancing_engine.DEFAULT_THRESHOLD_PCT,
+) -> tuple[pd.DataFrame | None, dict, dict, pd.DataFrame]:
+    """
+    Historische Simulation mit Rebalancing auf die Zielgewichte ('Gewichtung (%)').
+    rebalancing: "monatlich", "vierteljährlich", "jährlich" oder "schwelle" (Abweichung > threshold_pct Prozentpunkte).
+    Rückgabe wie run_portfolio_simulation plus die Umschichtungen je Termin; die Historie beginnt am
+    ersten Tag, an dem alle Positionen Kurse haben. Die p.a. Rendite je Position ist die
+    (gebührenbereinigte) Kursrendite, da Einzahlungen durch das Rebalancing nicht mehr einer Position gehören.
+    """
+    empty_turnover = pd.DataFrame(columns=rebalancing_engine.TURNOVER_COLUMNS)
+    positions = [
+        asset for asset in assets
+        if asset.get("ISIN / Ticker") and not (asset.get("Einmalerlag (€)", 0) == 0 and asset.get("Sparbetrag (€)", 0) == 0)
+    ]
+    price_data = backend_simulation.load_many(
+        isins=[asset["ISIN / Ticker"] for asset in positions],
+        start_date=start_date,
+        end_date=end_date,
+    )
+    available = []
+    for asset in positions:
+        if price_data.get(asset["ISIN / Ticker"]) is None:
+            st.error(f"Daten für {asset['ISIN / Ticker']} konnten nicht geladen werden.")
+            continue
+        available.append(asset)
+    if not available:
+        return None, {}, {}, empty_turnover
+
+    days, close = rebalancing_engine.price_matrix(
+        [price_data[asset["ISIN / Ticker"]] for asset in available], start_date, end_date
+    )
+    if len(days) == 0:
+        return None, {}, {}, empty_turnover
+
+    result = rebalancing_engine.simulate_rebalanced(
+        days,
+        close,
+        weights=target_weights(available),
+        lump_sums=np.array([float(asset.get("Einmalerlag (€)", 0)) for asset in available]),
+        periodic_investments=np.array([float(asset.get("Sparbetrag (€)", 0)) for asset in available]),
+        intervals=[asset.get("Spar-Intervall", "monatlich") for asset in available],
+        rebalancing=rebalancing,
+        ausgabeaufschlag_pct=ausgabeaufschlag_pct,
+        managementgebuehr_pa_pct=managementgebuehr_pa_pct,
+        threshold_pct=threshold_pct,
+    )
+
+    # Kennzahlen je Position
+    num_years = (days[-1] - days[0]) / 365.25
+    adjusted = close[[0, -1]] * sim_kernel.fee_curve(len(days), managementgebuehr_pa_pct)[[0, -1], None]
+    historical_returns_pa = {}
+    individual_final_values = {}
+    for j, asset in enumerate(available):
+        name = asset.get("Name") or asset["ISIN / Ticker"]
+        historical_returns_pa[name] = float(_annualized_return(adjusted[1, j], 0.0, adjusted[0, j], num_years) * 100)
+        individual_final_values[name] = float(result["values"][-1, j])
+
+    # Depotgebühr und Realwert auf Portfolio-Ebene wie in run_portfolio_simulation
+    nominal = result["values"].sum(axis=1)
+    if depotgebuehr_pa_eur > 0:
+        portfolio_engine.apply_depot_fee(days, nominal, depotgebuehr_pa_eur)
+
+    historical_inflation_series = inflation.calculate_inflation_series(pd.date_range(start=start_date, end=end_date, freq="D"))
+    final_inflation = sim_kernel.inflation_curve(
+        days,
+        (sim_kernel.to_days(historical_inflation_series.index), historical_inflation_series.to_numpy(dtype="float64")),
+    )
+
+    final_portfolio = pd.DataFrame(
+        {
+            "Einzahlungen (brutto)": result["invested"],
+            "Portfolio (nominal)": nominal,
+            "Portfolio (real)": nominal / final_inflation,
+        },
+        index=pd.DatetimeIndex(sim_kernel.from_days(days)),
+    )
+    return final_portfolio, historical_returns_pa, individual_final_values, rebalancing_engine.turnover_frame(days, result)
+
+
 def calculate_max_drawdown(df: pd.DataFrame, column: str = "Portfolio (nominal)"):
     """
     Berechnet den Maximum Drawdown (größter Verlust vom Hoch) und dessen Zeitraum.
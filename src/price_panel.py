@@ -0,0 +1,199 @@
+import os
+import json
+import time
+import threading
+import numpy as np
+import pandas as pd
+from datetime import date
+
+from .price_store import get_store
+
+#  PANEL KONFIGURATION
+# Vorab gebautes, ausgerichtetes Kurs-Panel (Handelstage x Ticker) als Memory-Mapped-Dateien.
+# Alle Sessions und Worker-Prozesse lesen dieselben Seiten aus dem Page-Cache (keine Kopien).
+# Das Panel liegt als Unterordner im Verzeichnis des Kurs-Caches.
+PANEL_SUBDIR = "panel"
+PANEL_META_FILENAME = "panel.json"
+
+
+class PricePanel:
+    """
+    Read-only Sicht auf ein gebautes Panel (Slices sind Kopien):
+    dates  (Tage,)          int64 (ns), Vereinigung aller Handelstage
+    closes (Tage, Ticker)   float64, je Ticker vorwärts gefüllt, spaltenweise zusammenhängend
+    traded (Tage, Ticker)   bool, True an echten Handelstagen des Tickers
+    """
+
+    def __init__(self, panel_dir: str, meta: dict):
+        version = meta["version"]
+        self.meta = meta
+        self.dates = np.load(os.path.join(panel_dir, f"dates_{version}.npy"), mmap_mode="r")
+        self.closes = np.load(os.path.join(panel_dir, f"closes_{version}.npy"), mmap_mode="r")
+        self.traded = np.load(os.path.join(panel_dir, f"traded_{version}.npy"), mmap_mode="r")
+        self.index = pd.DatetimeIndex(self.dates.view("datetime64[ns]"), name="Date")
+        self.columns = {isin: j for j, isin in enumerate(meta["tickers"])}
+
+    def covers(self, isin: str, start_date: date, end_date: date) -> bool:
+        coverage = self.meta["coverage"].get(isin)
+        if coverage is None:
+            return False
+        return date.fromisoformat(coverage[0]) <= start_date and date.fromisoformat(coverage[1]) >= end_date
+
+    def row_range(self, isin: str, start_date: date, end_date: date) -> tuple[int, int]:
+        """
+        Zeilenbereich [a, b) vom ersten bis zum letzten echten Handelstag des Tickers im Zeitraum.
+        """
+        j = self.columns[isin]
+        a = self.index.searchsorted(pd.Timestamp(start_date), side="left")
+        b = self.index.searchsorted(pd.Timestamp(end_date), side="right")
+        traded_rows = np.flatnonzero(self.traded[a:b, j])
+        if traded_rows.size == 0:
+            return a, a
+        return a + int(traded_rows[0]), a + int(traded_rows[-1]) + 1
+
+    def slice(self, isin: str, start_date: date, end_date: date) -> pd.DataFrame:
+        """
+        Kursreihe eines Tickers als DataFrame mit Spalte 'Close', nur an seinen echten Handelstagen
+        (dieselben Zeilen wie aus dem Kurs-Cache). Das Ergebnis ist eine beschreibbare Kopie,
+        keine Sicht auf die read-only gemappten Dateien.
+        """
+        j = self.columns[isin]
+        a, b = self.row_range(isin, start_date, end_date)
+        rows = a + np.flatnonzero(self.traded[a:b, j])
+        return pd.DataFrame({"Close": self.closes[rows, j]}, index=self.index[rows])
+
+
+# Geöffnete Panels je Verzeichnis: aufgelöster Pfad -> (mtime von panel.json, Panel)
+_panels = {}
+_panel_lock = threading.Lock()
+
+
+def _default_panel_dir() -> str:
+    return os.path.join(get_store().cache_dir, PANEL_SUBDIR)
+
+
+def open_panel(panel_dir: str | None = None) -> PricePanel | None:
+    """
+    Öffnet das Panel eines Verzeichnisses (einmal pro Prozess; neu, sobald dort ein neueres Panel gebaut wurde).
+    Gibt None zurück, falls noch kein Panel existiert.
+    """
+    panel_dir = os.path.realpath(panel_dir or _default_panel_dir())
+    meta_path = os.path.join(panel_dir, PANEL_META_FILENAME)
+    try:
+        mtime = os.stat(meta_path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    cached = _panels.get(panel_dir)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    with _panel_lock:
+        cached = _panels.get(panel_dir)
+        if cached is None or cached[0] != mtime:
+            try:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+                cached = (mtime, PricePanel(panel_dir, meta))
+                _panels[panel_dir] = cached
+            except Exception as e:
+                print(f"Fehler beim Öffnen des Kurs-Panels: {e}")
+                return None
+    return cached[1]
+
+
+def panel_version(isin: str, start_date: date, end_date: date) -> int | None:
+    """
+    Version des Panels, falls es den Ticker für den Zeitraum abdeckt (dann liefert slice_panel die Daten), sonst None.
+    """
+    panel = open_panel()
+    if panel is None or not panel.covers(isin, start_date, end_date):
+        return None
+    return panel.meta["version"]
+
+
+def slice_panel(isin: str, start_date: date, end_date: date) -> pd.DataFrame | None:
+    """
+    Kursreihe aus dem Panel, falls es den Ticker für den Zeitraum abdeckt, sonst None.
+    """
+    panel = open_panel()
+    if panel is None or not panel.covers(isin, start_date, end_date):
+        return None
+    return panel.slice(isin, start_date, end_date)
+
+
+def build_panel(tickers: list[str], panel_dir: str | None = None) -> int:
+    """
+    Baut das Panel aus dem Kurs-Cache für die angegebenen Ticker (z.B. den gesamten KATALOG).
+    Die Dateien tragen eine Versionsnummer; panel.json wird zuletzt atomar ersetzt,
+    sodass laufende Leser nie ein halb geschriebenes Panel sehen.
+    Gibt die Anzahl der aufgenommenen Ticker zurück.
+    """
+    store = get_store()
+    panel_dir = panel_dir or _default_panel_dir()
+    series = {}
+    for isin in dict.fromkeys(tickers):
+        cached = store.read(isin)
+        if cached is not None and not cached[0].empty:
+            series[isin] = cached
+
+    if not series:
+        print("Kurs-Panel: keine gecachten Daten gefunden.")
+        return 0
+
+    os.makedirs(panel_dir, exist_ok=True)
+    version = str(time.time_ns())
+    isins = list(series)
+
+    #  1. Gemeinsame Datumsachse (Vereinigung aller Handelstage)
+    ticker_dates = {
+        isin: close_data.index.values.astype("datetime64[ns]").view("int64")
+        for isin, (close_data, _, _) in series.items()
+    }
+    dates = np.unique(np.concatenate(list(ticker_dates.values())))
+    np.save(os.path.join(panel_dir, f"dates_{version}.npy"), dates)
+
+    #  2. Kurse spaltenweise (Fortran-Order) schreiben, damit jede Ticker-Spalte zusammenhängend ist
+    closes = np.lib.format.open_memmap(
+        os.path.join(panel_dir, f"closes_{version}.npy"), mode="w+",
+        dtype="float64", shape=(len(dates), len(isins)), fortran_order=True,
+    )
+    traded = np.lib.format.open_memmap(
+        os.path.join(panel_dir, f"traded_{version}.npy"), mode="w+",
+        dtype="bool", shape=(len(dates), len(isins)), fortran_order=True,
+    )
+    rows = np.arange(len(dates))
+    coverage = {}
+    for j, isin in enumerate(isins):
+        close_data, start, end = series[isin]
+        positions = np.searchsorted(dates, ticker_dates[isin])
+        column = np.full(len(dates), np.nan)
+        column[positions] = close_data["Close"].to_numpy(dtype="float64")
+
+        # Vorwärts füllen: Index des letzten gültigen Werts je Zeile
+        last_valid = np.where(np.isnan(column), -1, rows)
+        np.maximum.accumulate(last_valid, out=last_valid)
+        closes[:, j] = np.where(last_valid >= 0, column[np.maximum(last_valid, 0)], np.nan)
+        traded[:, j] = False
+        traded[positions, j] = True
+        coverage[isin] = [start.isoformat(), end.isoformat()]
+    closes.flush()
+    traded.flush()
+    del closes, traded
+
+    #  3. Metadaten atomar ersetzen, danach alte Versionen entfernen
+    meta = {"version": version, "tickers": isins, "coverage": coverage}
+    meta_path = os.path.join(panel_dir, PANEL_META_FILENAME)
+    with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(meta_path + ".tmp", meta_path)
+
+    for filename in os.listdir(panel_dir):
+        if filename.endswith(".npy") and not filename.endswith(f"_{version}.npy"):
+            # Bereits gemappte alte Dateien bleiben für laufende Leser gültig (POSIX)
+            try:
+                os.remove(os.path.join(panel_dir, filename))
+            except OSError:
+                pass
+
+    print(f"Kurs-Panel gebaut: {len(dates)} Tage x {len(isins)} Ticker.")
+    return len(isins)
@@ -0,0 +1,552 @@
+import os
+import json
+import time
+import tempfile
+import threading
+import numpy as np
+import pandas as pd
+from contextlib import contextmanager
+from datetime import date
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+#  SPEICHER KONFIGURATION
+CACHE_DIR = os.path.join(os.path.dirname(__file__), "data", "cache")
+os.makedirs(CACHE_DIR, exist_ok=True)
+
+# Verfügbare Backends: "npz" (nur NumPy) oder "parquet" (benötigt pyarrow)
+PRICE_STORE_BACKEND = "npz"
+
+# Index aller gecachten Ticker und ihrer Zeiträume (erspart das Scannen des Verzeichnisses)
+MANIFEST_FILENAME = "manifest.json"
+
+# Temporäre Dateien, die älter sind, stammen von abgebrochenen Schreibvorgängen
+STALE_TMP_SECONDS = 600
+
+
+def merge_close_data(existing: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    """
+    Führt zwei Kursreihen zusammen. Bei doppelten Tagen gewinnt die neue Reihe.
+    """
+    if existing is None or existing.empty:
+        return new
+    if new is None or new.empty:
+        return existing
+    merged = pd.concat([existing, new])
+    merged = merged[~merged.index.duplicated(keep="last")]
+    return merged.sort_index()
+
+
+@contextmanager
+def _file_lock(path: str):
+    """Exklusive Sperre über eine Sperrdatei (prozessübergreifend)."""
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class CacheManifest:
+    """
+    Manifest des Kurs-Caches: ISIN/Ticker -> abgedeckter Zeitraum (+ Schreibversion, letzter Zugriff).
+    Wird einmal pro Prozess geladen, sodass eine Cache-Abfrage ein reiner Dict-Zugriff ist.
+    Jede Änderung wird unter einer Dateisperre mit dem aktuellen Stand auf der Platte zusammengeführt
+    (andere Sessions, Preloader, Kompaktierung) und atomar geschrieben.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._entries = None
+        self._lock = threading.RLock()
+
+    def is_loaded(self) -> bool:
+        return self._entries is not None
+
+    def _read_entries(self) -> dict | None:
+        """Einträge auf der Platte; None, falls das Manifest fehlt oder defekt ist."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)["entries"]
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError) as e:
+            print(f"Manifest defekt, wird neu aufgebaut: {e}")
+            return None
+
+    def load(self, build_entries) -> None:
+        """
+        Lädt das Manifest von der Platte. Fehlt es (oder ist es defekt),
+        wird es einmalig über build_entries() aus dem Cache-Verzeichnis aufgebaut.
+        """
+        with self._lock:
+            if self._entries is not None:
+                return
+            entries = self._read_entries()
+            if entries is not None:
+                self._entries = entries
+                return
+            built = build_entries()
+            # Inzwischen von einem anderen Prozess geschriebene Einträge haben Vorrang
+            self._update({isin: (lambda disk, entry=entry: disk or entry) for isin, entry in built.items()})
+
+    def get(self, isin: str) -> dict | None:
+        return self._entries.get(isin)
+
+    def coverage(self, isin: str) -> tuple[date, date] | None:
+        entry = self._entries.get(isin)
+        if entry is None:
+            return None
+        return date.fromisoformat(entry["start"]), date.fromisoformat(entry["end"])
+
+    def items(self) -> list[tuple[str, dict]]:
+        with self._lock:
+            return list(self._entries.items())
+
+    def set(self, isin: str, start: date, end: date) -> None:
+        local_version = (self._entries or {}).get(isin, {}).get("version", 0)
+
+        def updated(disk: dict | None) -> dict:
+            return {
+                "start": start.isoformat(),
+                "end": end.isoformat(),
+                "version": max(local_version, (disk or {}).get("version", 0)) + 1,
+                "last_access": date.today().isoformat(),
+            }
+        self._update({isin: updated})
+
+    def touch(self, isin: str) -> None:
+        """
+        Merkt den letzten Zugriff (für LRU-Verdrängung). Tagesgenau,
+        damit das Manifest höchstens einmal pro Ticker und Tag geschrieben wird.
+        """
+        today = date.today().isoformat()
+        entry = self._entries.get(isin)
+        if entry is None or entry.get("last_access") == today:
+            return
+        # Auf der Platte entfernte Einträge bleiben entfernt
+        self._update({isin: lambda disk: dict(disk, last_access=today) if disk is not None else None})
+
+    def remove(self, isin: str) -> None:
+        if isin in self._entries:
+            self._update({isin: lambda disk: None})
+
+    def _update(self, changes: dict) -> None:
+        """
+        Wendet changes (ISIN -> Funktion(Eintrag auf der Platte oder None) -> neuer Eintrag oder None)
+        unter der Dateisperre auf den aktuellen Stand der Platte an und schreibt das Manifest atomar
+        über eine eigene temporäre Datei. Danach entspricht der Speicherstand dem geschriebenen Stand.
+        """
+        with self._lock, _file_lock(self.path + ".lock"):
+            entries = self._read_entries()
+            if entries is None:
+                entries = dict(self._entries or {})
+            for isin, change in changes.items():
+                entry = change(entries.get(isin))
+                if entry is None:
+                    entries.pop(isin, None)
+                else:
+                    entries[isin] = entry
+
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), prefix=os.path.basename(self.path) + ".", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump({"entries": entries}, f, indent=1, sort_keys=True)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            self._entries = entries
+
+
+class PriceStore:
+    """
+    Basisklasse für den binären Kurs-Cache: genau eine Datei pro Ticker/ISIN.
+    Neben den Kursen wird der abgedeckte Zeitraum (Start, Ende) gespeichert,
+    damit Lücken ohne Dateinamen-Parsing erkannt werden.
+    """
+    extension = ""
+
+    def __init__(self, cache_dir: str = CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.manifest = CacheManifest(os.path.join(self.cache_dir, MANIFEST_FILENAME))
+        self._migration_lock = threading.Lock()
+
+    def path(self, isin: str) -> str:
+        return os.path.join(self.cache_dir, f"{isin}{self.extension}".replace(" ", "_"))
+
+    def _manifest(self) -> CacheManifest:
+        if not self.manifest.is_loaded():
+            self.manifest.load(self._build_manifest_entries)
+        return self.manifest
+
+    def coverage(self, isin: str) -> tuple[date, date] | None:
+        """
+        Abgedeckter Zeitraum eines Tickers laut Manifest (ohne Dateizugriff).
+        """
+        return self._manifest().coverage(isin)
+
+    def exists(self, isin: str) -> bool:
+        return self._manifest().get(isin) is not None
+
+    def version(self, isin: str) -> int | None:
+        """
+        Schreibversion eines Tickers laut Manifest (steigt bei jedem write), None falls nicht gecacht.
+        Eignet sich als billiger Schlüssel für abgeleitete Caches.
+        """
+        entry = self._manifest().get(isin)
+        if entry is None:
+            return None
+        return entry.get("version", 0)
+
+    def delete(self, isin: str) -> None:
+        if os.path.exists(self.path(isin)):
+            os.remove(self.path(isin))
+        self._manifest().remove(isin)
+
+    def _build_manifest_entries(self) -> dict:
+        """
+        Einmaliger Verzeichnis-Scan, falls noch kein Manifest existiert:
+        Binärdateien werden mit ihrem gespeicherten Zeitraum erfasst,
+        alte CSV-Dateien werden für die spätere Migration vorgemerkt.
+        """
+        entries = {}
+        for isin, legacy_files in self.legacy_csv_files().items():
+            block = _longest_block(legacy_files)
+            entries[isin] = {
+                "start": block["start"].isoformat(),
+                "end": block["end"].isoformat(),
+                "version": 0,
+                "legacy": [filename for filename, _, _ in legacy_files],
+            }
+        for filename in os.listdir(self.cache_dir):
+            if not filename.endswith(self.extension):
+                continue
+            isin = filename[:-len(self.extension)]
+            try:
+                _, _, start, end = self._read_arrays(os.path.join(self.cache_dir, filename))
+            except Exception as e:
+                print(f"Fehler beim Lesen von {filename}: {e}")
+                continue
+            entries[isin] = {"start": start.isoformat(), "end": end.isoformat(), "version": 1}
+        print(f"Cache-Manifest aufgebaut ({len(entries)} Ticker).")
+        return entries
+
+    def _read_arrays(self, path: str) -> tuple[np.ndarray, np.ndarray, date, date]:
+        raise NotImplementedError
+
+    def _write_arrays(self, path: str, dates: np.ndarray, closes: np.ndarray, start: date, end: date) -> None:
+        raise NotImplementedError
+
+    def read(self, isin: str) -> tuple[pd.DataFrame, date, date] | None:
+        """
+        Liest die Kursreihe eines Tickers (ohne Text-Parsing).
+        Gibt (DataFrame mit 'Close', Start, Ende) oder None zurück.
+        Alte CSV-Dateien werden beim ersten Zugriff automatisch migriert.
+        """
+        entry = self._manifest().get(isin)
+        if entry is None:
+            return None
+        if entry.get("legacy") and not self.migrate_legacy_csv(isin):
+            return None
+
+        try:
+            dates, closes, start, end = self._read_arrays(self.path(isin))
+        except FileNotFoundError:
+            # Datei wurde extern gelöscht -> Manifest bereinigen
+            self.manifest.remove(isin)
+            return None
+        self.manifest.touch(isin)
+        index = pd.DatetimeIndex(dates.view("datetime64[ns]"), name="Date")
+        close_data = pd.DataFrame({"Close": closes}, index=index)
+        return close_data, start, end
+
+    def write(self, isin: str, close_data: pd.DataFrame, start: date, end: date) -> None:
+        """
+        Schreibt die Kursreihe eines Tickers atomar (temporäre Datei + Umbenennen).
+        Jeder Schreibvorgang nutzt eine eigene temporäre Datei, damit sich parallele Schreiber
+        desselben Tickers nicht gegenseitig überschreiben (der letzte gewinnt vollständig).
+        """
+        index = pd.DatetimeIndex(close_data.index)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        dates = index.values.astype("datetime64[ns]").view("int64")
+        closes = close_data["Close"].to_numpy(dtype="float64")
+
+        path = self.path(isin)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=os.path.basename(path) + ".", suffix=".tmp")
+        os.close(fd)
+        try:
+            self._write_arrays(tmp_path, dates, closes, start, end)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._manifest().set(isin, start, end)
+
+    #  MIGRATION DES ALTEN CSV-CACHES
+    def legacy_csv_files(self) -> dict[str, list[tuple[str, date, date]]]:
+        """
+        Findet alte Cache-Dateien im Format {isin}_{start}_{end}.csv, gruppiert nach Ticker.
+        """
+        legacy_files = {}
+        for filename in os.listdir(self.cache_dir):
+            if not filename.endswith(".csv"):
+                continue
+            parts = filename[:-len(".csv")].split("_")
+            # Der Ticker selbst darf keinen weiteren "_" enthalten
+            if len(parts) != 3:
+                continue
+            try:
+                start, end = date.fromisoformat(parts[1]), date.fromisoformat(parts[2])
+            except ValueError:
+                continue
+            legacy_files.setdefault(parts[0], []).append((filename, start, end))
+        return legacy_files
+
+    def migrate_legacy_csv(self, isin: str) -> bool:
+        """
+        Liest die im Manifest vorgemerkten CSV-Dateien eines Tickers, führt überlappende
+        Zeiträume zu einer Reihe zusammen, speichert sie im Binärformat und löscht die CSVs.
+        """
+        with self._migration_lock:
+            entry = self._manifest().get(isin)
+            if entry is None:
+                return False
+            if not entry.get("legacy"):
+                # Bereits von einem anderen Thread migriert
+                return True
+            return self._migrate_legacy_files(isin, entry["legacy"])
+
+    def _migrate_legacy_files(self, isin: str, filenames: list[str]) -> bool:
+        legacy_files = []
+        for filename in filenames:
+            parts = filename[:-len(".csv")].split("_")
+            legacy_files.append((filename, date.fromisoformat(parts[1]), date.fromisoformat(parts[2])))
+        best = _longest_block(legacy_files)
+
+        # Breiteste Datei zuletzt, damit ihre (in sich konsistente) Reihe bei Überlappung gewinnt
+        spans = {filename: end - start for filename, start, end in legacy_files}
+        close_data = None
+        for filename in sorted(best["files"], key=lambda f: spans[f]):
+            try:
+                csv_data = pd.read_csv(
+                    os.path.join(self.cache_dir, filename), index_col=0, parse_dates=True
+                )
+            except Exception as e:
+                print(f"Fehler beim Migrieren von {filename}: {e}")
+                self.manifest.remove(isin)
+                return False
+            if "Close" not in csv_data.columns:
+                continue
+            close_data = merge_close_data(close_data, csv_data[["Close"]])
+
+        if close_data is None:
+            self.manifest.remove(isin)
+            return False
+
+        # Existiert bereits eine Binärdatei (z.B. CSV eines älteren App-Stands nachträglich abgelegt),
+        # wird sie bei überlappenden Zeiträumen ergänzt, sonst gewinnt der längere Zeitraum
+        start, end = best["start"], best["end"]
+        if os.path.exists(self.path(isin)):
+            dates, closes, stored_start, stored_end = self._read_arrays(self.path(isin))
+            stored_data = pd.DataFrame(
+                {"Close": closes}, index=pd.DatetimeIndex(dates.view("datetime64[ns]"), name="Date")
+            )
+            if stored_start <= end and stored_end >= start:
+                close_data = merge_close_data(close_data, stored_data)
+                start, end = min(start, stored_start), max(end, stored_end)
+            elif stored_end - stored_start >= end - start:
+                close_data, start, end = stored_data, stored_start, stored_end
+
+        self.write(isin, close_data, start, end)
+        for filename, _, _ in legacy_files:
+            legacy_path = os.path.join(self.cache_dir, filename)
+            if os.path.exists(legacy_path):
+                os.remove(legacy_path)
+
+        print(f"Cache für {isin} migriert ({len(legacy_files)} CSV -> {os.path.basename(self.path(isin))}).")
+        return True
+
+
+    #  KOMPAKTIERUNG & VERDRÄNGUNG
+    def compact(self) -> dict:
+        """
+        Führt alle CSV-Altbestände pro Ticker zu einer kanonischen Binärdatei zusammen
+        und gleicht Manifest und Verzeichnis ab (verwaiste Einträge, nicht erfasste Dateien,
+        Reste abgebrochener Schreibvorgänge). Gibt eine kleine Statistik zurück.
+        """
+        manifest = self._manifest()
+        stats = {"migrated": 0, "registered": 0, "removed": 0}
+
+        # 1. Alle CSV-Altbestände migrieren (auch solche, die das Manifest noch nicht kennt)
+        for isin, legacy_files in self.legacy_csv_files().items():
+            with self._migration_lock:
+                if self._migrate_legacy_files(isin, [filename for filename, _, _ in legacy_files]):
+                    stats["migrated"] += 1
+
+        # 2. Manifest-Einträge ohne Datei entfernen
+        for isin, entry in manifest.items():
+            if not entry.get("legacy") and not os.path.exists(self.path(isin)):
+                manifest.remove(isin)
+                stats["removed"] += 1
+
+        # 3. Binärdateien ohne Manifest-Eintrag erfassen, alte temporäre Dateien löschen
+        now = time.time()
+        for filename in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, filename)
+            if filename.endswith(".tmp"):
+                if now - os.path.getmtime(path) > STALE_TMP_SECONDS:
+                    os.remove(path)
+                continue
+            if not filename.endswith(self.extension):
+                continue
+            isin = filename[:-len(self.extension)]
+            if manifest.get(isin) is None:
+                try:
+                    _, _, start, end = self._read_arrays(path)
+                except Exception as e:
+                    print(f"Fehler beim Lesen von {filename}: {e}")
+                    continue
+                manifest.set(isin, start, end)
+                stats["registered"] += 1
+
+        return stats
+
+    def size_bytes(self) -> dict[str, int]:
+        """Dateigröße pro Ticker (Binärdatei bzw. noch nicht migrierte CSV-Dateien)."""
+        sizes = {}
+        for isin, entry in self._manifest().items():
+            paths = [os.path.join(self.cache_dir, f) for f in entry.get("legacy", [])] or [self.path(isin)]
+            sizes[isin] = sum(os.path.getsize(p) for p in paths if os.path.exists(p))
+        return sizes
+
+    def evict_lru(self, max_bytes: int, protected: set[str]) -> list[str]:
+        """
+        Verdrängt die am längsten nicht genutzten Ticker, bis der Cache höchstens max_bytes belegt.
+        Ticker in `protected` (z.B. der KATALOG) werden nie verdrängt.
+        Gibt die verdrängten Ticker zurück.
+        """
+        sizes = self.size_bytes()
+        total = sum(sizes.values())
+        if total <= max_bytes:
+            return []
+
+        candidates = sorted(
+            (isin for isin in sizes if isin not in protected),
+            key=lambda isin: self.manifest.get(isin).get("last_access", ""),
+        )
+        evicted = []
+        for isin in candidates:
+            if total <= max_bytes:
+                break
+            for filename in self.manifest.get(isin).get("legacy", []):
+                legacy_path = os.path.join(self.cache_dir, filename)
+                if os.path.exists(legacy_path):
+                    os.remove(legacy_path)
+            self.delete(isin)
+            total -= sizes[isin]
+            evicted.append(isin)
+        return evicted
+
+
+def _longest_block(legacy_files: list[tuple[str, date, date]]) -> dict:
+    """
+    Bildet aus (Datei, Start, Ende)-Tupeln zusammenhängende Zeiträume und gibt den längsten zurück.
+    """
+    blocks = []
+    for filename, start, end in sorted(legacy_files, key=lambda f: f[1]):
+        if blocks and start <= blocks[-1]["end"]:
+            blocks[-1]["end"] = max(blocks[-1]["end"], end)
+            blocks[-1]["files"].append(filename)
+        else:
+            blocks.append({"start": start, "end": end, "files": [filename]})
+    return max(blocks, key=lambda b: (b["end"] - b["start"], b["end"]))
+
+
+class NpzPriceStore(PriceStore):
+    """
+    NumPy-Backend: int64-Datumswerte (ns) und float64-Schlusskurse in einer .npz-Datei.
+    """
+    extension = ".npz"
+
+    def _read_arrays(self, path):
+        with np.load(path) as npz:
+            dates = npz["dates"]
+            closes = npz["closes"]
+            start_ord, end_ord = npz["coverage"]
+        return dates, closes, date.fromordinal(int(start_ord)), date.fromordinal(int(end_ord))
+
+    def _write_arrays(self, path, dates, closes, start, end):
+        coverage = np.array([start.toordinal(), end.toordinal()], dtype="int64")
+        with open(path, "wb") as f:
+            np.savez(f, dates=dates, closes=closes, coverage=coverage)
+
+
+class ParquetPriceStore(PriceStore):
+    """
+    Parquet-Backend (optional, benötigt pyarrow). Der Zeitraum liegt in den Schema-Metadaten.
+    """
+    extension = ".parquet"
+
+    def __init__(self, cache_dir: str = CACHE_DIR):
+        import pyarrow  # noqa: F401  (früher Fehler, falls nicht installiert)
+        super().__init__(cache_dir)
+
+    def _read_arrays(self, path):
+        import pyarrow.parquet as pq
+        table = pq.read_table(path)
+        start_str, end_str = table.schema.metadata[b"coverage"].decode().split("/")
+        dates = table.column("dates").to_numpy()
+        closes = table.column("closes").to_numpy()
+        return dates, closes, date.fromisoformat(start_str), date.fromisoformat(end_str)
+
+    def _write_arrays(self, path, dates, closes, start, end):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.table({"dates": dates, "closes": closes})
+        table = table.replace_schema_metadata({"coverage": f"{start}/{end}"})
+        pq.write_table(table, path)
+
+
+PRICE_STORE_BACKENDS = {
+    "npz": NpzPriceStore,
+    "parquet": ParquetPriceStore,
+}
+
+_stores = {}
+
+
+def get_store() -> PriceStore:
+    """
+    Gibt die (prozessweit geteilte) Instanz des konfigurierten Backends zurück.
+    Jeder Marktdaten-Provider erhält ein eigenes Cache-Verzeichnis (synthetic -> cache/synthetic).
+    """
+    from .data_provider import get_provider
+    subdir = get_provider().cache_subdir
+    store = _stores.get(subdir)
+    if store is None:
+        cache_dir = os.path.join(CACHE_DIR, subdir) if subdir else CACHE_DIR
+        store = _stores.setdefault(subdir, PRICE_STORE_BACKENDS[PRICE_STORE_BACKEND](cache_dir))
+    return store
@@ -1,8 +1,11 @@
+import copy
 import pandas as pd
 import numpy as np
 from datetime import timedelta, date
 
 from . import inflation  # Import der zentralen Inflations-Logik
+from . import executor
+from . import covariance
 
 @staticmethod
 def _calculate_total_periodic_investment(assets: list[dict], interval: str) -> float:
@@ -22,6 +25,322 @@ def _get_resample_code(interval: str) -> str:
         return "YS"
     return "MS"
 
+# Tage je Block der Monte-Carlo-Rekursion (Blöcke beginnen immer bei Tag 1 + k * SCAN_BLOCK_DAYS)
+SCAN_BLOCK_DAYS = 256
+
+# Speicherbudget (MB) der Monte-Carlo-Simulation: Tage x Pfade werden in Zeitabschnitten gerechnet,
+# die mit allen Zwischen-Arrays in dieses Budget passen (ganze Blöcke von SCAN_BLOCK_DAYS Tagen oder,
+# bei sehr vielen Pfaden, Teile eines Blocks; mindestens ein Tag über alle Pfade)
+MC_MEMORY_BUDGET_MB = 256
+
+# float64-Arrays je Zelle (Tag x Pfad) eines Abschnitts: Zufallszahlen, Pfade, zwei Zwischen-Arrays
+# im Block-Scan, Kopie für die Quantile
+MC_ARRAYS_PER_CELL = 5
+
+# Pfade je Zufallsstrom: jeder Block von Pfaden hat einen eigenen, aus dem Seed abgeleiteten Strom,
+# sodass Ergebnisse unabhängig von Zeitabschnitten und Worker-Anzahl sind
+RNG_BLOCK_PATHS = 1000
+
+def _step_days(prev_values, random_returns, fee_vektor, zahlungen_vektor):
+    """Schritt-für-Schritt-Rekursion (Referenz und Rückfall für Pfade, die die Null-Grenze erreichen)."""
+    sim_matrix = np.empty((len(random_returns), len(prev_values)))
+    for i in range(len(random_returns)):
+        current_values = prev_values * (1 + random_returns[i])
+        current_values *= fee_vektor[i]
+        current_values += zahlungen_vektor[i]
+        current_values = np.maximum(0, current_values)
+        sim_matrix[i] = current_values
+        prev_values = current_values
+    return sim_matrix
+
+def _scan_rows(random_returns, fee_vektor, zahlungen_vektor, product, level):
+    """
+    Kern von _scan_days ohne Null-Grenze, fortsetzbar über aufeinanderfolgende Teile eines Blocks:
+    product ist A bis zur Zeile vor dem Teil (None am Blockanfang), level der Stand x_0 + Summe b_k / A_k davor.
+    Gibt (Zeilen, A der letzten Zeile, Stand danach) zurück; Teile hintereinander ergeben bitgleich
+    dieselben Zeilen wie ein Aufruf über den ganzen Block (kumuliertes Produkt und Summe laufen zeilenweise).
+    """
+    sim_matrix = random_returns + 1.0
+    sim_matrix *= fee_vektor[:, None]
+    return _scan_growth(sim_matrix, zahlungen_vektor, product, level)
+
+def _scan_growth(sim_matrix, zahlungen_vektor, product, level):
+    """
+    _scan_rows auf bereits berechneten Wachstumsfaktoren a_i, in-place: sim_matrix (Zeilen x Pfade, bei der
+    Multi-Asset-Prognose Zeilen x Pfade x Positionen mit Zahlungen je Zeile und Position) enthält danach die Werte x_i.
+    """
+    if product is not None:
+        sim_matrix[0] *= product
+    np.cumprod(sim_matrix, axis=0, out=sim_matrix)
+    product = sim_matrix[-1].copy()
+
+    payment_days = np.flatnonzero(zahlungen_vektor.reshape(len(zahlungen_vektor), -1).any(axis=1))
+    if payment_days.size:
+        # Stand x_0 + Summe b_k / A_k, jeweils gültig ab einem Zahlungstag bis zum nächsten
+        levels = np.empty((payment_days.size + 1,) + level.shape)
+        levels[0] = level
+        np.divide(np.expand_dims(zahlungen_vektor[payment_days], 1), sim_matrix[payment_days], out=levels[1:])
+        np.cumsum(levels, axis=0, out=levels)
+        counts = np.diff(np.concatenate(([0], payment_days, [len(zahlungen_vektor)])))
+        sim_matrix *= np.repeat(levels, counts, axis=0)
+        level = levels[-1]
+    else:
+        sim_matrix *= level
+    return sim_matrix, product, level
+
+def _floored_paths(sim_matrix, prev_values, zahlungen_vektor) -> np.ndarray:
+    """Pfade eines Blocks, die _scan_days Schritt für Schritt nachrechnet (nicht strikt positiv geblieben)."""
+    floored = ~(sim_matrix > 0).all(axis=0)
+    if (zahlungen_vektor <= 0).all():
+        # Ohne Einzahlungen bleiben aufgezehrte Pfade (Wert 0) bei 0
+        floored &= prev_values != 0
+    return floored
+
+def _scan_days(prev_values, random_returns, fee_vektor, zahlungen_vektor):
+    """
+    Gleiche Rekursion für einen Block von Schritten ohne Schleife: ohne Null-Grenze gilt
+    x_i = a_i * x_{i-1} + b_i mit a_i = (1 + r_i) * Gebühr_i und b_i = Zahlung_i (Sparrate nach Gebühr - Depotgebühr),
+    also x_i = A_i * (x_0 + Summe b_k / A_k) mit A_i = a_1 * ... * a_i (kumuliertes Produkt).
+    b_k ist nur an Spar- und Gebührentagen ungleich 0; nur dort wird die Summe gebildet.
+    Pfade, die im Block nicht strikt positiv bleiben, werden Schritt für Schritt nachgerechnet.
+    """
+    sim_matrix, _, _ = _scan_rows(random_returns, fee_vektor, zahlungen_vektor, None, prev_values)
+    floored = _floored_paths(sim_matrix, prev_values, zahlungen_vektor)
+    if (zahlungen_vektor <= 0).all():
+        sim_matrix[:, prev_values == 0] = 0.0
+    if floored.any():
+        sim_matrix[:, floored] = _step_days(prev_values[floored], random_returns[:, floored], fee_vektor, zahlungen_vektor)
+    return sim_matrix
+
+def _advance_paths(random_returns, fee_vektor, zahlungen_vektor, prev_values, sim_matrix, first_row: int) -> None:
+    """
+    Rechnet Pfade eines Zeitabschnitts blockweise fort und schreibt sie nach sim_matrix.
+    prev_values ist der Wert vor dem Abschnitt bzw. (first_row=1) der Startwert in Zeile 0.
+    """
+    if first_row:
+        sim_matrix[0] = prev_values
+
+    for block_start in range(first_row, len(sim_matrix), SCAN_BLOCK_DAYS):
+        days = slice(block_start, min(block_start + SCAN_BLOCK_DAYS, len(sim_matrix)))
+        sim_matrix[days] = _scan_days(prev_values, random_returns[days], fee_vektor[days], zahlungen_vektor[days])
+        prev_values = sim_matrix[days.stop - 1]
+
+def _draw_returns(generators: list, n_rows: int, n_columns: int, loc: np.ndarray, scale: np.ndarray, lognormal: bool) -> np.ndarray:
+    """
+    Renditen (Zeilen x Pfade) aus je einem Strom pro Block von RNG_BLOCK_PATHS Pfaden: r = loc + scale * z,
+    lognormal=True: r = exp(loc + scale * z) - 1. Jeder Strom zieht seine Pfade zeilenweise, die Werte
+    hängen daher weder von der Länge der Zeitabschnitte noch von der Aufteilung auf Worker ab.
+    """
+    random_returns = np.empty((n_rows, n_columns))
+    for k, generator in enumerate(generators):
+        columns = slice(k * RNG_BLOCK_PATHS, min((k + 1) * RNG_BLOCK_PATHS, n_columns))
+        random_returns[:, columns] = generator.standard_normal(size=(n_rows, columns.stop - columns.start))
+    random_returns *= scale[:, None]
+    random_returns += loc[:, None]
+    if lognormal:
+        np.expm1(random_returns, out=random_returns)
+    return random_returns
+
+def _simulate_paths(arrays: dict, task: tuple) -> list:
+    """
+    Worker: zieht die Renditen der Pfade columns aus ihren Strömen und rechnet sie nach arrays["paths"] fort.
+    Gibt die fortgeschriebenen Ströme zurück (im Pool sind es Kopien, der Aufrufer übernimmt sie).
+    """
+    columns, first_row, generators, lognormal = task
+    sim_matrix = arrays["paths"][:, columns]
+    random_returns = np.zeros(sim_matrix.shape)
+    random_returns[first_row:] = _draw_returns(
+        generators, len(sim_matrix) - first_row, sim_matrix.shape[1],
+        arrays["loc"][first_row:], arrays["scale"][first_row:], lognormal,
+    )
+    _advance_paths(random_returns, arrays["fee"], arrays["zahlungen"], arrays["start"][columns], sim_matrix, first_row)
+    return generators
+
+def _mark_floored(arrays: dict, task: tuple) -> None:
+    """
+    Worker (Vorlauf eines Blocks in Teilen): rechnet die Pfade columns über den ganzen Block mit dem Scan
+    und markiert in arrays["floored"], welche _scan_days Schritt für Schritt nachrechnen würde.
+    generators sind Kopien der Ströme; die Originale ziehen dieselben Zahlen danach in _simulate_part.
+    """
+    columns, generators, lognormal = task
+    prev_values = arrays["start"][columns]
+    random_returns = _draw_returns(
+        generators, len(arrays["loc"]), len(prev_values), arrays["loc"], arrays["scale"], lognormal,
+    )
+    sim_matrix, _, _ = _scan_rows(random_returns, arrays["fee"], arrays["zahlungen"], None, prev_values)
+    arrays["floored"][columns] = _floored_paths(sim_matrix, prev_values, arrays["zahlungen"])
+
+def _simulate_part(arrays: dict, task: tuple) -> list:
+    """
+    Worker: ein Teil eines Blocks für die Pfade columns, fortgesetzt aus dem Zustand am Ende des vorherigen
+    Teils (arrays["product"], ["level"], ["prev"]) und bitgleich zu _scan_days über den ganzen Block.
+    keep_zero: der Block hat keine Einzahlungen (Pfade mit Wert 0 am Blockanfang bleiben bei 0).
+    """
+    columns, generators, lognormal, keep_zero = task
+    random_returns = _draw_returns(
+        generators, len(arrays["paths"]), columns.stop - columns.start, arrays["loc"], arrays["scale"], lognormal,
+    )
+    sim_matrix, arrays["product"][columns], arrays["level"][columns] = _scan_rows(
+        random_returns, arrays["fee"], arrays["zahlungen"], arrays["product"][columns], arrays["level"][columns],
+    )
+    if keep_zero:
+        sim_matrix[:, arrays["start"][columns] == 0] = 0.0
+    floored = np.flatnonzero(arrays["floored"][columns])
+    if floored.size:
+        sim_matrix[:, floored] = _step_days(
+            arrays["prev"][columns][floored], random_returns[:, floored], arrays["fee"], arrays["zahlungen"],
+        )
+    arrays["paths"][:, columns] = sim_matrix
+    arrays["prev"][columns] = sim_matrix[-1]
+    return generators
+
+def _random_streams(seed: int | None, n_simulations: int) -> list[np.random.Generator]:
+    """
+    Unabhängige Zufallsströme (numpy Generator) je Block von RNG_BLOCK_PATHS Pfaden, abgeleitet aus seed.
+    Gleicher seed -> gleiche Pfade; None -> neue Zufallszahlen bei jedem Aufruf.
+    """
+    n_blocks = -(-n_simulations // RNG_BLOCK_PATHS)
+    return [np.random.Generator(np.random.PCG64(child)) for child in np.random.SeedSequence(seed).spawn(n_blocks)]
+
+def _chunk_days(n_simulations: int, memory_budget_mb: float) -> int:
+    """
+    Tage je Zeitabschnitt, sodass alle Arrays eines Abschnitts ins Budget passen: ein Vielfaches von
+    SCAN_BLOCK_DAYS oder, wenn schon ein Block über alle Pfade zu groß ist, ein Teil eines Blocks (mindestens ein Tag).
+    """
+    bytes_per_day = n_simulations * 8 * MC_ARRAYS_PER_CELL
+    days = int(memory_budget_mb * 1024 * 1024 // bytes_per_day)
+    if days < SCAN_BLOCK_DAYS:
+        return max(days, 1)
+    return days // SCAN_BLOCK_DAYS * SCAN_BLOCK_DAYS
+
+def _forecast_in_parts(
+    vectors: dict[str, np.ndarray],
+    prev_values: np.ndarray,
+    streams: list,
+    stream_groups: list[slice],
+    path_blocks: list[slice],
+    part_days: int,
+    memory_budget_mb: float,
+    lognormal: bool,
+    quantiles: np.ndarray,
+) -> None:
+    """
+    Monte-Carlo-Rekursion von run_forecast, wenn schon ein Block von SCAN_BLOCK_DAYS Schritten über alle
+    Pfade das Speicherbudget übersteigt: jeder Block wird in Teilen von part_days Schritten über alle Pfade
+    gerechnet (Quantile brauchen je Schritt alle Pfade), der Scan läuft aus dem Zustand am Ende des vorherigen
+    Teils weiter. Welche Pfade im Block Schritt für Schritt nachgerechnet werden, ergibt ein Vorlauf über den
+    ganzen Block in Gruppen von Strom-Blöcken, die ins Budget passen (zweites Ziehen derselben Zufallszahlen).
+    Schreibt die Quantile nach quantiles; sie sind bitgleich zu einem Durchgang über ganze Blöcke.
+    """
+    n_simulations = len(prev_values)
+    num_steps = len(vectors["loc"])
+    # Vorlauf: so viele Strom-Blöcke je Aufgabe, dass ein ganzer Block aller Worker ins Budget passt
+    block_bytes = SCAN_BLOCK_DAYS * RNG_BLOCK_PATHS * 8 * MC_ARRAYS_PER_CELL
+    streams_per_task = max(1, int(memory_budget_mb * 1024 * 1024 // block_bytes) // executor.POOL_WORKERS)
+    scan_groups = [slice(k, min(k + streams_per_task, len(streams))) for k in range(0, len(streams), streams_per_task)]
+
+    quantiles[:, 0] = np.quantile(prev_values[None, :], [0.50, 0.95, 0.05], axis=1)[:, 0]
+    state = {
+        "start": prev_values,
+        "floored": np.zeros(n_simulations, dtype=bool),
+        "product": np.empty(n_simulations),
+        "level": np.empty(n_simulations),
+        "prev": np.empty(n_simulations),
+    }
+    for block_start in range(1, num_steps, SCAN_BLOCK_DAYS):
+        block = slice(block_start, min(block_start + SCAN_BLOCK_DAYS, num_steps))
+        executor.map_shared(
+            _mark_floored,
+            {**{key: vector[block] for key, vector in vectors.items()}, "start": state["start"], "floored": state["floored"]},
+            [
+                (slice(group.start * RNG_BLOCK_PATHS, min(group.stop * RNG_BLOCK_PATHS, n_simulations)), copy.deepcopy(streams[group]), lognormal)
+                for group in scan_groups
+            ],
+            parallel=executor.use_pool((block.stop - block.start) * n_simulations, len(scan_groups)),
+            outputs=("floored",),
+        )
+        state["product"][...] = 1.0
+        state["level"][...] = state["start"]
+        state["prev"][...] = state["start"]
+        keep_zero = bool((vectors["zahlungen"][block] <= 0).all())
+
+        for part_start in range(block.start, block.stop, part_days):
+            part = slice(part_start, min(part_start + part_days, block.stop))
+            sim_matrix = np.empty((part.stop - part.start, n_simulations))
+            advanced = executor.map_shared(
+                _simulate_part,
+                {**{key: vector[part] for key, vector in vectors.items()}, **state, "paths": sim_matrix},
+                [(columns, streams[group], lognormal, keep_zero) for columns, group in zip(path_blocks, stream_groups)],
+                parallel=executor.use_pool(sim_matrix.size, len(path_blocks)),
+                outputs=("paths", "product", "level", "prev"),
+            )
+            streams = [generator for generators in advanced for generator in generators]
+            quantiles[:, part] = np.quantile(sim_matrix, [0.50, 0.95, 0.05], axis=1)
+            del sim_matrix
+        state["start"] = state["prev"].copy()
+
+def _prognose_frame(start_values: dict, prognose_jahre: int) -> pd.DataFrame | None:
+    """Tägliches Prognose-Gerüst ab dem Tag nach start_values['letzter_tag'] mit 'Inflation_Factor'."""
+    trading_days = 365.25
+    letzter_tag_hist = start_values['letzter_tag']
+    letzter_wert_nominal = start_values['nominal']
+    letzter_wert_real_basis = start_values['real']
+
+    start_datum_prognose = letzter_tag_hist + timedelta(days=1)
+    end_datum_prognose = start_datum_prognose + timedelta(days=int(prognose_jahre * trading_days))
+    
+    prognose_zeitraum = pd.date_range(start=start_datum_prognose, end=end_datum_prognose, freq='D')
+    if prognose_zeitraum.empty:
+        return None
+
+    prognose_df = pd.DataFrame(index=prognose_zeitraum)
+
+    # INFLATION 
+    inflation_series = inflation.calculate_inflation_series(prognose_zeitraum)
+    
+    # Anpassung an Basis (falls Simulation nahtlos fortgesetzt wird)
+    inflation_basis = 1.0
+    if letzter_wert_real_basis > 0:
+        inflation_basis = letzter_wert_nominal / letzter_wert_real_basis
+    
+    # Zuweisung ins DataFrame
+    prognose_df['Inflation_Factor'] = inflation_series * inflation_basis
+    return prognose_df
+
+def _step_rows(prognose_zeitraum: pd.DatetimeIndex, monatliche_schritte: bool) -> np.ndarray:
+    """Zeilen der Simulationsschritte: jeder Tag ODER Starttag, Monatsanfänge und letzter Tag."""
+    num_days = len(prognose_zeitraum)
+    if not monatliche_schritte:
+        return np.arange(num_days)
+    return np.flatnonzero((prognose_zeitraum.day == 1) | (np.arange(num_days) == 0) | (np.arange(num_days) == num_days - 1))
+
+def _spartage_rows(prognose_zeitraum: pd.DatetimeIndex, interval: str) -> np.ndarray:
+    """Zeilen der Spartage eines Intervalls (erster Tag jeder Periode im Prognosezeitraum)."""
+    spartage = pd.DataFrame(index=prognose_zeitraum).resample(_get_resample_code(interval)).first().index
+    return prognose_zeitraum.get_indexer(spartage.intersection(prognose_zeitraum))
+
+def _aggregate(prognose_df: pd.DataFrame, quantiles: np.ndarray) -> pd.DataFrame:
+    """Median/BestCase/WorstCase (nominal und real) aus den Quantilen 50/95/5 % je Zeile."""
+    prognose_df['Portfolio (Median)'] = quantiles[0]
+    prognose_df['Portfolio (BestCase)'] = quantiles[1]
+    prognose_df['Portfolio (WorstCase)'] = quantiles[2]
+    
+    prognose_df['Portfolio (Real_Median)'] = prognose_df['Portfolio (Median)'] / prognose_df['Inflation_Factor']
+    prognose_df['Portfolio (Real_BestCase)'] = prognose_df['Portfolio (BestCase)'] / prognose_df['Inflation_Factor']
+    prognose_df['Portfolio (Real_WorstCase)'] = prognose_df['Portfolio (WorstCase)'] / prognose_df['Inflation_Factor']
+
+    final_columns = [
+        'Einzahlungen (brutto)',
+        'Portfolio (Median)',
+        'Portfolio (BestCase)',
+        'Portfolio (WorstCase)',
+        'Portfolio (Real_Median)',
+        'Portfolio (Real_BestCase)',
+        'Portfolio (Real_WorstCase)'
+    ]
+    
+    return prognose_df[final_columns]
+
 def run_forecast(
     start_values: dict,
     assets: list[dict],
@@ -33,9 +352,26 @@ def run_forecast(
     expected_asset_returns_pa: dict[str, float],
     asset_final_values: dict[str, float],
     expected_volatility_pa: float,
-    n_simulations: int
+    n_simulations: int,
+    memory_budget_mb: float | None = MC_MEMORY_BUDGET_MB,
+    monatliche_schritte: bool = False,
+    seed: int | None = None,
 ) -> pd.DataFrame | None:
-    
+    """
+    Monte-Carlo-Prognose ab dem letzten historischen Tag (Median, 95%- und 5%-Quantil je Tag).
+    Die Pfade werden in Zeitabschnitten über alle Pfade gerechnet; je Abschnitt werden die
+    Quantile sofort gebildet und die Arrays verworfen. Der Speicherbedarf richtet sich nach
+    memory_budget_mb statt nach Prognosedauer x Pfadanzahl (None = ein Durchgang über alle Tage;
+    passt kein ganzer Block über alle Pfade ins Budget, siehe _forecast_in_parts);
+    Zufallszahlen (gleiche Reihenfolge) und Quantile sind in beiden Fällen dieselben.
+    monatliche_schritte=True: ein Schritt je Monat statt je Tag (Index: Starttag, jeder Monatsanfang,
+    letzter Tag). Jeder Schritt zieht die über seine Tage aggregierte Rendite als Lognormalverteilung
+    mit denselben ersten beiden Momenten wie das Produkt der Tagesrenditen; Einzahlungen und
+    Depotgebühr fallen ohnehin nur an Monatsanfängen an, die Managementgebühr je Schritt über alle Tage.
+    seed: gleicher Seed -> bitgleiche Quantile, unabhängig von Speicherbudget und Worker-Anzahl
+    (None = neue Zufallszahlen bei jedem Aufruf).
+    """
+
     if prognose_jahre <= 0:
         return None
 
@@ -54,35 +390,17 @@ def run_forecast(
     daily_mu = (weighted_avg_return_pa / 100.0) / trading_days
     daily_sigma = (expected_volatility_pa / 100.0) / np.sqrt(trading_days)
 
-    #  3. Zeitrahmen 
-    letzter_tag_hist = start_values['letzter_tag']
+    #  3. Zeitrahmen & 4A) Inflation
     letzter_wert_nominal = start_values['nominal']
-    letzter_wert_real_basis = start_values['real']
     letzte_einzahlung = start_values['einzahlung']
 
-    start_datum_prognose = letzter_tag_hist + timedelta(days=1)
-    end_datum_prognose = start_datum_prognose + timedelta(days=int(prognose_jahre * trading_days))
-    
-    prognose_zeitraum = pd.date_range(start=start_datum_prognose, end=end_datum_prognose, freq='D')
-    num_days = len(prognose_zeitraum)
-    
-    if prognose_zeitraum.empty or num_days <= 0:
+    prognose_df = _prognose_frame(start_values, prognose_jahre)
+    if prognose_df is None:
         return None
-
-    prognose_df = pd.DataFrame(index=prognose_zeitraum)
+    prognose_zeitraum = prognose_df.index
+    num_days = len(prognose_zeitraum)
 
     #  4. Deterministische Faktoren 
-    
-    # A) INFLATION 
-    inflation_series = inflation.calculate_inflation_series(prognose_zeitraum)
-    
-    # Anpassung an Basis (falls Simulation nahtlos fortgesetzt wird)
-    inflation_basis = 1.0
-    if letzter_wert_real_basis > 0:
-        inflation_basis = letzter_wert_nominal / letzter_wert_real_basis
-    
-    # Zuweisung ins DataFrame
-    prognose_df['Inflation_Factor'] = inflation_series * inflation_basis
 
     # B) KOSTEN
     daily_mgmt_fee_factor = (1.0 - (kosten_management_pa_pct / 100.0)) ** (1 / trading_days)
@@ -107,47 +425,243 @@ def run_forecast(
     prognose_df['Einzahlungen (brutto)'] = prognose_df['Sparrate_Einzahlung'].cumsum() + letzte_einzahlung
 
     #  5. Monte Carlo Simulation 
-    random_returns = np.random.normal(
-        loc=daily_mu, 
-        scale=daily_sigma, 
-        size=(num_days, n_simulations)
-    )
-    
-    sim_matrix = np.zeros((num_days, n_simulations))
-    sim_matrix[0] = letzter_wert_nominal 
-    
     sparrate_netto_vektor = prognose_df['Sparrate_Netto'].values
     depotgebuehr_vektor = np.zeros(num_days)
     depotgebuehr_indices = [prognose_df.index.get_loc(tag) for tag in depotgebuehr_tage if tag in prognose_df.index]
     if depotgebuehr_indices:
         depotgebuehr_vektor[depotgebuehr_indices] = kosten_depot_pa_eur
 
-    for i in range(1, num_days):
-        prev_values = sim_matrix[i-1]
-        current_values = prev_values * (1 + random_returns[i])
-        current_values += sparrate_netto_vektor[i]
-        current_values *= daily_mgmt_fee_factor
-        current_values -= depotgebuehr_vektor[i]
-        current_values = np.maximum(0, current_values)
-        sim_matrix[i] = current_values
+    # Schritte: jeder Tag ODER Starttag, Monatsanfänge und letzter Tag (alle Zahlungen liegen auf Monatsanfängen)
+    step_rows = _step_rows(prognose_zeitraum, monatliche_schritte)
+    num_steps = len(step_rows)
+    step_days = np.diff(step_rows, prepend=0)
+    fee_vektor = daily_mgmt_fee_factor ** step_days
+    zahlungen_vektor = sparrate_netto_vektor[step_rows] * daily_mgmt_fee_factor - depotgebuehr_vektor[step_rows]
 
-    #  6. Aggregation 
-    prognose_df['Portfolio (Median)'] = np.quantile(sim_matrix, 0.50, axis=1)
-    prognose_df['Portfolio (BestCase)'] = np.quantile(sim_matrix, 0.95, axis=1)
-    prognose_df['Portfolio (WorstCase)'] = np.quantile(sim_matrix, 0.05, axis=1)
-    
-    prognose_df['Portfolio (Real_Median)'] = prognose_df['Portfolio (Median)'] / prognose_df['Inflation_Factor']
-    prognose_df['Portfolio (Real_BestCase)'] = prognose_df['Portfolio (BestCase)'] / prognose_df['Inflation_Factor']
-    prognose_df['Portfolio (Real_WorstCase)'] = prognose_df['Portfolio (WorstCase)'] / prognose_df['Inflation_Factor']
+    # Aggregierte Rendite je Schritt: Produkt von n Tagesfaktoren (1 + r), r ~ N(daily_mu, daily_sigma),
+    # hat E = (1 + daily_mu)^n und E[X^2] = ((1 + daily_mu)^2 + daily_sigma^2)^n -> Lognormal mit gleichen Momenten
+    step_log_var = step_days * np.log1p(daily_sigma ** 2 / (1 + daily_mu) ** 2)
+    step_log_mu = step_days * np.log1p(daily_mu) - step_log_var / 2
 
-    final_columns = [
-        'Einzahlungen (brutto)',
-        'Portfolio (Median)',
-        'Portfolio (BestCase)',
-        'Portfolio (WorstCase)',
-        'Portfolio (Real_Median)',
-        'Portfolio (Real_BestCase)',
-        'Portfolio (Real_WorstCase)'
+    # Verteilung je Schritt: Tagesmodus r ~ N(daily_mu, daily_sigma), Monatsmodus log(1 + r) ~ N(step_log_mu, step_log_var)
+    if monatliche_schritte:
+        loc_vektor, scale_vektor = step_log_mu, np.sqrt(step_log_var)
+    else:
+        loc_vektor, scale_vektor = np.full(num_steps, daily_mu), np.full(num_steps, daily_sigma)
+
+    # Zeitabschnitte über alle Pfade: der erste enthält zusätzlich Schritt 0 (Startwert), damit die
+    # Blöcke der Rekursion unabhängig von der Abschnittslänge bei Schritt 1 + k * SCAN_BLOCK_DAYS beginnen.
+    # Pfade sind unabhängig: große Abschnitte werden in ganzen Strom-Blöcken auf den Prozess-Pool verteilt,
+    # die Worker ziehen ihre Zufallszahlen selbst und geben die fortgeschriebenen Ströme zurück.
+    quantiles = np.empty((3, num_steps))
+    chunk_days = num_steps if memory_budget_mb is None else _chunk_days(n_simulations, memory_budget_mb)
+    streams = _random_streams(seed, n_simulations)
+    stream_groups = executor.split_range(len(streams), executor.POOL_WORKERS)
+    path_blocks = [
+        slice(group.start * RNG_BLOCK_PATHS, min(group.stop * RNG_BLOCK_PATHS, n_simulations))
+        for group in stream_groups
     ]
-    
-    return prognose_df[final_columns]
\ No newline at end of file
+    prev_values = np.full(n_simulations, float(letzter_wert_nominal))
+    if chunk_days < min(SCAN_BLOCK_DAYS, num_steps - 1):
+        # Schon ein Block über alle Pfade sprengt das Budget -> Blöcke in Teilen rechnen
+        _forecast_in_parts(
+            {"loc": loc_vektor, "scale": scale_vektor, "fee": fee_vektor, "zahlungen": zahlungen_vektor},
+            prev_values, streams, stream_groups, path_blocks, chunk_days, memory_budget_mb, monatliche_schritte, quantiles,
+        )
+    else:
+        chunk_start = 0
+        while chunk_start < num_steps:
+            chunk = slice(chunk_start, min(chunk_days + 1 if chunk_start == 0 else chunk_start + chunk_days, num_steps))
+            sim_matrix = np.empty((chunk.stop - chunk.start, n_simulations))
+            first_row = 1 if chunk_start == 0 else 0
+            advanced = executor.map_shared(
+                _simulate_paths,
+                {
+                    "loc": loc_vektor[chunk],
+                    "scale": scale_vektor[chunk],
+                    "fee": fee_vektor[chunk],
+                    "zahlungen": zahlungen_vektor[chunk],
+                    "start": prev_values,
+                    "paths": sim_matrix,
+                },
+                [(columns, first_row, streams[group], monatliche_schritte) for columns, group in zip(path_blocks, stream_groups)],
+                parallel=executor.use_pool(sim_matrix.size, len(path_blocks)),
+                outputs=("paths",),
+            )
+            streams = [generator for generators in advanced for generator in generators]
+            quantiles[:, chunk] = np.quantile(sim_matrix, [0.50, 0.95, 0.05], axis=1)
+            prev_values = sim_matrix[-1].copy()
+            del sim_matrix
+            chunk_start = chunk.stop
+
+    prognose_df = prognose_df.iloc[step_rows].copy()
+
+    #  6. Aggregation 
+    return _aggregate(prognose_df, quantiles)
+
+#  MULTI-ASSET-PROGNOSE (korrelierte Renditen je Position)
+# Jede Position hat eigene Pfade mit eigenem Startwert, eigener Sparrate und eigenem Intervall.
+# Die log-Renditen aller Positionen sind gemeinsam normalverteilt (Kovarianz aus der Kurshistorie,
+# siehe covariance.py) und werden über den Cholesky-Faktor korreliert gezogen; ihr Erwartungswert
+# je Schritt entspricht (1 + erwartete Tagesrendite)^Tage wie in run_forecast. Die Depotgebühr wird
+# anteilig nach Wert von allen Positionen eines Pfads abgezogen. Gerechnet wird in Zeitabschnitten über
+# alle Pfade mit dem Block-Scan von run_forecast zwischen zwei Depotgebühren (keine Schleife je Schritt);
+# Standard sind Monatsschritte.
+
+# float64-Arrays je Zelle (Schritt x Pfad x Position) eines Zeitabschnitts: Wachstumsfaktoren und Summen
+# je Schritt, Stände je Zahlung im Block-Scan, dazu Zufallszahlen und Produkt eines Strom-Blocks (Reserve)
+MULTI_ASSET_ARRAYS_PER_CELL = 4
+
+def _multi_asset_chunk_steps(n_assets: int, n_simulations: int, memory_budget_mb: float) -> int:
+    """Schritte je Zeitabschnitt, sodass die Arrays eines Abschnitts ins Budget passen (mindestens einer)."""
+    bytes_per_step = n_simulations * n_assets * 8 * MULTI_ASSET_ARRAYS_PER_CELL
+    return max(int(memory_budget_mb * 1024 * 1024 // bytes_per_step), 1)
+
+def _asset_growth(
+    generators: list,
+    n_paths: int,
+    cholesky: np.ndarray,
+    log_mu: np.ndarray,
+    step_scale: np.ndarray,
+    fee_vektor: np.ndarray,
+) -> np.ndarray:
+    """
+    Korrelierte Wachstumsfaktoren (Schritte x Pfade x Positionen) nach Managementgebühr:
+    exp(log_mu + step_scale * L z) * Gebühr, z je Strom-Block von RNG_BLOCK_PATHS Pfaden schrittweise gezogen.
+    """
+    n_steps, n_assets = log_mu.shape
+    growth = np.empty((n_steps, n_paths, n_assets))
+    for k, generator in enumerate(generators):
+        paths = slice(k * RNG_BLOCK_PATHS, min((k + 1) * RNG_BLOCK_PATHS, n_paths))
+        growth[:, paths] = generator.standard_normal(size=(n_steps, paths.stop - paths.start, n_assets)) @ cholesky.T
+    growth *= step_scale[:, None, None]
+    growth += log_mu[:, None, :]
+    np.exp(growth, out=growth)
+    growth *= fee_vektor[:, None, None]
+    return growth
+
+def _simulate_asset_paths(
+    state: tuple[np.ndarray, np.ndarray], growth: np.ndarray, zahlungen: np.ndarray, depotgebuehr_vektor: np.ndarray, totals: np.ndarray,
+) -> None:
+    """
+    Schreibt die Werte je Position fort (x_i = a_i * x_{i-1} + b_i) und die Portfoliowerte je Schritt nach
+    totals (Schritte x Pfade). Wie in run_forecast mit dem Block-Scan (_scan_growth, alle Positionen zugleich)
+    statt Schritt für Schritt: Wachstumsfaktoren sind positiv und Einzahlungen nicht negativ, die Werte bleiben
+    also ohne Null-Grenze >= 0. Nur die Depotgebühr (anteilig nach Wert, koppelt die Positionen) beendet
+    einen Scan; danach beginnt er neu mit den Werten nach Abzug.
+    state = (A bis zum letzten Schritt, Stand x_0 + Summe b_k / A_k), je Pfade x Positionen; wird in-place
+    in den nächsten Zeitabschnitt fortgeschrieben (bitgleich zu einem Abschnitt über alle Schritte).
+    growth (Schritte x Pfade x Positionen) wird mit den Werten überschrieben.
+    zahlungen: Netto-Einzahlung je Schritt und Position (nach Gebühr des Zahltags).
+    """
+    product, level = state
+    fee_steps = np.flatnonzero(depotgebuehr_vektor > 0)
+    bounds = np.unique(np.concatenate(([0], fee_steps + 1, [len(growth)])))
+    for first, stop in zip(bounds[:-1], bounds[1:]):
+        _, product[...], level[...] = _scan_growth(growth[first:stop], zahlungen[first:stop], product, level)
+        if depotgebuehr_vektor[stop - 1] > 0:
+            # Anteilig nach Wert; reicht der Wert nicht, ist der Pfad aufgezehrt
+            values = growth[stop - 1]
+            total = values.sum(axis=1)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                remaining = np.where(total > 0, np.maximum(1 - depotgebuehr_vektor[stop - 1] / total, 0), 0)
+            values *= remaining[:, None]
+            product[...] = 1.0
+            level[...] = values
+    growth.sum(axis=2, out=totals)
+
+def run_multi_asset_forecast(
+    start_values: dict,
+    assets: list[dict],
+    prognose_jahre: int,
+    sparplan_fortfuehren: bool,
+    kosten_management_pa_pct: float,
+    kosten_depot_pa_eur: float,
+    ausgabeaufschlag_pct: float,
+    expected_asset_returns_pa: dict[str, float],
+    asset_final_values: dict[str, float],
+    expected_volatility_pa: float,
+    n_simulations: int,
+    covariance_pa: np.ndarray | None = None,
+    monatliche_schritte: bool = True,
+    memory_budget_mb: float | None = MC_MEMORY_BUDGET_MB,
+    seed: int | None = None,
+) -> pd.DataFrame | None:
+    """
+    Monte-Carlo-Prognose mit korrelierten Renditen je Position (gleiche Spalten wie run_forecast).
+    Positionen: assets mit ISIN; Startwert je Position = start_values['nominal'] x Anteil an asset_final_values.
+    covariance_pa: Kovarianz p.a. der log-Renditen (Positionen in Reihenfolge der assets mit ISIN);
+    None = aus der gecachten Kurshistorie, expected_volatility_pa dient dort als Ersatz für Positionen ohne Historie.
+    seed: wie in run_forecast (gleicher Seed -> bitgleiche Quantile, unabhängig vom Speicherbudget).
+    """
+    positions = [asset for asset in assets if asset.get("ISIN / Ticker")]
+    if prognose_jahre <= 0 or not positions:
+        return None
+
+    prognose_df = _prognose_frame(start_values, prognose_jahre)
+    if prognose_df is None:
+        return None
+    prognose_zeitraum = prognose_df.index
+    num_days = len(prognose_zeitraum)
+    n_assets = len(positions)
+    names = [asset.get("Name") or asset["ISIN / Ticker"] for asset in positions]
+
+    #  1. Startwerte und erwartete Tagesrenditen je Position
+    trading_days = 365.25
+    final_values = np.array([float(asset_final_values.get(name, 0.0)) for name in names])
+    if final_values.sum() <= 0:
+        final_values = np.array([float(asset.get("Einmalerlag (€)", 0.0)) for asset in positions])
+    weights = final_values / final_values.sum() if final_values.sum() > 0 else np.full(n_assets, 1.0 / n_assets)
+    asset_start_values = float(start_values['nominal']) * weights
+    daily_mu = np.array([expected_asset_returns_pa.get(name, 0.0) for name in names]) / 100.0 / trading_days
+
+    if covariance_pa is None:
+        covariance_pa = covariance.historical_covariance([asset["ISIN / Ticker"] for asset in positions], expected_volatility_pa)
+    daily_covariance = np.asarray(covariance_pa, dtype="float64") / trading_days
+    cholesky = covariance.cholesky_factor(daily_covariance)
+
+    #  2. Kosten und Einzahlungen je Position (eigenes Intervall)
+    daily_mgmt_fee_factor = (1.0 - (kosten_management_pa_pct / 100.0)) ** (1 / trading_days)
+    cost_factor_sparrate = (1.0 - (ausgabeaufschlag_pct / 100.0))
+    einzahlungen = np.zeros((num_days, n_assets))
+    if sparplan_fortfuehren:
+        for j, asset in enumerate(positions):
+            sparbetrag = float(asset.get("Sparbetrag (€)", 0.0))
+            if sparbetrag > 0:
+                einzahlungen[_spartage_rows(prognose_zeitraum, asset.get("Spar-Intervall", "monatlich")), j] = sparbetrag
+    depotgebuehr_vektor = np.zeros(num_days)
+    depotgebuehr_vektor[_spartage_rows(prognose_zeitraum, "jährlich")] = kosten_depot_pa_eur
+    prognose_df['Einzahlungen (brutto)'] = einzahlungen.sum(axis=1).cumsum() + start_values['einzahlung']
+
+    #  3. Schritte: log-Rendite je Schritt ~ N(Tage * (log(1 + mu) - var / 2), Tage * Kovarianz)
+    step_rows = _step_rows(prognose_zeitraum, monatliche_schritte)
+    step_days = np.diff(step_rows, prepend=0)
+    log_mu = np.outer(step_days, np.log1p(daily_mu) - np.diag(daily_covariance) / 2)
+    fee_vektor = daily_mgmt_fee_factor ** step_days
+    zahlungen = einzahlungen[step_rows] * cost_factor_sparrate * daily_mgmt_fee_factor
+
+    #  4. Monte Carlo in Zeitabschnitten über alle Pfade (Speicher nach memory_budget_mb)
+    num_steps = len(step_rows)
+    quantiles = np.empty((3, num_steps))
+    chunk_steps = num_steps if memory_budget_mb is None else _multi_asset_chunk_steps(n_assets, n_simulations, memory_budget_mb)
+    streams = _random_streams(seed, n_simulations)
+    step_scale = np.sqrt(step_days)
+    depotgebuehr_schritte = depotgebuehr_vektor[step_rows]
+    level = np.repeat(asset_start_values[None, :], n_simulations, axis=0)
+    product = np.ones_like(level)
+    chunk_start = 0
+    while chunk_start < num_steps:
+        # Der erste Abschnitt enthält zusätzlich Schritt 0 (Startwert, ohne Zufallszahlen)
+        chunk = slice(chunk_start, min(chunk_start + chunk_steps + (chunk_start == 0), num_steps))
+        steps = slice(max(chunk.start, 1), chunk.stop)
+        totals = np.empty((chunk.stop - chunk.start, n_simulations))
+        if chunk.start == 0:
+            totals[0] = level.sum(axis=1)
+        growth = _asset_growth(streams, n_simulations, cholesky, log_mu[steps], step_scale[steps], fee_vektor[steps])
+        _simulate_asset_paths((product, level), growth, zahlungen[steps], depotgebuehr_schritte[steps], totals[steps.start - chunk.start:])
+        quantiles[:, chunk] = np.quantile(totals, [0.50, 0.95, 0.05], axis=1)
+        del growth, totals
+        chunk_start = chunk.stop
+
+    prognose_df = prognose_df.iloc[step_rows].copy()
+    return _aggregate(prognose_df, quantiles)
@@ -0,0 +1,189 @@
+import numpy as np
+import pandas as pd
+from datetime import date
+
+from . import sim_kernel
+
+#  REBALANCING AUF ZIELGEWICHTE
+# Alle Positionen laufen auf einem gemeinsamen Tageskalender (Kurse vorwärts gefüllt). Gekauft wird
+# wie in simulate_plan: Einmalerlag zum ersten gemeinsamen Kurs, Sparraten je Position zum Periodenbeginn,
+# Ausgabeaufschlag auf jede Einzahlung, Managementgebühr als Faktor auf den Kurs (gebührenbereinigter Kurs).
+# An jedem Rebalancing-Tag werden die Bestände (inkl. der Einzahlungen dieses Tages) kostenfrei auf die
+# Zielgewichte zurückgesetzt. Zwischen zwei Terminen ist der Portfoliowert linear im Wert X_k nach dem
+# letzten Termin: X_{k+1} = a_k * X_k + b_k. Die Rekursion wird mit kumulierten Produkten für alle Termine
+# auf einmal gelöst; die Tageswerte folgen daraus per Indexzugriff (keine Schleife über Termine).
+# Nur der Schwellen-Modus braucht eine Schleife über die (wenigen) ausgelösten Termine.
+
+# Rebalancing-Modi: Kalender-Termine (Perioden wie bei den Sparplänen) oder Abweichung von den Zielgewichten
+REBALANCING_MODES = list(sim_kernel.INTERVAL_MONTHS) + ["schwelle"]
+
+# Schwellen-Modus: Rebalancing, sobald ein Gewicht um mehr als so viele Prozentpunkte abweicht
+DEFAULT_THRESHOLD_PCT = 5.0
+
+# Schwellen-Modus: Tage, die je Prüfschritt am Stück betrachtet werden (wird bei Bedarf verdoppelt)
+THRESHOLD_SCAN_DAYS = 366
+
+TURNOVER_COLUMNS = ["Portfoliowert (€)", "Umschichtung (€)", "Umschichtung (%)"]
+
+
+def price_matrix(price_data: list[pd.DataFrame], start_date: date, end_date: date) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Gemeinsamer Tageskalender aller Positionen (Tage x Positionen, Kurse vorwärts gefüllt).
+    Beginnt am ersten Tag, an dem alle Positionen einen Kurs haben (frühestens start_date).
+    Gibt (Tagesnummern, Kurse) zurück; leer, falls es keinen solchen Tag gibt.
+    """
+    start_day, end_day = sim_kernel.to_days(np.array([start_date, end_date], dtype="datetime64[D]"))
+    calendar = np.arange(start_day, end_day + 1, dtype="int64")
+    close = np.full((len(calendar), len(price_data)), np.nan)
+    for j, data in enumerate(price_data):
+        days = sim_kernel.to_days(data.index)
+        prices = data["Close"].to_numpy(dtype="float64")
+        in_range = (days >= start_day) & (days <= end_day)
+        close[days[in_range] - start_day, j] = prices[in_range]
+        close[:, j] = sim_kernel.forward_fill(close[:, j])
+
+    complete = np.flatnonzero(~np.isnan(close).any(axis=1))
+    if complete.size == 0:
+        return np.empty(0, dtype="int64"), np.empty((0, len(price_data)))
+    return calendar[complete[0]:], close[complete[0]:]
+
+
+def period_rows(days: np.ndarray, interval: str) -> np.ndarray:
+    """Zeilen jedes Perioden-Beginns nach dem ersten Tag (Sparplan-Käufe bzw. Rebalancing-Termine)."""
+    start_days = sim_kernel.period_start_days(days[0], days[-1], interval)[1:]
+    return (start_days - days[0]).astype("int64")
+
+
+def _solve_recurrence(a: np.ndarray, b: np.ndarray, x0: float) -> np.ndarray:
+    """Alle Lösungen von x_{k+1} = a_k * x_k + b_k (x_0 = x0) über kumulierte Produkte."""
+    growth = np.concatenate(([1.0], np.cumprod(a)))
+    return growth * (x0 + np.concatenate(([0.0], np.cumsum(b / growth[1:]))))
+
+
+def _segment_steps(adjusted: np.ndarray, units: np.ndarray, weights: np.ndarray, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Koeffizienten der Rekursion zwischen aufeinanderfolgenden Terminen rows[k] -> rows[k + 1]:
+    a_k = Wertentwicklung des rebalancierten Portfolios, b_k = Wert der zwischenzeitlichen Käufe.
+    """
+    now, nxt = rows[:-1], rows[1:]
+    a = (weights * adjusted[nxt] / adjusted[now]).sum(axis=1)
+    b = (adjusted[nxt] * (units[nxt] - units[now])).sum(axis=1)
+    return a, b
+
+
+def _holdings(adjusted: np.ndarray, units: np.ndarray, weights: np.ndarray, rows: np.ndarray, values_after: np.ndarray) -> np.ndarray:
+    """
+    Bestände je Tag und Position: nach dem letzten Termin k die Zielgewichte von X_k plus alle
+    seitdem gekauften Anteile; vor dem ersten Termin nur die gekauften Anteile.
+    """
+    if len(rows) == 0:
+        return units.copy()
+    segment = np.searchsorted(rows, np.arange(len(adjusted)), side="right") - 1
+    before_first = segment < 0
+    segment = np.maximum(segment, 0)
+    base = weights * (values_after / adjusted[rows].T).T
+    holdings = base[segment] + units - units[rows][segment]
+    holdings[before_first] = units[before_first]
+    return holdings
+
+
+def _threshold_rows(adjusted: np.ndarray, units: np.ndarray, weights: np.ndarray, threshold_pct: float) -> list[int]:
+    """
+    Termine im Schwellen-Modus: erster Tag, an dem ein Gewicht um mehr als threshold_pct Prozentpunkte
+    vom Ziel abweicht. Die Prüfung nach einem Termin läuft vektorisiert über Blöcke von Tagen.
+    """
+    n_rows = len(adjusted)
+    threshold = threshold_pct / 100.0
+    rows = []
+    base, base_units = np.zeros(adjusted.shape[1]), np.zeros(adjusted.shape[1])
+    position, scan = 0, THRESHOLD_SCAN_DAYS
+    while position < n_rows:
+        window = slice(position, min(position + scan, n_rows))
+        holdings = base + units[window] - base_units
+        values = adjusted[window] * holdings
+        totals = values.sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            drift = np.abs(values / totals[:, None] - weights).max(axis=1)
+        breach = np.flatnonzero((totals > 0) & (drift > threshold))
+        if breach.size == 0:
+            position = window.stop
+            scan *= 2
+            continue
+        row = window.start + int(breach[0])
+        rows.append(row)
+        base = weights * totals[breach[0]] / adjusted[row]
+        base_units = units[row]
+        position, scan = row + 1, THRESHOLD_SCAN_DAYS
+    return rows
+
+
+def simulate_rebalanced(
+    days: np.ndarray,
+    close: np.ndarray,
+    weights: np.ndarray,
+    lump_sums: np.ndarray,
+    periodic_investments: np.ndarray,
+    intervals: list[str],
+    rebalancing: str,
+    ausgabeaufschlag_pct: float,
+    managementgebuehr_pa_pct: float,
+    threshold_pct: float = DEFAULT_THRESHOLD_PCT,
+) -> dict:
+    """
+    Sparplan-Portfolio mit Rebalancing auf `weights` (Summe 1) auf dem Kalender aus price_matrix.
+    rebalancing: Eintrag aus REBALANCING_MODES.
+    Gibt {"invested": Brutto-Einzahlungen je Tag, "values": Nominalwerte (Tage x Positionen),
+    "rows": Zeilen der Termine, "turnover": Umschichtung (€) je Termin, "totals": Portfoliowert je Termin} zurück.
+    """
+    n_rows, n_assets = close.shape
+    cost_factor = 1.0 - (ausgabeaufschlag_pct / 100.0)
+    adjusted = close * sim_kernel.fee_curve(n_rows, managementgebuehr_pa_pct)[:, None]
+
+    #  1. KÄUFE: kumulierte Anteile und Brutto-Einzahlungen je Position (wie simulate_plan)
+    bought = np.zeros((n_rows, n_assets))
+    gross = np.zeros((n_rows, n_assets))
+    bought[0] = np.where(lump_sums > 0, lump_sums * cost_factor / close[0], 0.0)
+    for j, (periodic_investment, interval) in enumerate(zip(periodic_investments, intervals)):
+        if periodic_investment > 0:
+            purchase_rows = period_rows(days, interval)
+            bought[purchase_rows, j] += periodic_investment * cost_factor / close[purchase_rows, j]
+            gross[purchase_rows, j] += periodic_investment
+    units = np.cumsum(bought, axis=0)
+    invested = np.cumsum(gross.sum(axis=1)) + lump_sums.sum()
+
+    #  2. TERMINE und Portfoliowert X_k direkt nach jedem Termin
+    if rebalancing == "schwelle":
+        rows = np.asarray(_threshold_rows(adjusted, units, weights, threshold_pct), dtype="int64")
+    else:
+        rows = period_rows(days, rebalancing)
+    if len(rows):
+        first_total = float(adjusted[rows[0]] @ units[rows[0]])
+        a, b = _segment_steps(adjusted, units, weights, rows)
+        values_after = _solve_recurrence(a, b, first_total)
+    else:
+        values_after = np.empty(0)
+
+    #  3. TAGESWERTE und Umschichtung je Termin (Bestand vor dem Termin vs. Zielgewichte)
+    holdings = _holdings(adjusted, units, weights, rows, values_after)
+    values = adjusted * holdings
+    turnover = np.empty(0)
+    if len(rows):
+        before = np.vstack((units[rows[:1]], holdings[rows[1:] - 1] + units[rows[1:]] - units[rows[1:] - 1]))
+        traded = np.abs(weights * values_after[:, None] - adjusted[rows] * before).sum(axis=1)
+        turnover = traded / 2
+    return {"invested": invested, "values": values, "rows": rows, "turnover": turnover, "totals": values_after}
+
+
+def turnover_frame(days: np.ndarray, result: dict) -> pd.DataFrame:
+    """Umschichtung je Rebalancing-Termin als DataFrame (Index: Datum, Spalten: TURNOVER_COLUMNS)."""
+    totals = result["totals"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        share = np.where(totals > 0, result["turnover"] / totals * 100, 0.0)
+    return pd.DataFrame(
+        {
+            "Portfoliowert (€)": totals,
+            "Umschichtung (€)": result["turnover"],
+            "Umschichtung (%)": share,
+        },
+        index=pd.DatetimeIndex(sim_kernel.from_days(days[result["rows"]]), name="Datum"),
+    )
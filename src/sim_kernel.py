@@ -0,0 +1,183 @@
+import numpy as np
+
+#  SIMULATIONS-KERN
+# Reiner NumPy-Kern der Sparplan-Simulation (ohne pandas).
+# Datumswerte sind Tagesnummern (int64, Tage seit 1970-01-01), Kurse float64-Arrays.
+# backend_simulation.run_simulation ist ein dünner DataFrame-Adapter darüber;
+# Portfolio-, Sweep- und Backtest-Engines rufen den Kern direkt auf.
+
+# Spar-Intervall -> Länge einer Periode in Monaten (Perioden beginnen am Monats-/Quartals-/Jahresanfang)
+INTERVAL_MONTHS = {
+    "monatlich": 1,
+    "vierteljährlich": 3,
+    "jährlich": 12,
+}
+
+
+def to_days(dates) -> np.ndarray:
+    """Datumswerte (DatetimeIndex, datetime64-Array) -> Tagesnummern (int64)."""
+    return np.asarray(dates, dtype="datetime64[D]").view("int64")
+
+
+def from_days(days: np.ndarray) -> np.ndarray:
+    """Tagesnummern -> datetime64[ns]-Array (z.B. für einen DatetimeIndex)."""
+    return days.astype("datetime64[D]").astype("datetime64[ns]")
+
+
+def forward_fill(values: np.ndarray) -> np.ndarray:
+    """Füllt NaN mit dem letzten gültigen Wert (führende NaN bleiben NaN)."""
+    rows = np.arange(len(values))
+    last_valid = np.where(np.isnan(values), -1, rows)
+    np.maximum.accumulate(last_valid, out=last_valid)
+    return np.where(last_valid >= 0, values[np.maximum(last_valid, 0)], np.nan)
+
+
+def daily_calendar(days: np.ndarray, prices: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Lückenloser Tageskalender vom ersten bis zum letzten Datum mit vorwärts gefüllten Kursen
+    (Wochenenden/Feiertage tragen den letzten Schlusskurs). Tage vor dem ersten gültigen Kurs entfallen.
+    Gibt (Tagesnummern, Kurse) zurück.
+    """
+    if len(days) == 0:
+        return np.empty(0, dtype="int64"), np.empty(0)
+    first, last = days.min(), days.max()
+    close = np.full(last - first + 1, np.nan)
+    close[days - first] = prices
+    close = forward_fill(close)
+
+    valid = np.flatnonzero(~np.isnan(close))
+    if valid.size == 0:
+        return np.empty(0, dtype="int64"), np.empty(0)
+    start = valid[0]
+    return np.arange(first + start, last + 1, dtype="int64"), close[start:]
+
+
+def trading_calendar(days: np.ndarray, prices: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Wie daily_calendar, aber nur mit den Handelstagen selbst (fehlende Kurse vorwärts gefüllt).
+    Gibt (Tagesnummern, Kurse) zurück.
+    """
+    close = forward_fill(np.asarray(prices, dtype="float64"))
+    valid = np.flatnonzero(~np.isnan(close))
+    if valid.size == 0:
+        return np.empty(0, dtype="int64"), np.empty(0)
+    start = valid[0]
+    return np.asarray(days, dtype="int64")[start:], close[start:]
+
+
+def period_ids(calendar_days: np.ndarray, interval: str) -> np.ndarray:
+    """Nummer der Sparperiode (Monat, Quartal oder Jahr seit 1970) für jeden Tag."""
+    months = calendar_days.astype("datetime64[D]").astype("datetime64[M]").view("int64")
+    return months // INTERVAL_MONTHS.get(interval, 1)
+
+
+def period_start_days(first_day: int, last_day: int, interval: str) -> np.ndarray:
+    """
+    Kalendertage, an denen zwischen first_day und last_day eine Sparperiode beginnt
+    (erster Eintrag = first_day, danach jeder Monats-/Quartals-/Jahresanfang).
+    """
+    first_month, last_month = np.array([first_day, last_day]).astype("datetime64[D]").astype("datetime64[M]")
+    months = np.arange(first_month, last_month + 1)
+    ids = months.view("int64") // INTERVAL_MONTHS.get(interval, 1)
+    new_period = months[1:][ids[1:] != ids[:-1]]
+    return np.concatenate(([first_day], new_period.astype("datetime64[D]").view("int64")))
+
+
+def fee_curve(n_days: int, managementgebuehr_pa_pct: float) -> np.ndarray:
+    """Kumulierter Faktor der täglich abgezogenen Managementgebühr (Tag 0 = ein Tag Gebühr)."""
+    daily_mgmt_fee_factor = (1.0 - (managementgebuehr_pa_pct / 100.0)) ** (1 / 365.0)
+    return np.cumprod(np.full(n_days, daily_mgmt_fee_factor))
+
+
+def inflation_curve(calendar_days: np.ndarray, inflation) -> np.ndarray:
+    """
+    Kumulierter Inflationsfaktor je Tag (aufsteigende Tagesnummern, nicht notwendig lückenlos).
+    inflation: Float (p.a. %) für Prognosen ODER (Tagesnummern, Faktoren) einer historischen Reihe;
+    die Reihe wird vorwärts gefüllt übernommen, Tage vor ihrem Beginn erhalten 1.0.
+    Ein Float-Satz läuft nach Kalendertagen ab dem ersten Tag auf (wie bei lückenlosem Kalender).
+    """
+    if isinstance(inflation, tuple):
+        inflation_days, inflation_factors = inflation
+        positions = np.searchsorted(inflation_days, calendar_days, side="right") - 1
+        curve = np.where(positions >= 0, inflation_factors[np.maximum(positions, 0)], np.nan)
+        return np.where(np.isnan(curve), 1.0, curve)
+
+    if len(calendar_days) == 0:
+        return np.empty(0)
+    offsets = calendar_days - calendar_days[0]
+    daily_inflation_factor = (1.0 + (inflation / 100.0)) ** (1 / 365.0)
+    return np.cumprod(np.full(offsets[-1] + 1, daily_inflation_factor))[offsets]
+
+
+def periodic_purchases(
+    prices: np.ndarray, net_investment: np.ndarray, gross_investment: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Gekaufte Anteile, kumulierte Brutto-Einzahlungen und kumulierte Anteile je Sparperiode.
+    In der ersten Periode wird nichts gekauft; Perioden ohne gültigen Kurs (<= 0) kaufen keine Anteile.
+    np.cumsum summiert sequenziell und liefert damit dieselben Werte wie die frühere Schleife.
+    """
+    net_investment = net_investment.copy()
+    gross_investment = gross_investment.copy()
+    net_investment[:1] = 0.0
+    gross_investment[:1] = 0.0
+
+    shares_bought = np.zeros_like(prices)
+    np.divide(net_investment, prices, out=shares_bought, where=prices > 0)
+    return shares_bought, np.cumsum(gross_investment), np.cumsum(shares_bought)
+
+
+def simulate_plan(
+    days: np.ndarray,
+    prices: np.ndarray,
+    periodic_investment: float,
+    lump_sum: float,
+    interval: str,
+    inflation,
+    ausgabeaufschlag_pct: float,
+    managementgebuehr_pa_pct: float,
+    trading_days: bool = False,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Sparplan-Simulation eines Assets auf Arrays.
+    days/prices: Handelstage (Tagesnummern, aufsteigend) und Schlusskurse.
+    Einmalerlag zum ersten Kurs, Sparrate jeweils zum Periodenbeginn (nicht in der ersten Periode),
+    Ausgabeaufschlag auf jeden Kauf, Managementgebühr täglich, Inflation siehe inflation_curve.
+    trading_days=False: eine Zeile je Kalendertag; True: nur Handelstage. Kaufkurs, Gebühren und
+    Inflation laufen in beiden Fällen nach Kalendertagen, die Werte an Handelstagen sind identisch.
+    Gibt (Tage, Einzahlungen brutto, Wert nominal, Wert real) zurück.
+    """
+    if trading_days:
+        row_days, close = trading_calendar(days, prices)
+    else:
+        row_days, close = daily_calendar(days, prices)
+    n_rows = len(row_days)
+    if n_rows == 0:
+        empty = np.empty(0)
+        return row_days, empty, empty, empty
+    offsets = row_days - row_days[0]
+
+    #  1. KOSTENFAKTOREN
+    cost_factor = 1.0 - (ausgabeaufschlag_pct / 100.0)
+
+    #  2. LAUFENDE KÄUFE (je Periode zum Kurs am Periodenbeginn, dann auf alle Zeilen der Periode übertragen)
+    start_days = period_start_days(row_days[0], row_days[-1], interval)
+    start_prices = close[np.searchsorted(row_days, start_days, side="right") - 1]
+    investment = np.full(len(start_days), periodic_investment, dtype="float64")
+    _, invested_periodic, shares_periodic = periodic_purchases(
+        start_prices, investment * cost_factor, investment
+    )
+    period_of_row = np.searchsorted(start_days, row_days, side="right") - 1
+
+    #  3. EINMALERLAG zum ersten verfügbaren Kurs
+    lump_sum_shares = 0.0
+    if lump_sum > 0 and close[0] > 0:
+        lump_sum_shares = (lump_sum * cost_factor) / close[0]
+
+    total_shares = shares_periodic[period_of_row] + lump_sum_shares
+    invested = invested_periodic[period_of_row] + lump_sum
+
+    #  4. WERT, GEBÜHREN & INFLATION (nach Kalendertagen seit dem Start)
+    nominal = (total_shares * close) * fee_curve(offsets[-1] + 1, managementgebuehr_pa_pct)[offsets]
+    real = nominal / inflation_curve(row_days, inflation)
+    return row_days, invested, nominal, real
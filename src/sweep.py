@@ -0,0 +1,234 @@
+import numpy as np
+import pandas as pd
+from datetime import date
+
+from . import sim_kernel
+from . import portfolio_engine
+from . import backend_simulation
+from . import inflation
+from .portfolio_templates import load_portfolio_template
+
+#  PARAMETER-SWEEP (LINEARBASIS)
+# Bei festen Kursen, Kosten und Intervall ist eine Sparplan-Simulation linear in Einmalerlag
+# und Sparrate: Wert = Einmalerlag * L + Sparrate * S. Die Basispfade L (1 € Einmalerlag)
+# und S (1 € Sparrate je Periode) werden einmal pro Asset gerechnet; jedes Betrags-Raster
+# und jede Budget-Aufteilung ist danach nur noch eine skalierte Summe (Matrixprodukt).
+# Ergebnisse stimmen bis auf Rundung (~1e-12 relativ) mit run_simulation überein.
+
+BASIS_COLUMNS = ["invested", "nominal", "real"]
+
+
+def asset_basis(
+    data: pd.DataFrame,
+    interval: str,
+    inflation_input: float | pd.Series,
+    ausgabeaufschlag_pct: float,
+    managementgebuehr_pa_pct: float,
+) -> dict:
+    """
+    Basispfade eines Assets: {"days": Kalendertage, "lump": {...}, "periodic": {...}},
+    jeweils mit den Arrays "invested", "nominal" und "real" je Kalendertag.
+    """
+    if isinstance(inflation_input, pd.Series):
+        inflation_spec = (sim_kernel.to_days(inflation_input.index), inflation_input.to_numpy(dtype="float64"))
+    else:
+        inflation_spec = inflation_input
+
+    days = sim_kernel.to_days(data.index)
+    prices = data["Close"].to_numpy(dtype="float64")
+    basis = {}
+    for key, (lump_sum, periodic_investment) in {"lump": (1.0, 0.0), "periodic": (0.0, 1.0)}.items():
+        calendar_days, invested, nominal, real = sim_kernel.simulate_plan(
+            days, prices, periodic_investment, lump_sum, interval,
+            inflation_spec, ausgabeaufschlag_pct, managementgebuehr_pa_pct,
+        )
+        basis[key] = {"invested": invested, "nominal": nominal, "real": real}
+    basis["days"] = calendar_days
+    return basis
+
+
+def _scaled(basis: dict, column: str, lump_sums: np.ndarray, periodic_investments: np.ndarray, rows=slice(None)) -> np.ndarray:
+    """Einmalerlag * L + Sparrate * S für alle Kombinationen (Kombinationen x Tage)."""
+    return (
+        np.multiply.outer(lump_sums, basis["lump"][column][rows])
+        + np.multiply.outer(periodic_investments, basis["periodic"][column][rows])
+    )
+
+
+def sweep_asset(basis: dict, lump_sums, periodic_investments) -> dict[str, np.ndarray]:
+    """
+    Vollständige Pfade für alle Kombinationen (lump_sums[k], periodic_investments[k]).
+    Gibt ein Dict Spalte -> Matrix (Kombinationen x Kalendertage) zurück; Tage mit
+    Nominalwert <= 1 sind wie in run_simulation ausgeblendet (NaN).
+    """
+    lump_sums = np.asarray(lump_sums, dtype="float64")
+    periodic_investments = np.asarray(periodic_investments, dtype="float64")
+    paths = {column: _scaled(basis, column, lump_sums, periodic_investments) for column in BASIS_COLUMNS}
+    hidden = ~(paths["nominal"] > 1.0)
+    for column in BASIS_COLUMNS:
+        paths[column][hidden] = np.nan
+    return paths
+
+
+def sweep_final_values(basis: dict, lump_sums, periodic_investments) -> dict[str, np.ndarray]:
+    """
+    Endwerte (letzter Kalendertag) für alle Kombinationen; nur eine Zeile der Basispfade wird gebraucht.
+    Gibt ein Dict Spalte -> Array (Kombinationen,) zurück.
+    """
+    lump_sums = np.asarray(lump_sums, dtype="float64")
+    periodic_investments = np.asarray(periodic_investments, dtype="float64")
+    return {
+        column: _scaled(basis, column, lump_sums, periodic_investments, rows=slice(-1, None))[:, 0]
+        for column in BASIS_COLUMNS
+    }
+
+
+def sweep_grid(basis: dict, lump_values, periodic_values) -> dict[str, np.ndarray]:
+    """
+    Endwerte für das volle Raster lump_values x periodic_values.
+    Gibt ein Dict Spalte -> Matrix (len(lump_values), len(periodic_values)) zurück.
+    """
+    lump_grid, periodic_grid = np.meshgrid(
+        np.asarray(lump_values, dtype="float64"), np.asarray(periodic_values, dtype="float64"), indexing="ij"
+    )
+    final_values = sweep_final_values(basis, lump_grid.ravel(), periodic_grid.ravel())
+    return {column: values.reshape(lump_grid.shape) for column, values in final_values.items()}
+
+
+#  PORTFOLIO-SWEEP (Budget-Aufteilungen, z.B. aus load_portfolio_template)
+
+def portfolio_basis(
+    assets: list[dict],
+    start_date: date,
+    end_date: date,
+    ausgabeaufschlag_pct: float,
+    managementgebuehr_pa_pct: float,
+) -> dict:
+    """
+    Basispfade aller Positionen auf dem Portfolio-Zeitraum, ausgerichtet wie in run_portfolio_simulation.
+    Das Ausblenden von Tagen mit Wert <= 1 ist nicht linear; abgebildet wird der strukturelle Fall:
+    Ohne Einmalerlag beginnt eine Position erst mit dem ersten Sparplan-Kauf ("periodic_only").
+    Gibt {"index", "names", "isins", "inflation", "lump", "periodic", "periodic_only"} zurück,
+    die Basispfade jeweils als {"invested": Tage x Positionen, "nominal": Tage x Positionen}.
+    Positionen ohne Kursdaten werden übersprungen.
+    """
+    full_date_range = pd.date_range(start=start_date, end=end_date, freq="D")
+    historical_inflation_series = inflation.calculate_inflation_series(full_date_range)
+    price_data = backend_simulation.load_many(
+        isins=[asset.get("ISIN / Ticker") for asset in assets if asset.get("ISIN / Ticker")],
+        start_date=start_date,
+        end_date=end_date,
+    )
+
+    positions = []
+    for asset in assets:
+        if price_data.get(asset.get("ISIN / Ticker")) is None:
+            print(f"Sweep: Daten für {asset.get('ISIN / Ticker')} konnten nicht geladen werden.")
+            continue
+        positions.append(asset)
+
+    return positions_basis(
+        price_data=[price_data[asset["ISIN / Ticker"]] for asset in positions],
+        names=[asset.get("Name") or asset["ISIN / Ticker"] for asset in positions],
+        isins=[asset["ISIN / Ticker"] for asset in positions],
+        intervals=[asset.get("Spar-Intervall", "monatlich") for asset in positions],
+        start_date=start_date,
+        end_date=end_date,
+        inflation_series=historical_inflation_series,
+        ausgabeaufschlag_pct=ausgabeaufschlag_pct,
+        managementgebuehr_pa_pct=managementgebuehr_pa_pct,
+    )
+
+
+def positions_basis(
+    price_data: list[pd.DataFrame],
+    names: list[str],
+    isins: list[str],
+    intervals: list[str],
+    start_date: date,
+    end_date: date,
+    inflation_series: pd.Series,
+    ausgabeaufschlag_pct: float,
+    managementgebuehr_pa_pct: float,
+) -> dict:
+    """Basispfade für bereits geladene Kursreihen (siehe portfolio_basis)."""
+    basis = {"names": list(names), "isins": list(isins), "inflation": inflation_series}
+    n = len(price_data)
+    variants = {"lump": (1.0, 0.0, -np.inf), "periodic": (0.0, 1.0, -np.inf), "periodic_only": (0.0, 1.0, 0.0)}
+    for key, (lump_sum, periodic_investment, min_value) in variants.items():
+        matrix = portfolio_engine.simulate_positions(
+            price_data=price_data,
+            names=names,
+            lump_sums=[lump_sum] * n,
+            periodic_investments=[periodic_investment] * n,
+            intervals=intervals,
+            start_date=start_date,
+            end_date=end_date,
+            inflation_series=inflation_series,
+            ausgabeaufschlag_pct=ausgabeaufschlag_pct,
+            managementgebuehr_pa_pct=managementgebuehr_pa_pct,
+            min_value=min_value,
+        )
+        basis[key] = {
+            "invested": matrix.values["Einzahlungen (brutto)"],
+            "nominal": matrix.values["Portfolio (nominal)"],
+        }
+    basis["index"] = matrix.index
+    return basis
+
+
+def template_splits(
+    basis: dict, portfolio_type: str, budgets, savings_rates, savings_interval: str = "monatlich"
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Beträge je Position für mehrere (Budget, Sparrate)-Paare laut load_portfolio_template.
+    Gibt (Einmalerläge, Sparraten) als Matrizen (Kombinationen x Positionen) zurück.
+    """
+    lump_sums = np.zeros((len(budgets), len(basis["isins"])))
+    periodic_investments = np.zeros_like(lump_sums)
+    columns = {isin: j for j, isin in enumerate(basis["isins"])}
+    for k, (budget, savings_rate) in enumerate(zip(budgets, savings_rates)):
+        for asset in load_portfolio_template(portfolio_type, budget, savings_rate, savings_interval):
+            j = columns.get(asset["ISIN / Ticker"])
+            if j is not None:
+                lump_sums[k, j] += asset["Einmalerlag (€)"]
+                periodic_investments[k, j] += asset["Sparbetrag (€)"]
+    return lump_sums, periodic_investments
+
+
+def sweep_portfolio(
+    basis: dict, lump_sums: np.ndarray, periodic_investments: np.ndarray, depotgebuehr_pa_eur: float = 0.0
+) -> dict[str, np.ndarray]:
+    """
+    Portfolio-Pfade für alle Aufteilungen (Matrizen Kombinationen x Positionen):
+    Summe der skalierten Basispfade, danach Depotgebühr und Realwert wie in run_portfolio_simulation.
+    Gibt ein Dict "Einzahlungen (brutto)", "Portfolio (nominal)", "Portfolio (real)" -> Matrix (Kombinationen x Tage) zurück.
+    """
+    # Sparraten von Positionen ohne Einmalerlag laufen über den "periodic_only"-Basispfad
+    with_lump = lump_sums > 0
+    periodic_with_lump = np.where(with_lump, periodic_investments, 0.0)
+    periodic_only = np.where(with_lump, 0.0, periodic_investments)
+
+    def combine(column):
+        return (
+            lump_sums @ basis["lump"][column].T
+            + periodic_with_lump @ basis["periodic"][column].T
+            + periodic_only @ basis["periodic_only"][column].T
+        )
+
+    invested = combine("invested")
+    nominal = combine("nominal")
+
+    days = sim_kernel.to_days(basis["index"])
+    if depotgebuehr_pa_eur > 0:
+        portfolio_engine.apply_depot_fee(days, nominal, depotgebuehr_pa_eur)
+
+    inflation_series = basis["inflation"]
+    final_inflation = sim_kernel.inflation_curve(
+        days, (sim_kernel.to_days(inflation_series.index), inflation_series.to_numpy(dtype="float64"))
+    )
+    return {
+        "Einzahlungen (brutto)": invested,
+        "Portfolio (nominal)": nominal,
+        "Portfolio (real)": nominal / final_inflation,
+    }
@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+import pytest
+from datetime import date
+
+from src import backend_simulation
+from src import backtest
+from src import executor
+from src import prognose_logic
+from src import rebalancing
+from src.benchmark import INTERVALS, _loop_rebalanced, synthetic_prices
+
+#  Prüft die vektorisierten Rechenkerne gegen ihre Referenzen (Schleife Tag für Tag bzw. eine Simulation
+#  je Zeitraum) und die Reproduzierbarkeit der Prognose bei gleichem Seed.
+
+END_DATE = date(2025, 1, 1)
+SEED = 42
+
+
+@pytest.fixture
+def pool():
+    """Prozess-Pool mit mehreren Workern auch für kleine Aufgaben; Einstellungen danach zurücksetzen."""
+    previous = executor.POOL_WORKERS, executor.MIN_PARALLEL_CELLS
+    executor.shutdown_pool()
+    executor.POOL_WORKERS, executor.MIN_PARALLEL_CELLS = 2, 0
+    yield
+    executor.POOL_WORKERS, executor.MIN_PARALLEL_CELLS = previous
+    executor.shutdown_pool()
+
+
+#  1. REBALANCING: gelöste Rekursion vs. Bestände Tag für Tag
+
+@pytest.mark.parametrize("mode", rebalancing.REBALANCING_MODES)
+def test_rebalancing_matches_daily_loop(mode):
+    n_positions = 5
+    prices = [synthetic_prices(f"TEST{j:03d}", years=6) for j in range(n_positions)]
+    days, close = rebalancing.price_matrix(prices, date(2019, 1, 1), END_DATE)
+    weights = np.array([0.4, 0.25, 0.15, 0.1, 0.1])
+    lump_sums = weights * 50_000.0
+    periodic_investments = weights * 500.0
+    intervals = [INTERVALS[j % 3] for j in range(n_positions)]
+
+    result = rebalancing.simulate_rebalanced(
+        days, close, weights, lump_sums, periodic_investments, intervals, mode, 2.0, 0.5, 5.0
+    )
+    reference = _loop_rebalanced(days, close, weights, lump_sums, periodic_investments, intervals, mode, 5.0)
+
+    assert len(result["rows"]) > 0
+    np.testing.assert_allclose(result["values"], reference, rtol=1e-12, atol=0.0)
+    np.testing.assert_allclose(result["totals"], reference[result["rows"]].sum(axis=1), rtol=1e-12)
+
+
+#  2. PROGNOSE: gleicher Seed -> gleiche Quantile bei jedem Speicherbudget und jeder Worker-Anzahl
+
+def _forecast(memory_budget_mb, seed=SEED, monatliche_schritte=False):
+    return prognose_logic.run_forecast(
+        start_values={"letzter_tag": END_DATE, "nominal": 100_000.0, "real": 80_000.0, "einzahlung": 60_000.0},
+        assets=[{"Spar-Intervall": "monatlich", "Sparbetrag (€)": 500.0}],
+        prognose_jahre=3,
+        sparplan_fortfuehren=True,
+        kosten_management_pa_pct=0.5,
+        kosten_depot_pa_eur=50.0,
+        ausgabeaufschlag_pct=2.0,
+        expected_asset_returns_pa={"A": 6.0},
+        asset_final_values={"A": 100_000.0},
+        expected_volatility_pa=15.0,
+        n_simulations=2 * prognose_logic.RNG_BLOCK_PATHS + 100,
+        memory_budget_mb=memory_budget_mb,
+        monatliche_schritte=monatliche_schritte,
+        seed=seed,
+    )
+
+
+def _multi_asset_forecast(memory_budget_mb):
+    assets = [
+        {"Name": "A", "ISIN / Ticker": "A", "Einmalerlag (€)": 1000.0, "Sparbetrag (€)": 200.0, "Spar-Intervall": "monatlich"},
+        {"Name": "B", "ISIN / Ticker": "B", "Einmalerlag (€)": 1000.0, "Sparbetrag (€)": 300.0, "Spar-Intervall": "jährlich"},
+    ]
+    return prognose_logic.run_multi_asset_forecast(
+        start_values={"letzter_tag": END_DATE, "nominal": 50_000.0, "real": 45_000.0, "einzahlung": 40_000.0},
+        assets=assets,
+        prognose_jahre=3,
+        sparplan_fortfuehren=True,
+        kosten_management_pa_pct=0.5,
+        kosten_depot_pa_eur=50.0,
+        ausgabeaufschlag_pct=2.0,
+        expected_asset_returns_pa={"A": 6.0, "B": 4.0},
+        asset_final_values={"A": 30_000.0, "B": 20_000.0},
+        expected_volatility_pa=15.0,
+        n_simulations=prognose_logic.RNG_BLOCK_PATHS + 100,
+        covariance_pa=np.array([[0.04, 0.01], [0.01, 0.02]]),
+        monatliche_schritte=False,
+        memory_budget_mb=memory_budget_mb,
+        seed=SEED,
+    )
+
+
+@pytest.mark.parametrize("monatliche_schritte", [False, True])
+def test_forecast_seed_independent_of_memory_budget(monatliche_schritte):
+    reference = _forecast(None, monatliche_schritte=monatliche_schritte)
+    for budget in (256, 1, 0.05):
+        pd.testing.assert_frame_equal(_forecast(budget, monatliche_schritte=monatliche_schritte), reference, check_exact=True)
+    assert not _forecast(None, seed=SEED + 1, monatliche_schritte=monatliche_schritte).equals(reference)
+
+
+def test_forecast_seed_independent_of_workers(pool):
+    executor.MIN_PARALLEL_CELLS = np.inf
+    reference = _forecast(None)
+    executor.MIN_PARALLEL_CELLS = 0
+    for budget in (None, 1, 0.05):
+        pd.testing.assert_frame_equal(_forecast(budget), reference, check_exact=True)
+
+
+def test_multi_asset_forecast_seed_independent_of_memory_budget():
+    reference = _multi_asset_forecast(None)
+    for budget in (256, 1, 0.05):
+        pd.testing.assert_frame_equal(_multi_asset_forecast(budget), reference, check_exact=True)
+
+
+#  3. ROLLIERENDER BACKTEST vs. run_simulation je Startmonat
+
+@pytest.mark.parametrize("interval, lump_sum", [("monatlich", 0.0), ("vierteljährlich", 5_000.0)])
+def test_backtest_matches_run_simulation(interval, lump_sum):
+    years = 3
+    prices = synthetic_prices(years=8)
+    result = backtest.rolling_backtest(prices, [years], 200.0, lump_sum, interval, 2.0, 0.5, 2.0)[years]
+    assert len(result) > 0
+
+    first_trading_days = prices.groupby(prices.index.to_period("M")).head(1).index
+    for start, end in list(zip(first_trading_days, first_trading_days[12 * years:]))[::7]:
+        sim = backend_simulation.run_simulation.__wrapped__(prices.loc[start:end], 200.0, lump_sum, interval, 2.0, 2.0, 0.5)
+        row = result.loc[start]
+        assert row["Enddatum"] == end
+        assert row["Einzahlungen (brutto)"] == pytest.approx(sim["Einzahlungen (brutto)"].iloc[-1], rel=1e-12)
+        assert row["Endwert (nominal)"] == pytest.approx(sim["Portfolio (nominal)"].iloc[-1], rel=1e-12)
+        assert row["Endwert (real)"] == pytest.approx(sim["Portfolio (real)"].iloc[-1], rel=1e-12)